@@ -0,0 +1,3 @@
+"""
+Benchmarks and load tests. Not installed with the package.
+"""
@@ -0,0 +1,223 @@
+"""
+End-to-end load test: QuerySets through HTTPBackend to stub server.
+
+    python -m benchmarks.loadtest --concurrency 32 --qps 2000 --duration 10 \
+        --latency lognormal:0.004:0.5 --error-rate 0.001 --doc-size 512
+
+Or from code:
+
+    with StubProcess(make_docs(10000), latency=lognormal(0.004)) as server:
+        Product.backend = HTTPBackend(server.url)
+        print(run(workload(Product), concurrency=32, duration=10))
+
+Each worker thread builds QuerySet (search, filters, facet drill-down
+filters, random page), fetches and hydrates it. Stub server runs in
+child process, so it doesn't compete with workers for GIL. Client CPU
+is measured with per-thread CPU time.
+"""
+import argparse
+import random
+import threading
+from collections import namedtuple
+from math import log
+from time import perf_counter
+from time import sleep
+from time import thread_time
+
+from benchmarks.stub import StubProcess
+from pso.backends import HTTPBackend
+from pso.fields import BaseField
+from pso.fields import DateTimeField
+from pso.fields import FloatField
+from pso.fields import IntegerField
+from pso.models import BaseModel
+from pso.q import Q
+
+
+# Latency distributions, callables for `StubProcess(latency=...)`
+def constant(seconds):
+    return lambda: seconds
+
+
+def uniform(low, high):
+    return lambda: random.uniform(low, high)
+
+
+def lognormal(median, sigma=0.5):
+    """Long tail, like real engines. `median` in seconds"""
+    mu = log(median)
+    return lambda: random.lognormvariate(mu, sigma)
+
+
+_DISTRIBUTIONS = {
+    'constant': constant, 'uniform': uniform, 'lognormal': lognormal}
+
+
+def parse_latency(text):
+    """'lognormal:0.004:0.5' -> callable"""
+    name, *args = text.split(':')
+    return _DISTRIBUTIONS[name](*map(float, args))
+
+
+class Product(BaseModel):
+    """Default model of load test documents"""
+    id = IntegerField(primary_key=True)
+    title = BaseField()
+    brand = BaseField()
+    price = FloatField()
+    tags = [BaseField()]
+    created = DateTimeField()
+
+
+_WORDS = ('red', 'blue', 'fast', 'light', 'pro', 'mini', 'max', 'eco')
+
+
+def make_docs(count, doc_size=256):
+    """Documents of Product, padded to about `doc_size` bytes of JSON"""
+    docs = []
+    for i in range(count):
+        doc = {
+            'id': i,
+            'title': ' '.join(random.sample(_WORDS, 3)),
+            'brand': 'brand{}'.format(i % 20),
+            'price': round(random.uniform(1, 1000), 2),
+            'tags': random.sample(_WORDS, 2),
+            'created': '2017-01-{:02d}T12:00:00Z'.format(i % 28 + 1),
+        }
+        padding = doc_size - 160
+        if padding > 0:
+            doc['title'] += ' ' + 'x' * padding
+        docs.append(doc)
+    return docs
+
+
+def workload(model=Product, per_page=20, max_page=10):
+    """Returns function, which makes random QuerySet"""
+    def make():
+        qs = model.objects.search(title=random.choice(_WORDS))
+        qs = qs.filter(price__gte=random.randint(1, 500))
+        # Facet drill-down
+        if random.random() < 0.5:
+            qs = qs.filter(brand__in=random.sample(
+                ['brand{}'.format(i) for i in range(20)], 3))
+        if random.random() < 0.3:
+            qs = qs.filter(-Q(tags=random.choice(_WORDS)))
+        return qs.paginate(random.randrange(max_page), per_page)
+    return make
+
+
+class Report(namedtuple('Report', [
+        'requests', 'errors', 'duration', 'throughput', 'latency',
+        'cpu_per_request'])):
+    """Load test results. Times are in seconds"""
+
+    def __str__(self):
+        latency = ' '.join('p{}={:.1f}ms'.format(p, v * 1000)
+                           for p, v in self.latency.items())
+        return ("{0.requests} requests, {0.errors} errors in "
+                "{0.duration:.1f}s: {0.throughput:.0f} req/s, {1}, "
+                "client CPU {2:.0f}us/request").format(
+                    self, latency, self.cpu_per_request * 1e6)
+
+
+def percentile(samples, p):
+    """Nearest rank of sorted samples"""
+    if not samples:
+        return 0.0
+    return samples[min(int(p / 100 * len(samples)), len(samples) - 1)]
+
+
+def run(make_queryset, concurrency=8, duration=10, qps=None,
+        percentiles=(50, 90, 99, 99.9)):
+    """
+    Execute QuerySets from `make_queryset()` in `concurrency` threads
+    for `duration` seconds. With `qps` requests are paced (open loop
+    per worker) to reach target throughput, and latency is measured
+    from scheduled start: time request waited behind slow previous one
+    is counted (no coordinated omission).
+    """
+    interval = concurrency / qps if qps else 0
+    start = perf_counter()
+    stop = start + duration
+    lock = threading.Lock()
+    latencies, cpu, errors = [], [0.0], [0]
+
+    def worker(offset):
+        local_latencies, local_cpu, local_errors = [], 0.0, 0
+        scheduled = start + offset
+        while True:
+            intended = None
+            if interval:
+                delay = scheduled - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+                intended = scheduled
+                scheduled += interval
+            began = perf_counter()
+            if began >= stop:
+                break
+            cpu_began = thread_time()
+            try:
+                list(make_queryset())
+            except Exception:
+                local_errors += 1
+            local_cpu += thread_time() - cpu_began
+            local_latencies.append(
+                perf_counter() - (began if intended is None else intended))
+
+        with lock:
+            latencies.extend(local_latencies)
+            cpu[0] += local_cpu
+            errors[0] += local_errors
+
+    threads = [
+        threading.Thread(target=worker, args=(i * interval / concurrency, ))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = perf_counter() - start
+    latencies.sort()
+    return Report(
+        requests=len(latencies),
+        errors=errors[0],
+        duration=elapsed,
+        throughput=len(latencies) / elapsed,
+        latency={p: percentile(latencies, p) for p in percentiles},
+        cpu_per_request=cpu[0] / len(latencies) if latencies else 0.0,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--qps', type=float, default=None,
+                        help="Target throughput, unlimited by default")
+    parser.add_argument('--latency', default='constant:0',
+                        help="Server latency: constant:S, uniform:LOW:HIGH "
+                             "or lognormal:MEDIAN:SIGMA, in seconds")
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--docs', type=int, default=1000)
+    parser.add_argument('--doc-size', type=int, default=256,
+                        help="Approximate document size in bytes")
+    parser.add_argument('--per-page', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    server = StubProcess(make_docs(args.docs, args.doc_size),
+                         latency=parse_latency(args.latency),
+                         error_rate=args.error_rate)
+    with server:
+        Product.backend = HTTPBackend(server.url)
+        report = run(workload(Product, args.per_page),
+                     concurrency=args.concurrency, duration=args.duration,
+                     qps=args.qps)
+    print(report)
+    return report
+
+
+if __name__ == '__main__':
+    main()
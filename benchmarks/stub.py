@@ -0,0 +1,269 @@
+"""
+Local stand-in search server, for tests and benchmarks.
+
+    with StubServer(docs=[{'id': 1}], latency=0.01) as server:
+        Article.backend = HTTPBackend(server.url)
+
+`StubProcess` runs it in child process, so server threads don't share
+GIL (and CPU time) with load generator.
+
+Speaks same protocol as `HTTPBackend` (Solr JSON API):
+POST /query with {"offset", "limit"} returns docs window
+(or with {"params": {"cursorMark"}} next batch after cursor),
+POST /update with list of documents stores them, and with
+`?versions=true` returns their new `_version_`, checking old ones.
+Understands compressed requests, `?wt=cbor` (requires cbor2).
+"""
+import io
+import json
+import multiprocessing
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from random import random
+from time import sleep
+from urllib.parse import urlsplit
+
+from pso.serializers import CBORCodec
+from pso.serializers import ENCODINGS
+from pso.serializers import JSON
+from pso.serializers import compress
+from pso.serializers import read_body
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Load tests open many connections at once
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with stub._lock:
+            stub.requests += 1
+            stub.bytes_received += len(body)
+        if self.headers.get('Content-Encoding'):
+            body = read_body(io.BytesIO(body),
+                             self.headers['Content-Encoding'])
+
+        request = json.loads(body.decode('utf-8'))
+        latency = stub.latency() if callable(stub.latency) else stub.latency
+        partial = False
+        is_update = urlsplit(self.path).path.endswith('/update')
+        if not is_update:
+            allowed = request.get('params', {}).get('timeAllowed')
+            if allowed is not None and latency > allowed / 1000:
+                latency, partial = allowed / 1000, True
+        if latency:
+            sleep(latency)
+
+        if stub.error_rate and random() < stub.error_rate:
+            with stub._lock:
+                stub.errors += 1
+            self.reply(503, b'{"error": {"msg": "Service Unavailable"}}')
+            return
+
+        codec = JSON
+        if is_update:
+            try:
+                versions = stub.update(request)
+            except ValueError as e:
+                self.reply(409, json.dumps(
+                    {'error': {'msg': str(e), 'code': 409}}).encode('utf-8'))
+                return
+            response = {'responseHeader': {'status': 0}}
+            if 'versions=true' in self.path:
+                response['adds'] = versions
+        else:
+            response = stub.search(request, partial)
+            if 'wt=cbor' in self.path:
+                codec = CBORCodec()
+        try:
+            self.reply(200, codec.dumps(response), codec.content_type)
+        except OSError:  # Client gone, E.G. timed out
+            pass
+
+    def reply(self, status, data, content_type='application/json'):
+        encoding = None
+        if self.server.stub.compress:
+            accepted = self.headers.get('Accept-Encoding', '')
+            encoding = next(
+                (e for e in ENCODINGS if e in accepted), None)
+        if encoding:
+            data = compress(data, encoding)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.stub._lock:
+            self.server.stub.bytes_sent += len(data)
+
+
+class StubServer:
+    """
+    HTTP server in background thread.
+    `latency` is seconds, or callable returning seconds for each request.
+    `error_rate` part of requests fail with 503.
+    With `compress`, responses are compressed, if client accepts it.
+    """
+
+    def __init__(self, docs=(), latency=0, host='127.0.0.1', port=0,
+                 error_rate=0, compress=False):
+        self.docs = list(docs)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.compress = compress
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.versions = {}  # Of documents by id
+        self._version = 0
+        self._lock = threading.Lock()  # Counters and documents
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {0.url}>".format(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05, ), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def update(self, docs):
+        """
+        Store documents, each gets new `_version_`. Positive `_version_`
+        in update must match stored one, else ValueError (conflict).
+        Returns [id, version, ...].
+        """
+        with self._lock:
+            for doc in docs:
+                expected = doc.get('_version_')
+                if expected is not None and expected > 0 \
+                        and self.versions.get(doc.get('id')) != expected:
+                    raise ValueError(
+                        "version conflict for {}".format(doc.get('id')))
+            added = []
+            for doc in docs:
+                self._version += 1
+                self.versions[doc.get('id')] = self._version
+                added += [doc.get('id'), self._version]
+            self.docs.extend(docs)
+        return added
+
+    def search(self, request, partial=False):
+        """
+        Response for search request. Filters and sort are not applied.
+        Cursor mark is offset of next document. When `timeAllowed` is
+        shorter than latency, half of window is returned as partial.
+        """
+        cursor = request.get('params', {}).get('cursorMark')
+        if cursor is None:
+            offset = request.get('offset') or 0
+        else:
+            offset = 0 if cursor == '*' else int(cursor)
+        limit = request.get('limit')
+        if partial and limit:
+            limit //= 2
+        end = None if limit is None else offset + limit
+        response = {
+            'response': {
+                'numFound': len(self.docs),
+                'docs': self.docs[offset:end],
+            },
+        }
+        if partial:
+            response['responseHeader'] = {'partialResults': True}
+        if cursor is not None:
+            docs = len(response['response']['docs'])
+            response['nextCursorMark'] = str(offset + docs) if docs \
+                else cursor
+        return response
+
+
+_COUNTERS = ('requests', 'errors', 'bytes_received', 'bytes_sent')
+
+
+def _serve(conn, args, kwargs):
+    """Runs in child. Answers each command with counters"""
+    with StubServer(*args, **kwargs) as server:
+        conn.send(server.url)
+        while True:
+            command = conn.recv()
+            with server._lock:
+                conn.send({name: getattr(server, name) for name in _COUNTERS})
+            if command == 'stop':
+                return
+
+
+class StubProcess:
+    """
+    `StubServer` in child process, with same arguments. Process is
+    forked, so `latency` callables and documents are not pickled.
+    Counters are read with `stats()`, and are set as attributes on stop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.url = None
+        self._args, self._kwargs = args, kwargs
+        self._conn = None
+        self._process = None
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {0.url}>".format(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        context = multiprocessing.get_context('fork')
+        self._conn, child = context.Pipe()
+        self._process = context.Process(
+            target=_serve, args=(child, self._args, self._kwargs),
+            daemon=True)
+        self._process.start()
+        self.url = self._conn.recv()
+        return self
+
+    def stats(self):
+        """Counters of server: requests, errors, bytes received and sent"""
+        self._conn.send('stats')
+        return self._conn.recv()
+
+    def stop(self):
+        self._conn.send('stop')
+        for name, value in self._conn.recv().items():
+            setattr(self, name, value)
+        self._process.join()
+        self._conn.close()
@@ -0,0 +1,385 @@
+"""
+Transport layer. Sends compiled requests to search engine.
+"""
+import abc
+import inspect
+import json
+import socket
+import threading
+from collections import deque
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from functools import lru_cache
+from time import monotonic
+from urllib.error import URLError
+from urllib.request import Request
+from urllib.request import urlopen
+
+from pso.encoding import fingerprint
+from pso.exceptions import DeadlineExceeded
+from pso.exceptions import PSOException
+from pso.instrumentation import Phase
+from pso.instrumentation import span
+from pso.serializers import ACCEPT_ENCODING
+from pso.serializers import ENCODINGS
+from pso.serializers import JSON
+from pso.serializers import compress
+from pso.serializers import read_body
+
+
+# `cursor` is next cursor mark of deep paging (export) requests,
+# `partial` is set when engine stopped early (timeAllowed).
+Response = namedtuple('Response', ['docs', 'hits', 'cursor', 'partial'],
+                      defaults=(None, False))
+
+
+class Action:
+    """Constants to define request kind"""
+    SEARCH = 'search'
+    INDEX = 'index'
+
+
+class BaseBackend(metaclass=abc.ABCMeta):
+    """
+    Base class for engine transports.
+
+    Requests are JSON encoded, responses are decoded with `codec`
+    (JSON by default), and are expected in Solr format:
+    {"response": {"docs": [...]}}
+    """
+
+    codec = JSON  # <Codec> of responses
+
+    def serialize(self, request):
+        """Request dict -> bytes"""
+        return json.dumps(request).encode('utf-8')
+
+    @abc.abstractmethod
+    def send(self, payload, action=Action.SEARCH, timeout=None):
+        """
+        Send request bytes, return response bytes.
+        `timeout` (seconds) is passed only for requests with deadline,
+        and only if `send` accepts it. Expired `timeout` should raise
+        TimeoutError (or `socket.timeout`).
+        """
+
+    def parse(self, raw):
+        """Response bytes -> Response"""
+        data = self.codec.loads(raw)
+        response = data['response']
+        return Response(response['docs'], response.get('numFound'),
+                        data.get('nextCursorMark'),
+                        bool(data.get('responseHeader', {}).get(
+                            'partialResults')))
+
+    def search(self, request, cache=None, deadline=None):
+        """
+        Send request and parse response.
+        Raw responses are stored in `cache`, by request fingerprint.
+        With `deadline`, socket timeout is its remaining time, and
+        partial response sets `deadline.partial` (and isn't cached).
+        """
+        with span(Phase.SERIALIZE) as s:
+            payload = self.serialize(request)
+            s.set(bytes_sent=len(payload))
+
+        raw = None
+        if cache is not None:
+            key = fingerprint(b'response', self.codec.name.encode(),
+                              self._cache_payload(request, payload))
+            raw = cache.get(key)
+        hit = raw is not None
+
+        if not hit:
+            with span(Phase.NETWORK, bytes_sent=len(payload)) as s:
+                if deadline is None:
+                    raw = self.send(payload)
+                else:
+                    deadline.check()
+                    try:
+                        raw = _send(self, payload, Action.SEARCH,
+                                    deadline.remaining())
+                    except _TIMEOUTS as e:
+                        if not deadline.expired:  # Backend's own timeout
+                            raise
+                        raise DeadlineExceeded("Deadline exceeded") from e
+                s.set(bytes_received=len(raw))
+
+        with span(Phase.PARSE, bytes_received=len(raw)) as s:
+            if cache is not None:
+                s.set(cache='hit' if hit else 'miss')
+            response = self.parse(raw)
+            s.set(hits=len(response.docs))
+
+        if response.partial:
+            if deadline is not None:
+                deadline.partial = True
+        elif cache is not None and not hit:
+            cache.set(key, raw)
+        return response
+
+    def _cache_payload(self, request, payload):
+        """Payload without time budget, which differs between requests"""
+        params = request.get('params') or {}
+        if 'timeAllowed' not in params:
+            return payload
+        params = {k: v for k, v in params.items() if k != 'timeAllowed'}
+        return self.serialize(dict(request, params=params))
+
+    def versions(self, raw):
+        """
+        New `_version_` of documents by id (as string), from response of
+        `bulk`. Empty, when engine doesn't report them.
+        """
+        adds = json.loads(raw).get('adds') or []
+        return {str(id): version
+                for id, version in zip(adds[::2], adds[1::2])}
+
+    def bulk(self, docs):
+        """Send list of serialized documents to index"""
+        payload = b'[' + b','.join(docs) + b']'
+        with span(Phase.NETWORK, bytes_sent=len(payload)) as s:
+            raw = self.send(payload, Action.INDEX)
+            s.set(bytes_received=len(raw))
+        return raw
+
+
+# Not alias of TimeoutError before Python 3.10
+_TIMEOUTS = (TimeoutError, socket.timeout)
+
+
+@lru_cache(maxsize=None)
+def _takes_timeout(cls):
+    parameters = inspect.signature(cls.send).parameters.values()
+    return any(p.name == 'timeout' or p.kind == p.VAR_KEYWORD
+               for p in parameters)
+
+
+def _send(backend, payload, action=Action.SEARCH, timeout=None):
+    """
+    Send with `timeout`, if backend supports it. Backends written
+    before deadlines were added don't take it.
+    """
+    if timeout is None or not _takes_timeout(type(backend)):
+        return backend.send(payload, action)
+    return backend.send(payload, action, timeout=timeout)
+
+
+class HTTPBackend(BaseBackend):
+    """
+    Sends JSON requests with POST to collection `url`.
+    Paths are relative to it, Solr's by default.
+
+    Responses are requested in `codec` format (`pso.serializers`), and
+    gzip/deflate compressed, if server supports it. With `compress`
+    ('gzip' or 'deflate'), request bodies larger than
+    `compress_min_size` bytes are compressed too (E.G. bulk updates),
+    server must accept compressed requests.
+    """
+
+    paths = {
+        Action.SEARCH: '/query',
+        Action.INDEX: '/update',
+    }
+
+    def __init__(self, url, timeout=None, codec=None, compress=None,
+                 compress_min_size=1024):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        if codec is not None:
+            self.codec = codec
+        if compress is not None and compress not in ENCODINGS:
+            raise PSOException("Unknown encoding {!r}".format(compress))
+        self.compress = compress
+        self.compress_min_size = compress_min_size
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {0.url}>".format(self)
+
+    def send(self, payload, action=Action.SEARCH, timeout=None):
+        url = self.url + self.paths[action]
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING,
+        }
+        if action == Action.INDEX:
+            url += '?versions=true'  # For optimistic concurrency
+        elif self.codec is not JSON:
+            url += '?wt=' + self.codec.wt
+            headers['Accept'] = self.codec.content_type
+        if self.compress and len(payload) >= self.compress_min_size:
+            payload = compress(payload, self.compress)
+            headers['Content-Encoding'] = self.compress
+
+        request = Request(url, data=payload, headers=headers)
+        if timeout is None or (self.timeout is not None
+                                and self.timeout < timeout):
+            timeout = self.timeout
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                return read_body(
+                    response, response.headers.get('Content-Encoding'))
+        except URLError as e:
+            if isinstance(e.reason, _TIMEOUTS):  # On connect
+                raise e.reason from e
+            raise
+
+
+class Replica:
+    """Backend of one replica, with latency and health statistics"""
+
+    __slots__ = ('backend', 'ewma', 'samples', 'failures', 'down_until',
+                 'clock')
+
+    def __init__(self, backend, window=100, clock=monotonic):
+        self.backend = backend
+        self.ewma = 0.0
+        self.samples = deque(maxlen=window)
+        self.failures = 0
+        self.down_until = 0
+        self.clock = clock
+
+    def __repr__(self):
+        return "<Replica: {0.backend!r} {0.ewma:.4f}s>".format(self)
+
+    @property
+    def healthy(self):
+        return self.down_until <= self.clock()
+
+    def percentile(self, p):
+        samples = sorted(self.samples)
+        return samples[int(p / 100 * (len(samples) - 1))]
+
+
+class ReplicaBackend(BaseBackend):
+    """
+    Routes requests to the fastest healthy replica of collection.
+
+    Latency of each replica is tracked as EWMA (`alpha` is weight of
+    new sample). Replica with `max_failures` consecutive failures is
+    skipped for `down_for` seconds, failed requests go to next one.
+
+    With `hedge_percentile`, when search request to the fastest replica
+    takes longer than that percentile of its latencies, the same
+    request is sent to the second one, and first answer is used.
+    Indexing requests are never hedged. Hedged requests run in pool of
+    `max_workers` threads, shared by all requests; when no worker is
+    free (E.G. all are waiting for stuck replica), request is sent
+    without hedging, in caller's thread.
+    """
+
+    def __init__(self, replicas, hedge_percentile=None, min_samples=20,
+                 alpha=0.3, max_failures=3, down_for=10, max_workers=16,
+                 clock=monotonic):
+        self.clock = clock  # Seconds, E.G. fake one in tests
+        self.replicas = [Replica(backend, clock=clock)
+                         for backend in replicas]
+        self.codec = self.replicas[0].backend.codec  # Same for all
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.down_for = down_for
+        self.hedged = 0  # Requests duplicated to second replica
+        self._lock = threading.Lock()  # Statistics are updated by workers
+        self._free = threading.BoundedSemaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {0.replicas!r}>".format(self)
+
+    def ranked(self):
+        """Healthy replicas by latency, then unhealthy ones"""
+        return sorted(self.replicas, key=lambda r: (not r.healthy, r.ewma))
+
+    def _call(self, replica, payload, action, expires=None):
+        start = self.clock()
+        try:
+            raw = _send(replica.backend, payload, action,
+                        None if expires is None else max(expires - start, 0))
+        except Exception:
+            with self._lock:
+                replica.failures += 1
+                if replica.failures >= self.max_failures:
+                    replica.down_until = self.clock() + self.down_for
+            raise
+        latency = self.clock() - start
+        with self._lock:
+            replica.failures = 0
+            replica.samples.append(latency)
+            replica.ewma = latency if not replica.ewma \
+                else self.alpha * latency + (1 - self.alpha) * replica.ewma
+        return raw
+
+    def _failover(self, replicas, payload, action, expires=None):
+        error = None
+        for replica in replicas:
+            if expires is not None and error is not None \
+               and self.clock() >= expires:
+                raise DeadlineExceeded("Deadline exceeded") from error
+            try:
+                return self._call(replica, payload, action, expires)
+            except Exception as e:
+                error = e
+        raise error
+
+    def _submit(self, func, *args):
+        """Run `func` in pool. Returns Future, or None if no worker is free"""
+        if not self._free.acquire(blocking=False):
+            return None
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda _: self._free.release())
+        return future
+
+    def send(self, payload, action=Action.SEARCH, timeout=None):
+        """
+        With `timeout`, failover and hedged requests share it:
+        each one gets time left.
+        """
+        expires = None if timeout is None else self.clock() + timeout
+        replicas = self.ranked()
+        primary = replicas[0]
+        if action != Action.SEARCH or self.hedge_percentile is None \
+           or len(replicas) < 2 or len(primary.samples) < self.min_samples:
+            return self._failover(replicas, payload, action, expires)
+
+        primary_future = self._submit(
+            self._call, primary, payload, action, expires)
+        if primary_future is None:
+            return self._failover(replicas, payload, action, expires)
+
+        with self._lock:
+            delay = primary.percentile(self.hedge_percentile)
+        if timeout is not None:
+            delay = min(delay, timeout)
+        done, _ = wait([primary_future], timeout=delay)
+        if done:
+            if primary_future.exception() is None:
+                return primary_future.result()
+            # Failed before hedging was needed, plain failover
+            return self._failover(replicas[1:], payload, action, expires)
+
+        futures = {primary_future}
+        hedge = self._submit(
+            self._failover, replicas[1:], payload, action, expires)
+        if hedge is not None:
+            with self._lock:
+                self.hedged += 1
+            futures.add(hedge)
+        error = None
+        while futures:
+            left = None if expires is None \
+                else max(expires - self.clock(), 0)
+            done, futures = wait(
+                futures, timeout=left, return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded("Deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if hedge is None:  # Primary failed, no hedge was sent
+            return self._failover(replicas[1:], payload, action, expires)
+        raise error
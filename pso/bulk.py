@@ -0,0 +1,200 @@
+"""
+Write-behind bulk indexing.
+
+    with BulkIndexer(Article.backend, max_docs=1000) as indexer:
+        for article in articles:
+            indexer.add(article)   # Blocks, when queue is full
+
+Documents are serialized by producers, batched by count and bytes
+in background thread and sent with `backend.bulk()`.
+"""
+import asyncio
+import logging
+import queue
+import threading
+from time import monotonic
+from time import sleep
+
+from pso.exceptions import PSOException
+
+
+log = logging.getLogger(__name__)
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class BulkIndexer:
+    """
+    Buffered bulk indexer.
+
+    Batch is sent when it has `max_docs` documents, `max_bytes` of
+    payload, or when `interval` seconds passed since previous send.
+    Failed batches are retried `retries` times, with exponential
+    `backoff`, then passed to `on_error(docs, exception)`.
+    Producers are blocked, when `queue_size` documents are waiting.
+    """
+
+    def __init__(self, backend, max_docs=500, max_bytes=5 * 1024 * 1024,
+                 interval=1.0, queue_size=10000, retries=3, backoff=0.5,
+                 on_error=None):
+        self.backend = backend
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.on_error = on_error or self._log_error
+        self.sent_docs = 0
+        self.failed_docs = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._lock = threading.Lock()  # Closing and enqueuing
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {0.backend!r}>".format(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, model, timeout=None):
+        """
+        Serialize and enqueue model. Raises queue.Full on timeout.
+        Loaded models with changes are sent as partial updates.
+        Model is marked clean, when its batch is sent, and takes new
+        `_version_` from response. Changes made after `add` are kept.
+        """
+        self._put(self.backend.serialize(model.to_save()), model, timeout)
+
+    def add_many(self, models, timeout=None):
+        """
+        Same as `add` for list of models of one class, in same order.
+        New documents are converted with batch field converters.
+        On queue.Full, models enqueued before are still sent.
+        """
+        if not models:
+            return
+        serialize = self.backend.serialize
+        new = [m for m in models if not (m._loaded and m._updates)]
+        converted = iter(type(models[0]).to_index_many(new))
+        for model in models:
+            if model._loaded and model._updates:
+                doc = model.to_update()
+            else:
+                doc = next(converted)
+            self._put(serialize(doc), model, timeout)
+
+    def add_raw(self, doc, timeout=None):
+        """Enqueue already serialized document"""
+        self._put(doc, None, timeout)
+
+    def _put(self, doc, model, timeout):
+        """Enqueue document, with model and its changes to clean on send"""
+        updates = None if model is None else dict(model._updates)
+        with self._lock:
+            self._check_open()
+            self._queue.put((doc, model, updates), timeout=timeout)
+
+    def _check_open(self):
+        if self._closed:
+            raise PSOException("Indexer is closed")
+
+    async def add_async(self, model):
+        """Coroutine friendly `add`. Waits for queue in executor"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.add, model)
+
+    def flush(self):
+        """Send everything enqueued. Blocks until done"""
+        with self._lock:
+            self._check_open()
+            self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Send everything enqueued and stop. Later `add` and `flush` fail"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def _run(self):
+        batch, size = [], 0
+        deadline = monotonic() + self.interval
+
+        while True:
+            try:
+                item = self._queue.get(
+                    timeout=max(deadline - monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            if item is None or item is _FLUSH or item is _CLOSE:
+                if batch:
+                    self._send(batch)
+                batch, size = [], 0
+                deadline = monotonic() + self.interval
+                if item is not None:
+                    self._queue.task_done()
+                if item is _CLOSE:
+                    return
+                continue
+
+            if batch and size + len(item[0]) > self.max_bytes:
+                self._send(batch)
+                batch, size = [], 0
+            batch.append(item)
+            size += len(item[0])
+
+            if len(batch) >= self.max_docs or size >= self.max_bytes \
+               or monotonic() >= deadline:
+                self._send(batch)
+                batch, size = [], 0
+                deadline = monotonic() + self.interval
+
+    def _send(self, batch):
+        docs = [doc for doc, _, _ in batch]
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    raw = self.backend.bulk(docs)
+                except Exception as e:
+                    if attempt == self.retries:
+                        self.failed_docs += len(docs)
+                        self._report(docs, e)
+                    else:
+                        sleep(self.backoff * 2 ** attempt)
+                else:
+                    self.sent_docs += len(docs)
+                    self._mark_saved(batch, raw)
+                    break
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _mark_saved(self, batch, raw):
+        """Sent models take new versions and forget sent changes"""
+        models = [item for item in batch if item[1] is not None]
+        if not models:
+            return
+        versions = self.backend.versions(raw)
+        for _, model, updates in models:
+            model.mark_saved(versions, updates)
+
+    def _report(self, docs, exc):
+        """Call `on_error`. Its failures are logged, to keep thread alive"""
+        try:
+            self.on_error(docs, exc)
+        except Exception:
+            log.exception("on_error of %r failed", self)
+
+    @staticmethod
+    def _log_error(batch, exc):
+        log.error("Bulk of %d documents failed: %r", len(batch), exc)
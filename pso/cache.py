@@ -0,0 +1,209 @@
+"""
+Caches for compiled queries and raw engine responses.
+
+    Article.cache = SharedCache('/dev/shm/pso-articles', ttl=30)
+
+`SharedCache` lives in memory-mapped file, so all pre-forked workers
+on host use one copy. Keys are `pso.encoding.fingerprint()` of
+immutable Q/Range objects and request payloads.
+
+Cached responses are not invalidated by writes (`save()`, `BulkIndexer`),
+so `ttl` (seconds) is required: it bounds how stale search results are.
+"""
+import abc
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import time
+
+from pso.exceptions import PSOException
+
+
+class BaseCache(metaclass=abc.ABCMeta):
+    """Bytes values by fingerprint keys"""
+
+    @staticmethod
+    def _check_ttl(ttl):
+        if ttl is None or ttl <= 0:
+            raise PSOException("Cache ttl must be positive, got {!r}"
+                               .format(ttl))
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Return value or None"""
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl=None):
+        """Store value. Returns False if it can't be stored"""
+
+
+class LocalCache(BaseCache):
+    """In-process LRU cache"""
+
+    def __init__(self, size=1024, ttl=60):
+        self._check_ttl(ttl)
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires and expires < time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        with self._lock:
+            self._data[key] = (value, time() + ttl if ttl else 0)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+        return True
+
+
+def _reset_lock():
+    SharedCache._lock = threading.Lock()  # May be held by other thread
+
+
+os.register_at_fork(after_in_child=_reset_lock)
+
+
+class SharedCache(BaseCache):
+    """
+    Cache in memory-mapped file, shared between processes.
+
+    Set-associative table of `slots` fixed-size slots, `WAYS` per set.
+    The oldest written slot of set is evicted. Values larger than slot
+    are not cached.
+
+    Reads are lock-free: each slot has sequence number, odd while slot
+    is written, so torn reads are detected and treated as misses.
+    Writes are serialized with record lock of file (`lockf`), which
+    belongs to process, so workers forked after opening the cache
+    exclude each other. Record locks don't exclude threads and
+    instances of one process, they share class lock.
+    """
+
+    WAYS = 4
+    MAGIC = b'PSOC'
+    # magic, slots, slot_size, write counter
+    _file_header = struct.Struct('<4sIIQ')
+    # seq, stamp, key, expires, length
+    _slot_header = struct.Struct('<IQ16sdI')
+    _lock = threading.Lock()
+
+    def __init__(self, path, slots=4096, slot_size=4096, ttl=60):
+        self._check_ttl(ttl)
+        if slots < self.WAYS:
+            raise PSOException("SharedCache needs at least {} slots"
+                               .format(self.WAYS))
+        self.path = path
+        self.ttl = ttl
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        with self._locked():
+            header = os.pread(self._fd, self._file_header.size, 0)
+            if len(header) == self._file_header.size \
+               and header[:4] == self.MAGIC:
+                _, slots, slot_size, _ = self._file_header.unpack(header)
+            else:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(
+                    self._fd, self._file_header.size + slots * slot_size)
+                os.pwrite(self._fd, self._file_header.pack(
+                    self.MAGIC, slots, slot_size, 0), 0)
+
+        self.slots = slots - slots % self.WAYS
+        self.slot_size = slot_size
+        self.max_value_size = slot_size - self._slot_header.size
+        self._mm = mmap.mmap(
+            self._fd, self._file_header.size + slots * slot_size)
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {0.path}>".format(self)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock of file, between threads and processes"""
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _offsets(self, key):
+        first = int.from_bytes(key[:8], 'little') % (self.slots // self.WAYS)
+        for way in range(self.WAYS):
+            yield self._file_header.size \
+                + (first * self.WAYS + way) * self.slot_size
+
+    def get(self, key):
+        mm = self._mm
+        for offset in self._offsets(key):
+            seq, stamp, slot_key, expires, length = \
+                self._slot_header.unpack_from(mm, offset)
+            if seq & 1 or slot_key != key:
+                continue
+            start = offset + self._slot_header.size
+            value = mm[start:start + length]
+            if struct.unpack_from('<I', mm, offset)[0] != seq:
+                return None  # Changed while reading
+            if expires and expires < time():
+                return None
+            return value
+        return None
+
+    def set(self, key, value, ttl=None):
+        if len(value) > self.max_value_size:
+            return False
+        ttl = ttl or self.ttl
+        expires = time() + ttl if ttl else 0
+        mm = self._mm
+
+        with self._locked():
+            victim = None
+            for offset in self._offsets(key):
+                seq, stamp, slot_key = \
+                    self._slot_header.unpack_from(mm, offset)[:3]
+                if slot_key == key or not stamp:
+                    victim = (offset, seq)
+                    break
+                if victim is None or stamp < victim[2]:
+                    victim = (offset, seq, stamp)
+            offset, seq = victim[:2]
+
+            counter = self._file_header.unpack_from(mm, 0)[3] + 1
+            struct.pack_into('<Q', mm, 12, counter)
+
+            writing = (seq + 1) & 0xFFFFFFFF  # Odd
+            struct.pack_into('<I', mm, offset, writing)
+            start = offset + self._slot_header.size
+            mm[start:start + len(value)] = value
+            self._slot_header.pack_into(
+                mm, offset, writing, counter, key, expires, len(value))
+            struct.pack_into('<I', mm, offset, (seq + 2) & 0xFFFFFFFF)
+        return True
+
+
+def _reset_lock():
+    SharedCache._lock = threading.Lock()  # May be held by other thread
+
+
+os.register_at_fork(after_in_child=_reset_lock)
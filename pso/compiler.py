@@ -0,0 +1,83 @@
+"""
+Compile Q objects to lucene query syntax.
+
+(Q('title') == 'search') & (Q('price') >= 100) ->
+    (title:"search" AND price:[100 TO *])
+"""
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+
+from pso.constants import NoValue
+from pso.constants import Condition
+from pso.datemath import DateMath
+from pso.range import Range
+
+
+MATCH_ALL = '*:*'
+MATCH_NONE = '-' + MATCH_ALL
+
+
+def compile_value(value):
+    if value is NoValue or value is None:
+        return '*'
+    if isinstance(value, DateMath):  # Resolved by engine
+        return str(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime('"%Y-%m-%dT%H:%M:%S.%fZ"')
+    if isinstance(value, date):
+        return value.strftime('"%Y-%m-%dT00:00:00Z"')
+    if isinstance(value, (int, float)):
+        return str(value)
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return '"{}"'.format(value)
+
+
+def compile_range(value):
+    return '{open}{fr} TO {to}{close}'.format(
+        open='[' if value.fr_incl or value.fr is NoValue else '{',
+        fr=compile_value(value.fr),
+        to=compile_value(value.to),
+        close=']' if value.to_incl or value.to is NoValue else '}',
+    )
+
+
+def compile_condition(operation, value):
+    """Value part of leaf Q, without field name"""
+    rng = Range.from_condition(operation, value)
+    if rng is not None:
+        return compile_range(rng)
+    if operation == Condition.IN:
+        return '({})'.format(' OR '.join(compile_value(v) for v in value))
+    if value is NoValue:  # Field only. Check for existence
+        return '*'
+    return compile_value(value)
+
+
+def compile_q(q, field=None, nested=False):
+    """
+    Compile Q object to lucene query string.
+    `field` is inherited from parent for field-level aggregations.
+    Nested negations are wrapped with `*:*`, because pure negative
+    clauses inside boolean query match nothing.
+    """
+    field = q.field or field
+
+    if q.childs:
+        body = '({})'.format(' {} '.format(q.operator).join(
+            compile_q(child, field, True) for child in q.childs))
+    else:
+        body = compile_condition(q.operation, q.value)
+        if field:
+            body = '{}:{}'.format(field, body)
+
+    inverted = q.inverted ^ (q.operation == Condition.NE)
+    if q.boost != 1:
+        body = '{}^{}'.format(body, q.boost)
+    if inverted:
+        body = '({} -{})'.format(MATCH_ALL, body) if nested else '-' + body
+    return body
@@ -33,6 +33,13 @@ class Condition:
     RANGE = 'range'
 
 
+class Update:
+    """Constants to define atomic update operations"""
+    SET = 'set'
+    ADD = 'add'
+    INC = 'inc'
+
+
 RANGE_CONDITIONS = [
     Condition.LT,
     Condition.LE,
@@ -0,0 +1,274 @@
+"""
+Relative dates, compiled to engine's date math.
+
+    Q('published') > NOW - timedelta(days=1)          -> [NOW-1DAY TO *]
+    Q(published__gte=(NOW - timedelta(days=7)).round(DAY))
+                                                      -> [NOW-7DAY/DAY TO *]
+
+Query with `datetime.now()` is unique each time, so it's never
+cached. Expression is the same, and engine resolves it. Rounding makes
+resolved value change rarely, so engine caches filter too.
+
+Rounding can be set per field. It's applied to expressions without
+explicit rounding, when queryset is compiled:
+
+    class Article(BaseModel):
+        published = DateTimeField(rounding=MINUTE)
+"""
+from calendar import monthrange
+from collections import namedtuple
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+import re
+
+from pso.constants import NoValue
+from pso.range import Range
+
+
+# Units
+YEAR = 'YEAR'
+MONTH = 'MONTH'
+DAY = 'DAY'
+HOUR = 'HOUR'
+MINUTE = 'MINUTE'
+SECOND = 'SECOND'
+MILLISECOND = 'MILLISECOND'
+
+# Units of fixed length, longest first
+_FIXED = (
+    (DAY, timedelta(days=1)),
+    (HOUR, timedelta(hours=1)),
+    (MINUTE, timedelta(minutes=1)),
+    (SECOND, timedelta(seconds=1)),
+    (MILLISECOND, timedelta(milliseconds=1)),
+)
+_LENGTHS = dict(_FIXED)
+_MONTHS = {YEAR: 12, MONTH: 1}
+
+# Fields of datetime, which are reset by rounding to unit
+_TRUNCATE = {
+    YEAR: {'month': 1, 'day': 1, 'hour': 0, 'minute': 0, 'second': 0,
+           'microsecond': 0},
+    MONTH: {'day': 1, 'hour': 0, 'minute': 0, 'second': 0,
+            'microsecond': 0},
+    DAY: {'hour': 0, 'minute': 0, 'second': 0, 'microsecond': 0},
+    HOUR: {'minute': 0, 'second': 0, 'microsecond': 0},
+    MINUTE: {'second': 0, 'microsecond': 0},
+    SECOND: {'microsecond': 0},
+}
+
+_STEP = re.compile(r'([+-])(\d+)([A-Z]+?)S?(?=[-+/]|$)|/([A-Z]+?)S?$')
+
+
+def utcnow():
+    """Naive UTC datetime, as DateTimeField values"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _check_unit(unit):
+    if unit not in _LENGTHS and unit not in _MONTHS:
+        raise ValueError("Unknown date math unit {!r}".format(unit))
+    return unit
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    year, month = value.year + month // 12, month % 12 + 1
+    day = min(value.day, monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def _round(value, unit):
+    if unit == MILLISECOND:
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value.replace(**_TRUNCATE[unit])
+
+
+class DateMath(namedtuple('DateMath', ['offsets', 'rounding'])):
+    """
+    NOW, shifted by `offsets` ((amount, unit) pairs), rounded down to
+    `rounding` unit. Immutable, use `NOW` and operators to build.
+    """
+
+    def __new__(cls, offsets=(), rounding=None):
+        if rounding is not None:
+            _check_unit(rounding)
+        for _, unit in offsets:
+            _check_unit(unit)
+        return super().__new__(cls, tuple(offsets), rounding)
+
+    def __str__(self):
+        return 'NOW' + ''.join(
+            '{:+d}{}'.format(amount, unit) for amount, unit in self.offsets
+        ) + ('/' + self.rounding if self.rounding else '')
+
+    def __repr__(self):
+        return '<DateMath {}>'.format(self)
+
+    @classmethod
+    def parse(cls, text):
+        """DateMath from engine syntax. E.G. 'NOW-1DAY/DAY'"""
+        if not text.startswith('NOW'):
+            raise ValueError("Date math must start with NOW: {!r}".format(
+                text))
+        offsets, rounding, pos = [], None, 3
+        while pos < len(text):
+            match = _STEP.match(text, pos)
+            if match is None:
+                raise ValueError("Bad date math {!r}".format(text))
+            sign, amount, unit, round_unit = match.groups()
+            if round_unit:
+                rounding = round_unit
+            else:
+                offsets.append((int(sign + amount), unit))
+            pos = match.end()
+        return cls(offsets, rounding)
+
+    def shift(self, amount, unit):
+        """Add `amount` of units. Rounding stays last"""
+        return self._replace(
+            offsets=self.offsets + ((amount, _check_unit(unit)), ))
+
+    def round(self, unit):
+        """Round down to unit. E.G. NOW/DAY is start of today"""
+        return self._replace(rounding=_check_unit(unit))
+
+    def __add__(self, other):
+        if not isinstance(other, timedelta):
+            return NotImplemented
+        # Longest unit, which expresses delta exactly
+        sign = -1 if other < timedelta(0) else 1
+        for unit, length in _FIXED:
+            if abs(other) % length == timedelta(0):
+                return self.shift(sign * (abs(other) // length), unit)
+        raise ValueError(
+            "Date math precision is milliseconds: {!r}".format(other))
+
+    def __sub__(self, other):
+        if not isinstance(other, timedelta):
+            return NotImplemented
+        return self + (-other)
+
+    def resolve(self, now=None):
+        """Datetime, as engine resolves it at `now`"""
+        value = utcnow() if now is None else now
+        for amount, unit in self.offsets:
+            if unit in _MONTHS:
+                value = _add_months(value, amount * _MONTHS[unit])
+            else:
+                value += amount * _LENGTHS[unit]
+        if self.rounding:
+            value = _round(value, self.rounding)
+        return value
+
+    # Equality and ordering use one key: rounding, then shift in months
+    # and in fixed units (NOW-24HOUR == NOW-1DAY). Expressions are
+    # ordered only when rounded the same way, and shifted by same
+    # months or same fixed length. Else (or with datetime) TypeError is
+    # raised: they are never resolved with current time, so ranges
+    # aren't merged differently from one request to another.
+    def _key(self):
+        months, fixed = 0, timedelta(0)
+        for amount, unit in self.offsets:
+            if unit in _MONTHS:
+                months += amount * _MONTHS[unit]
+            else:
+                fixed += amount * _LENGTHS[unit]
+        return self.rounding, months, fixed
+
+    def _cmp_keys(self, other):
+        if isinstance(other, DateMath):
+            (r1, m1, f1), (r2, m2, f2) = self._key(), other._key()
+            if r1 == r2 and (m1 == m2 or f1 == f2):
+                return (m1, f1), (m2, f2)
+        raise TypeError("Can not compare {!r} with {!r}".format(self, other))
+
+    def __eq__(self, other):
+        if not isinstance(other, DateMath):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        if not isinstance(other, DateMath):
+            return NotImplemented
+        return self._key() != other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __lt__(self, other):
+        a, b = self._cmp_keys(other)
+        return a < b
+
+    def __le__(self, other):
+        a, b = self._cmp_keys(other)
+        return a <= b
+
+    def __gt__(self, other):
+        a, b = self._cmp_keys(other)
+        return a > b
+
+    def __ge__(self, other):
+        a, b = self._cmp_keys(other)
+        return a >= b
+
+
+NOW = DateMath()
+
+
+def resolve_dates(value, now=None):
+    """
+    Value with date math resolved at `now` (current UTC time by
+    default), also inside Range, lists and tuples. For evaluation
+    without engine.
+    """
+    now = utcnow() if now is None else now
+    if isinstance(value, DateMath):
+        return value.resolve(now)
+    if isinstance(value, Range):
+        return value._replace(fr=resolve_dates(value.fr, now),
+                              to=resolve_dates(value.to, now))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return type(value)(resolve_dates(v, now) for v in value)
+    return value
+
+
+def has_dates(value):
+    """Value has date math, also inside Range, lists and tuples"""
+    if isinstance(value, DateMath):
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):  # Range too
+        return any(has_dates(v) for v in value)
+    return False
+
+
+def _round_value(value, unit):
+    if isinstance(value, DateMath) and value.rounding is None:
+        return value.round(unit)
+    if isinstance(value, Range):
+        fr, to = _round_value(value.fr, unit), _round_value(value.to, unit)
+        if fr is not value.fr or to is not value.to:
+            return value._replace(fr=fr, to=to)
+    return value
+
+
+def round_dates(q, model, field=None):
+    """
+    Apply rounding of model's fields to date math values of Q.
+    Explicitly rounded expressions are kept.
+    """
+    fields = getattr(model, '_field_map', {})
+    field = q.field or field
+    if q.childs:
+        childs = tuple(round_dates(child, model, field)
+                       for child in q.childs)
+        if all(new is old for new, old in zip(childs, q.childs)):
+            return q
+        return q._replace(childs=childs)
+
+    unit = getattr(fields.get(field), 'rounding', None)
+    if unit is None or q.value is NoValue:
+        return q
+    value = _round_value(q.value, unit)
+    return q if value is q.value else q._replace(value=value)
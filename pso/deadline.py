@@ -0,0 +1,56 @@
+"""
+Time budgets of QuerySet execution.
+
+    qs = Article.objects.search(title='fox').deadline(0.2)
+
+Budget starts, when QuerySet is executed. One `Deadline` is shared
+by all requests of execution: pages, prefetch, replicas and hedged
+requests. Part of remaining time is sent to engine as `timeAllowed`,
+so engine returns partial results before client socket times out.
+Deadline of incoming request can be passed to be shared as is:
+
+    deadline = Deadline(0.5)
+    articles = Article.objects.deadline(deadline).fetch()
+    authors = Author.objects.deadline(deadline).fetch()
+"""
+from time import monotonic
+
+from pso.exceptions import DeadlineExceeded
+
+
+class Deadline:
+    """
+    Point in time, when results are needed.
+    `partial` is set, when any request returned incomplete results.
+    """
+
+    __slots__ = ('expires', 'partial', 'clock')
+
+    # Part of remaining time given to engine, rest is for network
+    # and parsing.
+    engine_share = 0.8
+
+    def __init__(self, budget, clock=monotonic):
+        self.clock = clock  # Seconds, E.G. fake one in tests
+        self.expires = clock() + budget
+        self.partial = False
+
+    def __repr__(self):
+        return "<Deadline: {:.3f}s left>".format(self.remaining())
+
+    def remaining(self):
+        """Seconds left, not negative"""
+        return max(self.expires - self.clock(), 0.0)
+
+    @property
+    def expired(self):
+        return self.clock() >= self.expires
+
+    def check(self):
+        """Raise `DeadlineExceeded`, if no time left"""
+        if self.expired:
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def time_allowed(self):
+        """Engine's time budget in milliseconds, at least 1"""
+        return max(int(self.remaining() * self.engine_share * 1000), 1)
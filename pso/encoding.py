@@ -0,0 +1,484 @@
+"""
+Compact binary encoding for Q trees and QuerySet state.
+
+    data = encode(q)
+    assert decode(data) == q
+
+Unlike pickle, only known types are decoded, so data from other
+processes/hosts is safe to load. Format is versioned and stable:
+`fingerprint()` of equal queries is equal in every process.
+
+Q, Range, NoValue and operator/condition constants are small tags.
+Encoded (and decoded) queries are memoized, as Q objects are immutable,
+so hot queries cost one dict lookup. Encoding memo is by identity,
+because equal Q objects may hold values of different types (1 == True).
+Values with lists or sets inside are not memoized: they may change.
+"""
+import hashlib
+import struct
+from collections import OrderedDict
+from datetime import date
+from datetime import datetime
+
+from pso.constants import Condition
+from pso.constants import NoValue
+from pso.constants import Operator
+from pso.datemath import DateMath
+from pso.exceptions import PSOException
+from pso.q import Q
+from pso.range import Range
+from pso.utils import memoize
+
+
+VERSION = b'\x01'
+
+# Value tags
+NONE, NOVALUE, TRUE, FALSE, SMALLINT, INT, BIGINT, FLOAT, STR, BYTES, \
+    LIST, TUPLE, SET, RANGE, Q_TAG, DATETIME, DATE, DATEMATH = range(18)
+
+# Constants tags. Order is part of format, append only.
+_OPERATIONS = (None, Condition.LT, Condition.LE, Condition.EQ, Condition.NE,
+               Condition.GT, Condition.GE, Condition.IN, Condition.RANGE)
+_OPERATORS = (Operator.AND, Operator.OR, Operator.XOR)
+_OTHER = 0xFF  # Not predefined constant, followed by string
+
+_OPERATION_TAGS = {v: i for i, v in enumerate(_OPERATIONS)}
+_OPERATOR_TAGS = {v: i for i, v in enumerate(_OPERATORS)}
+
+_int = struct.Struct('<q')
+_float = struct.Struct('<d')
+_length = struct.Struct('<I')
+
+MAX_DEPTH = 100  # Of decoded values
+_encoded = OrderedDict()
+_decoded = OrderedDict()
+
+
+class EncodingError(PSOException):
+    """Value can not be encoded or data is broken"""
+
+
+# Encoder
+def _write_length(out, n):
+    if n < 0xFF:
+        out.append(n)
+    else:
+        out.append(0xFF)
+        out += _length.pack(n)
+
+
+def _write_str(out, value):
+    data = value.encode('utf-8')
+    if len(data) < 0xFF:
+        out.append(len(data))
+    else:
+        _write_length(out, len(data))
+    out += data
+
+
+def _write_constant(out, tags, value):
+    tag = tags.get(value)
+    if tag is None:
+        out.append(_OTHER)
+        _write_str(out, value)
+    else:
+        out.append(tag)
+
+
+_BOOST_1 = bytes((SMALLINT, 1))
+
+
+class _Buffer(bytearray):
+    """Output, which notes mutable containers written to it"""
+    mutable = False
+
+
+def _write_none(out, value, canonical):
+    out.append(NONE)
+
+
+def _write_novalue(out, value, canonical):
+    out.append(NOVALUE)
+
+
+def _write_bool(out, value, canonical):
+    out.append(TRUE if value else FALSE)
+
+
+def _write_datemath(out, value, canonical):
+    out.append(DATEMATH)
+    _write_str(out, str(value))
+
+
+def _write_range(out, value, canonical):
+    out.append(RANGE)
+    for item in value:
+        _write(out, item, canonical)
+
+
+def _write_int(out, value, canonical):
+    if -128 <= value < 128:
+        out.append(SMALLINT)
+        out += value.to_bytes(1, 'little', signed=True)
+    elif -2 ** 63 <= value < 2 ** 63:
+        out.append(INT)
+        out += _int.pack(value)
+    else:
+        out.append(BIGINT)
+        _write_str(out, str(value))
+
+
+def _write_float(out, value, canonical):
+    out.append(FLOAT)
+    out += _float.pack(value)
+
+
+def _write_string(out, value, canonical):
+    out.append(STR)
+    _write_str(out, value)
+
+
+def _write_bytes(out, value, canonical):
+    out.append(BYTES)
+    _write_length(out, len(value))
+    out += value
+
+
+def _write_datetime(out, value, canonical):
+    out.append(DATETIME)
+    _write_str(out, value.isoformat())
+
+
+def _write_date(out, value, canonical):
+    out.append(DATE)
+    _write_str(out, value.isoformat())
+
+
+def _write_set(out, value, canonical):
+    if not isinstance(value, frozenset):
+        out.mutable = True
+    out.append(SET)
+    _write_items(out, value, canonical=True, sort=True)
+
+
+def _write_sequence(out, value, canonical):
+    if isinstance(value, list):
+        out.mutable = True
+        out.append(LIST)
+    else:
+        out.append(TUPLE)
+    _write_items(out, value, canonical)
+
+
+def _write(out, value, canonical):
+    writer = _WRITERS.get(type(value))
+    if writer is None:
+        writer = _writer(value)
+    writer(out, value, canonical)
+
+
+def _writer(value):
+    """Writer of subclass of known type"""
+    if value is NoValue:
+        return _write_novalue
+    for cls, writer in _SUBCLASS_WRITERS:
+        if isinstance(value, cls):
+            return writer
+    raise EncodingError("Can not encode {!r}".format(value))
+
+
+def _write_items(out, items, canonical, sort=False):
+    _write_length(out, len(items))
+    if sort:
+        encoded = []
+        for item in items:
+            buf = _Buffer()
+            _write(buf, item, canonical)
+            out.mutable |= buf.mutable
+            encoded.append(buf)
+        for buf in sorted(encoded):
+            out += buf
+    else:
+        for item in items:
+            writer = _WRITERS.get(type(item)) or _writer(item)
+            writer(out, item, canonical)
+
+
+def _write_q(out, q, canonical):
+    field, operation, value, operator, inverted, childs, boost = q
+    out.append(Q_TAG)
+    # Common field, flags and boost types are written inline
+    if type(field) is str:
+        out.append(STR)
+        _write_str(out, field)
+    else:
+        _write(out, field, canonical)
+    _write_constant(out, _OPERATION_TAGS, operation)
+    writer = _WRITERS.get(type(value)) or _writer(value)
+    writer(out, value, canonical)
+    _write_constant(out, _OPERATOR_TAGS, operator)
+    if inverted is True or inverted is False:
+        out.append(TRUE if inverted else FALSE)
+    else:
+        _write(out, inverted, canonical)
+    if boost == 1 and type(boost) is int:
+        out += _BOOST_1
+    else:
+        _write(out, boost, canonical)
+    # Childs order doesn't change query, so sorted for fingerprints.
+    if childs:
+        _write_items(out, childs, canonical, sort=canonical)
+    else:
+        out.append(0)
+
+
+# Writers by exact type, subclasses are looked up in order
+_SUBCLASS_WRITERS = (
+    (Q, _write_q),
+    (DateMath, _write_datemath),
+    (Range, _write_range),
+    (bool, _write_bool),
+    (int, _write_int),
+    (float, _write_float),
+    (str, _write_string),
+    (bytes, _write_bytes),
+    (datetime, _write_datetime),
+    (date, _write_date),
+    ((set, frozenset), _write_set),
+    ((list, tuple), _write_sequence),
+)
+_WRITERS = {
+    type(None): _write_none,
+    type(NoValue): _write_novalue,
+    Q: _write_q,
+    DateMath: _write_datemath,
+    Range: _write_range,
+    bool: _write_bool,
+    int: _write_int,
+    float: _write_float,
+    str: _write_string,
+    bytes: _write_bytes,
+    datetime: _write_datetime,
+    date: _write_date,
+    set: _write_set,
+    frozenset: _write_set,
+    list: _write_sequence,
+    tuple: _write_sequence,
+}
+
+
+def encode(value, canonical=False):
+    """
+    Encode Q, Range or plain value to bytes.
+    `canonical` sorts Q childs, so equal queries have equal encoding.
+    Values without mutable containers (lists, sets) are memoized.
+    """
+    key = (id(value), canonical)
+    cached = _encoded.get(key)
+    if cached is not None and cached[0] is value:
+        return cached[1]
+
+    out = _Buffer(VERSION)
+    _write(out, value, canonical)
+    data = bytes(out)
+    if not out.mutable:
+        memoize(_encoded, key, (value, data))
+    return data
+
+
+def fingerprint(*parts):
+    """
+    16 bytes stable key. Equal for equal Q trees in every process.
+    Bytes parts are used as is.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = encode(part, canonical=True)
+        digest.update(part)
+        digest.update(b'\x00')
+    return digest.digest()
+
+
+# Decoder
+def _read_length(data, pos):
+    n = data[pos]
+    if n < 0xFF:
+        return n, pos + 1
+    return _length.unpack_from(data, pos + 1)[0], pos + 5
+
+
+def _read_str(data, pos):
+    n, pos = _read_length(data, pos)
+    return data[pos:pos + n].decode('utf-8'), pos + n
+
+
+def _read_constant(data, pos, constants):
+    tag = data[pos]
+    if tag == _OTHER:
+        return _read_str(data, pos + 1)
+    return constants[tag], pos + 1
+
+
+def _read_items(data, pos, depth):
+    n, pos = _read_length(data, pos)
+    items = []
+    for _ in range(n):
+        item, pos = _read(data, pos, depth)
+        items.append(item)
+    return items, pos
+
+
+def _read(data, pos, depth=0):
+    if depth > MAX_DEPTH:
+        raise EncodingError("Nesting is deeper than {}".format(MAX_DEPTH))
+    depth += 1
+    tag = data[pos]
+    pos += 1
+    if tag == Q_TAG:
+        field, pos = _read(data, pos, depth)
+        operation, pos = _read_constant(data, pos, _OPERATIONS)
+        value, pos = _read(data, pos, depth)
+        operator, pos = _read_constant(data, pos, _OPERATORS)
+        inverted, pos = _read(data, pos, depth)
+        boost, pos = _read(data, pos, depth)
+        childs, pos = _read_items(data, pos, depth)
+        return Q._make((field, operation, value, operator, inverted,
+                        tuple(childs), boost)), pos
+    if tag == STR:
+        return _read_str(data, pos)
+    if tag == SMALLINT:
+        return int.from_bytes(data[pos:pos + 1], 'little', signed=True), \
+            pos + 1
+    if tag in _SIMPLE:
+        return _SIMPLE[tag], pos
+    if tag == INT:
+        return _int.unpack_from(data, pos)[0], pos + 8
+    if tag == FLOAT:
+        return _float.unpack_from(data, pos)[0], pos + 8
+    if tag == RANGE:
+        fr, pos = _read(data, pos, depth)
+        to, pos = _read(data, pos, depth)
+        fr_incl, pos = _read(data, pos, depth)
+        to_incl, pos = _read(data, pos, depth)
+        return Range(fr, to, fr_incl, to_incl), pos
+    if tag in (LIST, TUPLE, SET):
+        items, pos = _read_items(data, pos, depth)
+        try:
+            return _CONTAINERS[tag](items), pos
+        except TypeError as e:  # Unhashable set items
+            raise EncodingError("Broken set") from e
+    if tag == BYTES:
+        n, pos = _read_length(data, pos)
+        return data[pos:pos + n], pos + n
+    if tag in _PARSED:
+        text, pos = _read_str(data, pos)
+        try:
+            return _PARSED[tag](text), pos
+        except ValueError as e:
+            raise EncodingError("Broken value {!r}".format(text)) from e
+    raise EncodingError("Unknown tag {}".format(tag))
+
+
+_SIMPLE = {NONE: None, NOVALUE: NoValue, TRUE: True, FALSE: False}
+_CONTAINERS = {LIST: list, TUPLE: tuple, SET: frozenset}
+_PARSED = {
+    BIGINT: int,
+    DATETIME: datetime.fromisoformat,
+    DATE: date.fromisoformat,
+    DATEMATH: DateMath.parse,
+}
+
+
+def _is_immutable(value):
+    """No lists inside. Only such values are shared from memo"""
+    if isinstance(value, (list, set)):
+        return False
+    if isinstance(value, Q):
+        return _is_immutable(value.value) \
+            and all(_is_immutable(child) for child in value.childs)
+    if isinstance(value, (tuple, frozenset)):  # Range too
+        return all(_is_immutable(item) for item in value)
+    return True
+
+
+def decode(data):
+    """
+    Decode value from bytes. Raises EncodingError for any broken data.
+    Values with lists are decoded each time, as lists are mutable.
+    """
+    data = bytes(data)
+    cached = _decoded.get(data)
+    if cached is not None:
+        return cached
+
+    if data[:1] != VERSION:
+        raise EncodingError("Unsupported encoding version")
+    try:
+        value, pos = _read(data, 1)
+    except (IndexError, struct.error, UnicodeDecodeError,
+            RecursionError) as e:
+        raise EncodingError("Broken data") from e
+    if pos != len(data):
+        raise EncodingError("Trailing data")
+
+    if _is_immutable(value):
+        memoize(_decoded, data, value)
+    return value
+
+
+# QuerySet state
+def encode_queryset(qs):
+    """Encode QuerySet. Classes are referenced by 'module:qualname'"""
+    model = qs._model
+    return encode((
+        '{}:{}'.format(model.__module__, model.__qualname__),
+        '{}:{}'.format(type(qs).__module__, type(qs).__qualname__),
+        qs._offset, qs._limit, tuple(qs._filter), qs._search, qs._prefetch,
+    ))
+
+
+def _subclasses(cls):
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _subclasses(subclass)
+
+
+def _resolve(path, base):
+    """
+    Subclass of `base` by 'module:qualname'. Nothing is imported or
+    called: only classes already defined in this process are found.
+    """
+    for cls in _subclasses(base):
+        if '{}:{}'.format(cls.__module__, cls.__qualname__) == path:
+            return cls
+    raise EncodingError("Unknown {} {!r}".format(base.__name__, path))
+
+
+def decode_queryset(data):
+    """
+    Decode QuerySet. Model and queryset class must be defined
+    (their modules imported) before.
+    """
+    # Models import this module
+    from pso.models import BaseModel
+    from pso.query import BaseQuerySet
+
+    try:
+        model, qs_class, offset, limit, filters, search, prefetch = \
+            decode(data)
+    except (TypeError, ValueError) as e:
+        raise EncodingError("Broken queryset") from e
+    if not isinstance(model, str) or not isinstance(qs_class, str) \
+            or not isinstance(filters, tuple) \
+            or not all(isinstance(q, Q) for q in filters) \
+            or not isinstance(search, (Q, type(None))):
+        raise EncodingError("Broken queryset")
+    qs = _resolve(qs_class, BaseQuerySet)(
+        model=_resolve(model, BaseModel))
+    for q in filters:
+        qs = qs.filter(q)
+    if search is not None:
+        qs = qs.search(search)
+    qs = qs._slice(offset, limit)
+    return qs.prefetch(prefetch)
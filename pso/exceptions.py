@@ -6,4 +6,12 @@ Exceptions for module and magic.
 class PSOException(Exception):
     """Generic Exception for package"""
 
+
+class QueryRejected(PSOException):
+    """Query is rejected by QueryPolicy. Second arg is the Q"""
+
+
+class DeadlineExceeded(PSOException):
+    """Time budget is spent before request is sent"""
+
 # class Field
@@ -0,0 +1,173 @@
+"""
+Query cost estimation and guard policies.
+
+    >>> explain((Q('price') > 10) & -Q(status='sold'))
+    Explain(depth=2, clauses=2, ranges=1, wildcards=0, negated_only=0,
+            cost=0)
+
+    Article.policy = QueryPolicy(max_clauses=1024, max_cost=Cost.HIGH)
+"""
+from collections import namedtuple
+
+from pso.constants import Condition
+from pso.constants import NoValue
+from pso.constants import Operator
+from pso.exceptions import QueryRejected
+from pso.range import Range
+
+
+class Cost:
+    """Constants to define estimated query cost class"""
+    LOW = 0
+    MEDIUM = 1
+    HIGH = 2
+
+
+# Weights of clause kinds, in "simple term" units.
+RANGE_WEIGHT = 4
+WILDCARD_WEIGHT = 25
+NEGATED_ONLY_WEIGHT = 10
+MEDIUM_COST = 32
+HIGH_COST = 256
+
+
+Explain = namedtuple(
+    'Explain',
+    ['depth', 'clauses', 'ranges', 'wildcards', 'negated_only', 'cost']
+)
+
+
+def is_negated(q):
+    return q.inverted ^ (q.operation == Condition.NE)
+
+
+def _is_wildcard(q):
+    if q.value is NoValue:  # Field existence: field:*
+        return True
+    values = q.value if q.operation == Condition.IN else (q.value, )
+    return any(isinstance(v, str) and ('*' in v or '?' in v)
+               for v in values)
+
+
+def _walk(q):
+    """Returns [depth, clauses, ranges, wildcards, negated_only]"""
+    if not q.childs:
+        is_range = Range.from_condition(q.operation, q.value) is not None
+        return [
+            1,
+            len(q.value) if q.operation == Condition.IN else 1,
+            int(is_range),
+            int(not is_range and _is_wildcard(q)),
+            0,
+        ]
+
+    stats = [0, 0, 0, 0, 0]
+    for child in q.childs:
+        child_stats = _walk(child)
+        stats[0] = max(stats[0], child_stats[0])
+        for i in range(1, 5):
+            stats[i] += child_stats[i]
+    stats[0] += 1
+    if all(is_negated(child) for child in q.childs):
+        stats[4] += 1
+    return stats
+
+
+def explain(q):
+    """Shape and estimated cost class of Q tree"""
+    depth, clauses, ranges, wildcards, negated_only = _walk(q)
+    if not q.childs and is_negated(q):
+        negated_only += 1
+
+    score = clauses + ranges * (RANGE_WEIGHT - 1) \
+        + wildcards * (WILDCARD_WEIGHT - 1) \
+        + negated_only * NEGATED_ONLY_WEIGHT
+    if score >= HIGH_COST:
+        cost = Cost.HIGH
+    elif score >= MEDIUM_COST:
+        cost = Cost.MEDIUM
+    else:
+        cost = Cost.LOW
+    return Explain(depth, clauses, ranges, wildcards, negated_only, cost)
+
+
+def _conjuncts(q):
+    """Clauses of (nested) AND query, which all must match"""
+    if q.childs and q.operator == Operator.AND and not q.field \
+       and not q.inverted and q.boost == 1:
+        return [c for child in q.childs for c in _conjuncts(child)]
+    return [q]
+
+
+def _is_non_scoring(q):
+    """Clause, that doesn't change score. Ranges, IN, negations"""
+    return is_negated(q) or (
+        not q.childs and q.boost == 1 and (
+            q.operation == Condition.IN or
+            Range.from_condition(q.operation, q.value) is not None))
+
+
+class QueryPolicy:
+    """
+    Checks QuerySet before it's sent to engine.
+
+    Rejects (raises `QueryRejected`) queries with more than
+    `max_clauses` clauses (engine's maxBooleanClauses), deeper than
+    `max_depth`, or with cost class above `max_cost`.
+
+    Pure negative search queries are rejected, or moved to filters
+    when `rewrite_negated` is set. With `move_non_scoring`,
+    non-scoring clauses of AND search (ranges, IN, negations) are moved
+    to cached filters.
+    """
+
+    def __init__(self, max_clauses=1024, max_depth=None, max_cost=None,
+                 reject_negated=True, rewrite_negated=False,
+                 move_non_scoring=False):
+        self.max_clauses = max_clauses
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+        self.reject_negated = reject_negated
+        self.rewrite_negated = rewrite_negated
+        self.move_non_scoring = move_non_scoring
+
+    def __call__(self, qs):
+        """Returns checked (maybe rewritten) QuerySet"""
+        qs = self.rewrite(qs)
+        for q in ([qs._search] if qs._search else []) + list(qs._filter):
+            self.check(q)
+        return qs
+
+    def check(self, q):
+        info = explain(q)
+        if self.max_clauses is not None and info.clauses > self.max_clauses:
+            raise QueryRejected(
+                "Too many clauses: {}".format(info.clauses), q)
+        if self.max_depth is not None and info.depth > self.max_depth:
+            raise QueryRejected("Too deep: {}".format(info.depth), q)
+        if self.max_cost is not None and info.cost > self.max_cost:
+            raise QueryRejected("Too expensive", q)
+        return info
+
+    def rewrite(self, qs):
+        search = qs._search
+        if search is None:
+            return qs
+
+        clauses = _conjuncts(search)
+
+        if all(is_negated(q) for q in clauses):
+            if self.rewrite_negated:
+                return qs._replace_search(None, clauses)
+            if self.reject_negated:
+                raise QueryRejected("Pure negative search query", search)
+            return qs
+
+        if self.move_non_scoring and len(clauses) > 1:
+            keep = [q for q in clauses if not _is_non_scoring(q)]
+            move = [q for q in clauses if _is_non_scoring(q)]
+            if move and keep:
+                search = keep[0] if len(keep) == 1 \
+                    else type(search)(Operator.AND, childs=tuple(keep))
+                return qs._replace_search(search, move)
+        return qs
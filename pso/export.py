@@ -0,0 +1,69 @@
+"""
+Sinks for `QuerySet.export()`.
+
+    with open('articles.jsonl', 'w') as f:
+        for batch in Article.objects.filter(...).export(sink=JSONLinesSink(f)):
+            pass
+
+Sink is any object with `write(models)` method. Models are written
+in index format (`to_index()`), so dump can be loaded back with bulk.
+"""
+import csv
+import json
+
+
+def _documents(models):
+    """Index format of models, with batch field converters"""
+    cls = type(models[0])
+    if all(type(model) is cls for model in models):
+        return cls.to_index_many(models)
+    return [model.to_index() for model in models]
+
+
+class JSONLinesSink:
+    """One JSON document per line"""
+
+    def __init__(self, file):
+        self.file = file
+        self.written = 0
+
+    def write(self, models):
+        if not models:
+            return
+        self.file.write(''.join(
+            json.dumps(doc) + '\n' for doc in _documents(models)))
+        self.written += len(models)
+
+
+class CSVSink:
+    """
+    CSV with header row. Columns are model fields, or `fields`.
+    Values of multi valued fields are joined with `separator`.
+    """
+
+    def __init__(self, file, fields=None, separator='|'):
+        self.file = file
+        self.fields = fields
+        self.separator = separator
+        self.written = 0
+        self._writer = csv.writer(file)
+
+    def _row(self, doc):
+        row = []
+        for name in self.fields:
+            value = doc.get(name)
+            if isinstance(value, list):
+                value = self.separator.join(str(v) for v in value)
+            row.append('' if value is None else value)
+        return row
+
+    def write(self, models):
+        if not models:
+            return
+        if self.fields is None:
+            self.fields = [name for name in models[0]._fields
+                           if name != '_version_']
+        if not self.written:
+            self._writer.writerow(self.fields)
+        self._writer.writerows(self._row(doc) for doc in _documents(models))
+        self.written += len(models)
@@ -1,7 +1,11 @@
 """
 PSO fields magic.
 """
+from datetime import datetime
+from datetime import timezone
+
 from pso.analyzers import AbstractAnalyzer
+from pso.constants import Update
 from pso.q import Q, QComparisonMixin, QShiftContainsMixin
 
 
@@ -26,7 +30,7 @@ class FieldType():
     # integer, long, float, double, date
     """Field type creation shortcut"""
     name = ''  # Shoud be unique
-    _analyzers = []
+    _analyzers = ()  # Replaced on change, never shared between instances
     # config = {}
 
     @property
@@ -51,7 +55,7 @@ class FieldType():
 
     def add_analyzer(self, analyzer):
         if isinstance(analyzer, AbstractAnalyzer):
-            self._analyzers.append(analyzer)
+            self._analyzers = self._analyzers + (analyzer, )
         else:
             raise ValueError("Can not add non Analyzer object")
 
@@ -60,6 +64,20 @@ class FieldType():
         return self._analyzers
 
 
+def _flatten(rows):
+    return [v for row in rows for v in row or ()]
+
+
+def _unflatten(flat, rows):
+    """Split flat converted values back to rows"""
+    result, pos = [], 0
+    for row in rows:
+        end = pos + len(row or ())
+        result.append(flat[pos:end])
+        pos = end
+    return result
+
+
 class BaseField(QComparisonMixin, QShiftContainsMixin):
     """
     Base class for each field
@@ -70,14 +88,16 @@ class BaseField(QComparisonMixin, QShiftContainsMixin):
 
     field_type = None  # <FieldType> for EngineSpecific/UserDefined
     is_pk = False  # Is used to set UniqueId. Used when update index
-    name = None  # By default populated with <ModelMetaClass>
+    _name = None  # By default populated with <ModelMetaClass>
     _default = None
     store = False
     boost = 1
     index = True
     required = False
     operations = ()
-    multi_valued = False  # E.G. list
+    _multi_valued = False  # E.G. list
+    _bound = False  # Set by <ModelMetaClass>, metadata is read-only then
+    dtype = None  # NumPy dtype for columnar results
 
     def __init__(self, name=None, default=None, boost=1, index=True,
                  store=False, primary_key=False, multi_valued=False,
@@ -94,6 +114,29 @@ class BaseField(QComparisonMixin, QShiftContainsMixin):
     def __repr__(self):
         return "<{0.__class__.__name__}:{0.name}>".format(self)
 
+    def _check_unbound(self, attr):
+        if self._bound:
+            raise AttributeError(
+                "Can not change {} of field bound to model".format(attr))
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._check_unbound('name')
+        self._name = value
+
+    @property
+    def multi_valued(self):
+        return self._multi_valued
+
+    @multi_valued.setter
+    def multi_valued(self, value):
+        self._check_unbound('multi_valued')
+        self._multi_valued = value
+
     # Model data-access descriptor behavior.
     def __get__(self, instance, owner_cls):
         if instance is None:  # Access to unbound object
@@ -102,6 +145,7 @@ class BaseField(QComparisonMixin, QShiftContainsMixin):
 
     def __set__(self, instance, value):
         instance._cache[self.name] = value
+        instance._updates[self.name] = (Update.SET, value)
 
     @property
     def is_predefined(self):
@@ -109,12 +153,40 @@ class BaseField(QComparisonMixin, QShiftContainsMixin):
 
     def to_index(self, value):
         """Prepare python value before send"""
-        return value or self.default
+        return self.default if value is None else value
 
     def to_python(self, value):
         """Convert redurned data to Python native obect"""
         return value
 
+    # Batch converters. Take whole column (lists of values for multi
+    # valued field), so fields can convert it in one call. Subclasses
+    # override `_python_values` / `_index_values` with fast paths.
+    def to_python_many(self, values):
+        """Convert column of returned values"""
+        if self.multi_valued:
+            return _unflatten(self._python_values(_flatten(values)), values)
+        return self._python_values(values)
+
+    def to_index_many(self, values):
+        """Prepare column of python values before send"""
+        if self.multi_valued:
+            return _unflatten(self._index_values(_flatten(values)), values)
+        return self._index_values(values)
+
+    def _python_values(self, values):
+        if type(self).to_python is BaseField.to_python:
+            return list(values)
+        return [self.to_python(v) for v in values]
+
+    def _index_values(self, values):
+        if type(self).to_index is BaseField.to_index:
+            default = self.default
+            if default is None:
+                return list(values)
+            return [default if v is None else v for v in values]
+        return [self.to_index(v) for v in values]
+
     @property
     def default(self):
         return self._default() if callable(self._default) else self._default
@@ -124,3 +196,87 @@ class BaseField(QComparisonMixin, QShiftContainsMixin):
 
     def __mul__(self, value):
         return Q(field=self.name, boost=value)
+
+
+class IntegerField(BaseField):
+    dtype = 'int64'
+
+    def to_python(self, value):
+        return None if value is None else int(value)
+
+    def _python_values(self, values):
+        if type(self).to_python is not IntegerField.to_python:
+            return super()._python_values(values)
+        if None in values:
+            return [None if v is None else int(v) for v in values]
+        return list(map(int, values))
+
+
+class FloatField(BaseField):
+    dtype = 'float64'
+
+    def to_python(self, value):
+        return None if value is None else float(value)
+
+    def _python_values(self, values):
+        if type(self).to_python is not FloatField.to_python:
+            return super()._python_values(values)
+        if None in values:
+            return [None if v is None else float(v) for v in values]
+        return list(map(float, values))
+
+
+class DateTimeField(BaseField):
+    """
+    Stored as ISO 8601 string in UTC. E.G. 2017-01-31T12:00:00Z
+    `rounding` is date math unit for relative values in queries,
+    see `pso.datemath`.
+    """
+    dtype = 'datetime64[us]'
+    rounding = None
+
+    def __init__(self, *args, rounding=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rounding = rounding
+
+    def to_python(self, value):
+        if value is None or isinstance(value, datetime):
+            return value
+        return datetime.strptime(
+            value.rstrip('Z'),
+            '%Y-%m-%dT%H:%M:%S.%f' if '.' in value else '%Y-%m-%dT%H:%M:%S')
+
+    def to_index(self, value):
+        value = super().to_index(value)
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc)
+            return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        return value
+
+    def _python_values(self, values):
+        """`fromisoformat` is C, much faster than `strptime`"""
+        if type(self).to_python is not DateTimeField.to_python:
+            return super()._python_values(values)
+        parse = datetime.fromisoformat
+        try:
+            return [v if v is None or isinstance(v, datetime)
+                    else parse(v[:-1] if v[-1:] == 'Z' else v)
+                    for v in values]
+        except ValueError:  # Formats older Pythons can't parse
+            return [self.to_python(v) for v in values]
+
+    def _index_values(self, values):
+        if type(self).to_index is not DateTimeField.to_index:
+            return super()._index_values(values)
+        default = self.default
+        result = []
+        for v in values:
+            if v is None:
+                v = default
+            if isinstance(v, datetime) and v.tzinfo is None:
+                v = v.isoformat(timespec='microseconds') + 'Z'
+            elif isinstance(v, datetime):
+                v = self.to_index(v)
+            result.append(v)
+        return result
@@ -0,0 +1,178 @@
+"""
+Filter subsumption and redundancy elimination.
+
+Filters are joined with AND, so conditions on one field can be merged:
+
+    price >= 10, price >= 20         -> price >= 20
+    status in [a, b], status == a    -> status == a
+    user in [1, 2, 3], user < 3      -> user in [1, 2]
+    Q('tag'), tag == 'x'             -> tag == 'x'
+
+Intersection is correct only for single valued fields: multi valued
+`tags == a AND tags == b` matches [a, b]. So for multi valued (and
+unknown) fields only filters implied by other ones are dropped.
+Exact duplicates are always dropped.
+"""
+from pso.constants import Condition
+from pso.constants import NoValue
+from pso.constants import Operator
+from pso.encoding import EncodingError
+from pso.encoding import fingerprint
+from pso.q import Q
+from pso.range import Range
+
+
+def _is_simple(q):
+    """Leaf condition on field, which can be merged"""
+    return bool(q.field) and not q.childs and not q.inverted \
+        and q.boost == 1 and q.operation != Condition.NE
+
+
+def _items(q):
+    return q.value if q.operation == Condition.IN else [q.value]
+
+
+def _values_q(field, values):
+    if len(values) == 1:
+        return Q(field=field, operation=Condition.EQ, value=values[0])
+    return Q(field=field, operation=Condition.IN, value=list(values))
+
+
+def _in_range(values, r):
+    """Values inside range. None if values are not comparable with range"""
+    try:
+        return [v for v in values if r.includes(v)]
+    except TypeError:
+        return None
+
+
+def _intersect(field, queries):
+    """Single valued field: merge all conditions to one value set/range"""
+    values, value_qs = None, []
+    ranges, range_qs = None, []
+    exists, rest = [], []
+
+    for q in queries:
+        r = Range.from_condition(q.operation, q.value)
+        if q.operation in (Condition.EQ, Condition.IN):
+            items = _items(q)
+            values = list(items) if values is None \
+                else [v for v in values if v in items]
+            value_qs.append(q)
+        elif r is not None:
+            try:
+                ranges = r if ranges is None else ranges.merge(
+                    r, Operator.AND)
+            except (ValueError, TypeError):
+                return queries  # Nothing matches, leave to engine
+            range_qs.append(q)
+        elif q.operation is None and q.value is NoValue:
+            exists.append(q)
+        else:
+            rest.append(q)
+
+    if values is not None and not values:
+        return queries  # Nothing matches
+
+    if values is not None and ranges is not None:
+        inside = _in_range(values, ranges)
+        if inside is not None:
+            if not inside:
+                return queries
+            values, ranges, range_qs = inside, None, []
+
+    merged = []
+    if values is not None:
+        if len(value_qs) == 1 and values == list(_items(value_qs[0])):
+            merged.append(value_qs[0])  # Unchanged
+        else:
+            merged.append(_values_q(field, values))
+    if ranges is not None:
+        merged.append(range_qs[0] if len(range_qs) == 1 else Q(
+            field=field, operation=Condition.RANGE, value=ranges))
+    if not merged:
+        merged = exists[:1]
+    return merged + rest
+
+
+def _drop_implied(queries):
+    """
+    Multi valued field: drop conditions implied by other ones.
+    Of equivalent conditions the first is kept.
+    """
+    keep = []
+    for i, q in enumerate(queries):
+        if not any(_implies(other, q) and (j < i or not _implies(q, other))
+                   for j, other in enumerate(queries) if j != i):
+            keep.append(q)
+    return keep
+
+
+def _implies(a, b):
+    """Every document matched by `a` is matched by `b`"""
+    if b.operation is None and b.value is NoValue:  # Field exists
+        return not (a.operation is None and a.value is NoValue) \
+            and a.operation != Condition.NE
+    if a.operation not in (Condition.EQ, Condition.IN):
+        ra = Range.from_condition(a.operation, a.value)
+        rb = Range.from_condition(b.operation, b.value)
+        if ra is None or rb is None:
+            return False
+        try:
+            return rb.covers(ra)
+        except TypeError:
+            return False
+
+    values = _items(a)
+    if b.operation in (Condition.EQ, Condition.IN):
+        items = _items(b)
+        return all(v in items for v in values)
+    rb = Range.from_condition(b.operation, b.value)
+    if rb is None:
+        return False
+    inside = _in_range(values, rb)
+    return inside is not None and len(inside) == len(values)
+
+
+def reduce_filters(filters, model=None):
+    """
+    Merge and drop redundant filters. Returns list of Q.
+    Merged filter takes place of first filter on its field.
+    Filters, which can't be fingerprinted, are returned as is.
+    """
+    filters = list(filters)
+    seen, unique = set(), []
+    try:
+        for q in filters:
+            key = fingerprint(q)
+            if key not in seen:
+                seen.add(key)
+                unique.append(q)
+    except EncodingError:
+        return filters
+
+    by_field = {}
+    for q in unique:
+        if _is_simple(q):
+            by_field.setdefault(q.field, []).append(q)
+
+    fields = getattr(model, '_field_map', {})
+    result, done = [], set()
+    for q in unique:
+        if not _is_simple(q):
+            result.append(q)
+            continue
+        if q.field in done:
+            continue
+        done.add(q.field)
+
+        queries = by_field[q.field]
+        if len(queries) == 1:
+            result.append(q)
+            continue
+        field = fields.get(q.field)
+        if field is not None and not field.multi_valued:
+            result.extend(_intersect(q.field, queries))
+        else:
+            result.extend(_drop_implied(queries))
+    return result
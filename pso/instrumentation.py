@@ -0,0 +1,124 @@
+"""
+Query lifecycle instrumentation.
+
+Each phase of QuerySet execution is wrapped in `span(phase)`.
+Registered hooks receive finished `Span` objects, E.G:
+
+    def to_prometheus(span):
+        LATENCY.labels(span.phase).observe(span.duration)
+        SENT.labels(span.phase).inc(span.info.get('bytes_sent', 0))
+
+    add_hook(to_prometheus)
+
+When no hooks registered, shared no-op span is used,
+so instrumentation costs one truthiness check.
+"""
+from functools import wraps
+from time import perf_counter
+import threading
+import logging
+
+
+log = logging.getLogger(__name__)
+
+
+class Phase:
+    """Constants to define QuerySet execution phases"""
+    NORMALIZE = 'normalize'  # Q ranges/fields merge
+    COMPILE = 'compile'      # QuerySet -> request
+    SERIALIZE = 'serialize'  # request -> bytes
+    NETWORK = 'network'      # Wait for engine response
+    PARSE = 'parse'          # bytes -> raw documents
+    HYDRATE = 'hydrate'      # raw documents -> models
+
+
+# Tuple is replaced on change, never modified. Safe to read without lock,
+# lock only serializes changes.
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """Register callable, that receives each finished Span"""
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h != hook)
+
+
+class Span:
+    """
+    Timing of one phase.
+
+    `info` keys used by library: bytes_sent, bytes_received, hits, and
+    cache ('hit' or 'miss', on parse span of searches with model cache).
+    """
+
+    __slots__ = ('phase', 'info', 'start', 'duration', 'error')
+
+    def __init__(self, phase, info):
+        self.phase = phase
+        self.info = info
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def __repr__(self):
+        return "<Span {0.phase} {0.duration!r} {0.info!r}>".format(self)
+
+    def set(self, **info):
+        self.info.update(info)
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = perf_counter() - self.start
+        self.error = exc
+        for hook in _hooks:
+            try:
+                hook(self)
+            except Exception:
+                log.exception("Instrumentation hook %r failed", hook)
+
+
+class _NoopSpan:
+
+    __slots__ = ()
+
+    def set(self, **info):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(phase, **info):
+    if not _hooks:
+        return _NOOP
+    return Span(phase, info)
+
+
+def instrument(phase):
+    """Decorator. Wraps each function call in span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return func(*args, **kwargs)
+            with Span(phase, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,6 +1,10 @@
 """
 Models meta magic here
 """
+from types import MappingProxyType
+
+from pso.constants import Update
+from pso.exceptions import PSOException
 from pso.fields import BaseField
 from pso.query import BaseQuerySet
 from pso.query import QuerySetDescriptor
@@ -28,13 +32,20 @@ class ModelMetaClass(type):
 
                 if not val.name:
                     val.name = attr
+                val._bound = True
                 fields.append(attr)
                 if val.store:
                     stored_fields.append(attr)
 
-        attr_dict['_fields'] = fields
-        attr_dict['_stored_fields'] = stored_fields
-        attr_dict['_cache'] = {}
+        # Metadata is read-only after class creation, so it's shared
+        # between threads without locks.
+        attr_dict['_fields'] = tuple(fields)
+        attr_dict['_stored_fields'] = tuple(stored_fields)
+        attr_dict['_field_map'] = MappingProxyType(
+            {attr: attr_dict[attr] for attr in fields})
+        attr_dict['_pk'] = next(
+            (attr_dict[attr] for attr in fields if attr_dict[attr].is_pk),
+            None)
 
         return super().__new__(meta, name, bases, attr_dict)
 
@@ -44,16 +55,56 @@ class BaseModel(metaclass=ModelMetaClass):
 
     objects = QuerySetDescriptor()
     queryset_class = BaseQuerySet
+    backend = None  # <BaseBackend> instance
+    cache = None  # <BaseCache> for compiled queries and responses
+    policy = None  # <QueryPolicy> checks queries before send
 
     def __init__(self, **kwargs):
         self._cache = {}
+        self._updates = {}  # Changed fields: {name: (operation, value)}
+        self._version = None
+        self._loaded = False
         for key, arg in kwargs.items():
             if key in self._fields:
                 self._cache[key] = arg
 
+    @classmethod
+    def from_index(cls, doc):
+        """Create model from engine document. Tracks `_version_`"""
+        instance = cls()
+        for name, field in cls._field_map.items():
+            if name in doc:
+                if field.multi_valued:
+                    value = [field.to_python(v) for v in doc[name]]
+                else:
+                    value = field.to_python(doc[name])
+                instance._cache[name] = value
+        instance._version = doc.get('_version_')
+        instance._loaded = True
+        return instance
+
+    @classmethod
+    def from_index_many(cls, docs):
+        """
+        Create models from engine documents.
+        Same as `from_index`, but values are converted column by column.
+        """
+        instances = [cls() for _ in docs]
+        for name, field in cls._field_map.items():
+            rows = [i for i, doc in enumerate(docs) if name in doc]
+            if not rows:
+                continue
+            values = field.to_python_many([docs[i][name] for i in rows])
+            for i, value in zip(rows, values):
+                instances[i]._cache[name] = value
+        for instance, doc in zip(instances, docs):
+            instance._version = doc.get('_version_')
+            instance._loaded = True
+        return instances
+
     @classmethod
     def get_fields(cls):
-        return (getattr(cls, name) for name in cls._fields)
+        return iter(cls._field_map.values())
 
     def __iter__(self):
         """Only filed with data to emulate dict behavior"""
@@ -69,8 +120,7 @@ class BaseModel(metaclass=ModelMetaClass):
     def to_index(self):
         # return self._cache
         arr = {}
-        for name in self._fields:
-            field = getattr(self.__class__, name)
+        for name, field in self._field_map.items():
             if name == '_version_':
                 continue
             if field.multi_valued:
@@ -79,3 +129,119 @@ class BaseModel(metaclass=ModelMetaClass):
             else:
                 arr[name] = field.to_index(self._cache.get(name))
         return arr
+
+    @classmethod
+    def to_index_many(cls, models):
+        """Documents to index. Values are converted column by column"""
+        docs = [{} for _ in models]
+        for name, field in cls._field_map.items():
+            if name == '_version_':
+                continue
+            empty = [] if field.multi_valued else None
+            values = field.to_index_many(
+                [model._cache.get(name, empty) for model in models])
+            for doc, value in zip(docs, values):
+                doc[name] = value
+        return docs
+
+    # Changes tracking
+    @property
+    def changed_fields(self):
+        return set(self._updates)
+
+    def mark_clean(self, updates=None):
+        """
+        Forget changes. E.G. when saved. With `updates` (copy of
+        `_updates`, taken when document was built), forget only them,
+        changes made since then are kept.
+        """
+        if updates is None:
+            self._updates = {}
+            return
+        for name, (operation, value) in updates.items():
+            current = self._updates.get(name)
+            if current == (operation, value):
+                del self._updates[name]
+            elif current is None or current[0] != operation:
+                continue  # Replaced by `set`, sent again
+            elif operation == Update.INC:
+                self._updates[name] = (operation, current[1] - value)
+            elif operation == Update.ADD:
+                self._updates[name] = (operation, current[1][len(value):])
+
+    def mark_saved(self, versions, updates=None):
+        """
+        Take new `_version_` from `versions` (of `backend.versions()`),
+        forgotten if engine doesn't report it, and `mark_clean`.
+        """
+        pk = self.__class__._pk
+        self._version = None if pk is None else versions.get(
+            str(pk.to_index(self._cache.get(pk.name))))
+        self.mark_clean(updates)
+
+    def inc(self, name, value=1):
+        """Atomic increment of numeric field"""
+        field = getattr(self.__class__, name)
+        self._cache[name] = (self._cache.get(name, field.default) or 0) + value
+        operation, previous = self._updates.get(name, (Update.INC, 0))
+        if operation == Update.INC:
+            self._updates[name] = (Update.INC, previous + value)
+        else:
+            self._updates[name] = (Update.SET, self._cache[name])
+
+    def add(self, name, *values):
+        """Atomic append to multi valued field"""
+        field = getattr(self.__class__, name)
+        if not field.multi_valued:
+            raise PSOException("Can not add to single valued field")
+        self._cache[name] = list(self._cache.get(name) or []) + list(values)
+        operation, previous = self._updates.get(name, (Update.ADD, []))
+        if operation == Update.ADD:
+            self._updates[name] = (Update.ADD, previous + list(values))
+        else:
+            self._updates[name] = (Update.SET, self._cache[name])
+
+    @classmethod
+    def get_pk(cls):
+        if cls._pk is not None:
+            return cls._pk
+        raise PSOException("{} has no primary key".format(cls.__name__))
+
+    def to_update(self):
+        """
+        Partial (atomic) update document, only with changed fields.
+        Includes loaded `_version_` for optimistic concurrency.
+        """
+        pk = self.get_pk()
+        arr = {pk.name: pk.to_index(self._cache.get(pk.name))}
+        for name, (operation, value) in self._updates.items():
+            field = getattr(self.__class__, name)
+            if operation == Update.INC:
+                pass
+            elif operation == Update.ADD or field.multi_valued:
+                value = [field.to_index(val) for val in value]
+            else:
+                value = field.to_index(value)
+            arr[name] = {operation: value}
+        if self._version is not None:
+            arr['_version_'] = self._version
+        return arr
+
+    def to_save(self):
+        """Partial update for loaded model, whole document otherwise"""
+        if self._loaded and self._updates:
+            return self.to_update()
+        return self.to_index()
+
+    def save(self):
+        """
+        Send changes to index. New `_version_` is taken from response,
+        so next save is checked against it. If engine doesn't report
+        it, version is forgotten.
+        """
+        if self._loaded and not self._updates:
+            return
+        backend = self.backend
+        raw = backend.bulk([backend.serialize(self.to_save())])
+        self.mark_saved(backend.versions(raw))
+        self._loaded = True
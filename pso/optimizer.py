@@ -0,0 +1,168 @@
+"""
+Boolean minimization of Q trees.
+
+    (tenant == 1 & a) | (tenant == 1 & b)  ->  tenant == 1 & (a | b)
+    a & (a | b)                            ->  a
+    -(-a & -b)                             ->  a | b
+    a & -a                                 ->  False
+
+Rewrites keep matched documents, but not scores, so they are applied
+to filters only. Nested AND/OR are flattened, duplicates removed,
+common conjuncts (disjuncts) factored out, absorbed branches dropped,
+negations pushed down when most children are negated (De Morgan).
+Boosted and XOR nodes are kept as they are, only their childs are
+optimized.
+
+Leafs get explicit field, inherited fields of aggregations are
+dropped. Query, which always matches (or never matches), is optimized
+to True (False). Results are memoized per node by fingerprint, so hot
+queries are optimized once.
+"""
+from collections import Counter
+from collections import OrderedDict
+
+from pso.constants import Condition
+from pso.constants import Operator
+from pso.encoding import EncodingError
+from pso.encoding import fingerprint
+from pso.q import Q
+from pso.utils import memoize
+
+
+_DUAL = {Operator.AND: Operator.OR, Operator.OR: Operator.AND}
+
+_optimized = OrderedDict()
+
+
+def _leaf(q, field):
+    """Explicit field, NE as negated EQ, IN of one value as EQ"""
+    operation, value, inverted = q.operation, q.value, q.inverted
+    if operation == Condition.NE:
+        operation, inverted = Condition.EQ, not inverted
+    if operation == Condition.IN:
+        if not value:  # Matches nothing
+            return inverted
+        if len(value) == 1:
+            operation, value = Condition.EQ, next(iter(value))
+    return q._replace(field=field, operation=operation, value=value,
+                      inverted=inverted)
+
+
+def _is_junction(q, operator=None):
+    """Plain AND/OR node, which may be restructured"""
+    return bool(q.childs) and q.boost == 1 \
+        and q.operator in (operator or _DUAL)
+
+
+def _parts(q, operator):
+    """Childs of `operator` node, or node itself"""
+    if _is_junction(q, operator) and not q.inverted:
+        return q.childs
+    return (q, )
+
+
+def _invert(x):
+    """Negation. Pushed down to childs, when most of them are negated"""
+    if isinstance(x, bool):
+        return not x
+    if _is_junction(x) and not x.inverted and \
+            2 * sum(child.inverted for child in x.childs) > len(x.childs):
+        return _junction(_DUAL[x.operator], [_invert(c) for c in x.childs])
+    return x._replace(inverted=not x.inverted)
+
+
+def _junction(operator, childs):
+    """AND/OR of optimized childs"""
+    dual = _DUAL[operator]
+    absorbing = operator == Operator.OR  # False for AND, True for OR
+
+    # Flatten and remove duplicates and constants
+    unique = OrderedDict()
+    for child in childs:
+        if isinstance(child, bool):
+            if child is absorbing:
+                return absorbing
+            continue
+        for part in _parts(child, operator):
+            unique.setdefault(fingerprint(part), part)
+
+    # Complement: a & -a, a | -a
+    for q in unique.values():
+        if fingerprint(q._replace(inverted=not q.inverted)) in unique:
+            return absorbing
+
+    # Absorption: a & (a | b) -> a, a | (a & b) -> a
+    parts = {key: frozenset(fingerprint(p) for p in _parts(q, dual))
+             for key, q in unique.items()}
+    for key in list(unique):
+        if any(other < parts[key] for k, other in parts.items()
+               if k != key and k in unique):
+            del unique[key]
+
+    # Factoring: (t & a) | (t & b) -> t & (a | b)
+    counts = Counter(k for key in unique for k in parts[key])
+    common, count = max(counts.items(), key=lambda item: item[1],
+                        default=(None, 0))
+    if count > 1:
+        childs, group, shared = [], [], None
+        for key, q in unique.items():
+            if common not in parts[key]:
+                childs.append(q)
+                continue
+            rest = []
+            for part in _parts(q, dual):
+                if fingerprint(part) == common:
+                    shared = part
+                else:
+                    rest.append(part)
+            if not group:
+                childs.append(None)  # Place of factored node
+            group.append(_junction(dual, rest))
+        factored = _junction(dual, [shared, _junction(operator, group)])
+        return _junction(
+            operator, [factored if c is None else c for c in childs])
+
+    if not unique:
+        return not absorbing
+    if len(unique) == 1:
+        return next(iter(unique.values()))
+    return Q(operator=operator, childs=tuple(unique.values()))
+
+
+def _optimize(q, field=None):
+    key = (fingerprint(q), field)
+    cached = _optimized.get(key)
+    if cached is not None:
+        return cached
+
+    field = q.field or field
+    if not q.childs:
+        result = _leaf(q, field)
+    elif _is_junction(q):
+        result = _junction(
+            q.operator, [_optimize(child, field) for child in q.childs])
+        if q.inverted:
+            result = _invert(result)
+    else:
+        # Boosted or XOR node. Constants can't be childs of Q.
+        childs = []
+        for child in q.childs:
+            optimized = _optimize(child, field)
+            childs.append(
+                child if isinstance(optimized, bool) else optimized)
+        result = q._replace(field=field, childs=tuple(childs))
+
+    memoize(_optimized, key, result)
+    return result
+
+
+def optimize(q):
+    """
+    Equivalent (by matched documents) simplified Q.
+    Returns True or False, if query matches all or no documents.
+    Queries, which can't be fingerprinted, are returned as is.
+    """
+    try:
+        return _optimize(q)
+    except EncodingError:
+        return q
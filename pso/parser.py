@@ -0,0 +1,346 @@
+"""
+Lucene query syntax parser.
+
+    parse('title:"red fox" AND price:[10 TO 20} -status:sold')
+    -> <Q ( <Q title eq 'red fox'> AND <Q price range ...> AND ... )>
+
+Produces normalized Q/Range trees (same as built with & and |),
+so parsed queries can be merged with other Q objects.
+Hand-written lexer and recursive descent parser, results are cached.
+
+Unsupported (ParseError): wildcard terms (te*, t?xt), fuzzy and
+proximity (foo~2, "red fox"~3). Not parsed: regexps, local params.
+SHOULD clauses next to MUST (+) clauses only change score, so are
+dropped. `*:*` is parsed to None (no condition). Boosts must be
+numbers. Modifiers are combined, so `- -a:1` is `+a:1`.
+
+Cold parse takes about 1-1.5 ms per KB of query string, mostly Q
+normalization, so it stays under a millisecond only for queries up to
+about half a KB. Repeated queries are served from cache in microseconds.
+"""
+import re
+from functools import lru_cache
+
+from pso.constants import Condition
+from pso.constants import NoValue
+from pso.constants import Operator
+from pso.exceptions import PSOException
+from pso.q import Q
+from pso.q import combine
+from pso.range import Range
+
+
+PARSE_CACHE_SIZE = 1024
+
+# Token types
+TERM, PHRASE, COLON, LPAREN, RPAREN, RANGE_OPEN, RANGE_CLOSE, CARET, \
+    PLUS, MINUS, AND, OR, NOT, TO, EOF = range(15)
+
+_KEYWORDS = {'AND': AND, 'OR': OR, 'NOT': NOT, '&&': AND, '||': OR}
+_SINGLE = {
+    '(': LPAREN, ')': RPAREN, ':': COLON, '^': CARET, '+': PLUS,
+    '-': MINUS, '!': NOT, '[': RANGE_OPEN, '{': RANGE_OPEN,
+    ']': RANGE_CLOSE, '}': RANGE_CLOSE,
+}
+# Runs of term characters, backslash escapes included. Character
+# classes only, so matching is linear, without backtracking.
+_TERM = re.compile(r'(?:[^\s()\[\]{}:^"\\]|\\.)+', re.S)
+_RANGE_TERM = re.compile(r'(?:[^\s\[\]{}"\\]|\\.)+', re.S)
+_SPACE = re.compile(r'\s+')
+_WILDCARD = re.compile(r'(?<!\\)[*?]')  # Not escaped * or ?
+_FUZZY = re.compile(r'(?<!\\)~')  # Not escaped ~
+# Inside ranges only brackets are special, E.G. [-10 TO NOW-1DAY]
+_RANGE_SPECIAL = frozenset('[]{}')
+
+# Numbers, strictly. No nan, inf or 1_000
+_INT = re.compile(r'-?[0-9]+\Z')
+_FLOAT = re.compile(
+    r'-?(?:[0-9]+\.[0-9]*|\.[0-9]+|[0-9]+(?=[eE]))(?:[eE][-+]?[0-9]+)?\Z')
+
+MAX_DEPTH = 64  # Of nested groups and modifiers
+
+# Clause modifiers
+SHOULD, MUST, MUST_NOT = range(3)
+
+MATCH_ALL = None
+
+
+class ParseError(PSOException):
+    """Broken query string"""
+
+
+def _unescape(text):
+    if '\\' not in text:
+        return text
+    chars = []
+    escaped = False
+    for char in text:
+        if char == '\\' and not escaped:
+            escaped = True
+            continue
+        chars.append(char)
+        escaped = False
+    return ''.join(chars)
+
+
+def tokenize(text):
+    """Returns list of (type, value, position)"""
+    tokens = []
+    append = tokens.append
+    pos, end = 0, len(text)
+    in_range = False
+
+    while pos < end:
+        char = text[pos]
+        if char.isspace():
+            pos = _SPACE.match(text, pos).end()
+            continue
+
+        start = pos
+        if char == '"':
+            pos = text.find('"', pos + 1)
+            while pos != -1 and text[pos - 1] == '\\':
+                pos = text.find('"', pos + 1)
+            if pos == -1:
+                raise ParseError("Unclosed quote at {}".format(start))
+            append((PHRASE, _unescape(text[start + 1:pos]), start))
+            pos += 1
+            continue
+
+        if char in '&|' and text[pos + 1:pos + 2] == char:
+            append((_KEYWORDS[char * 2], char * 2, start))
+            pos += 2
+            continue
+
+        if char in _SINGLE and (not in_range or char in _RANGE_SPECIAL):
+            kind = _SINGLE[char]
+            if kind == RANGE_OPEN:
+                in_range = True
+            elif kind == RANGE_CLOSE:
+                in_range = False
+            append((kind, char, start))
+            pos += 1
+            continue
+
+        match = (_RANGE_TERM if in_range else _TERM).match(text, pos)
+        if match is None:  # Lone backslash at end
+            raise ParseError("Broken escape at {}".format(start))
+        pos = match.end()
+        word = match.group()
+        if word != '*' and ('*' in word or '?' in word) \
+                and _WILDCARD.search(word):
+            raise ParseError("Wildcard terms are unsupported at {}".format(
+                start))
+        if '~' in word and _FUZZY.search(word):
+            raise ParseError(
+                "Fuzzy and proximity terms are unsupported at {}".format(
+                    start))
+        if '\\' in word:
+            word = _unescape(word)
+        if in_range and word == 'TO':
+            append((TO, word, start))
+        else:
+            append((_KEYWORDS.get(word, TERM), word, start))
+
+    append((EOF, None, end))
+    return tokens
+
+
+def _to_value(word):
+    """Numbers and booleans from bare terms"""
+    if word == 'true':
+        return True
+    if word == 'false':
+        return False
+    if _INT.match(word):
+        return int(word)
+    if _FLOAT.match(word):
+        return float(word)
+    return word
+
+
+def _and(queries):
+    queries = [q for q in queries if q is not MATCH_ALL]
+    if not queries:
+        return MATCH_ALL
+    return queries[0] if len(queries) == 1 else combine(queries, Operator.AND)
+
+
+def _or(queries):
+    if any(q is MATCH_ALL for q in queries):
+        return MATCH_ALL
+    return queries[0] if len(queries) == 1 else combine(queries, Operator.OR)
+
+
+class Parser:
+
+    def __init__(self, text, default_field=None,
+                 default_operator=Operator.OR):
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.depth = 0
+        self.default_field = default_field
+        self.default_operator = default_operator
+
+    def error(self, message):
+        raise ParseError("{} at {}".format(message, self.tokens[self.pos][2]))
+
+    def peek(self):
+        return self.tokens[self.pos][0]
+
+    def take(self, kind=None):
+        token = self.tokens[self.pos]
+        if kind is not None and token[0] != kind:
+            self.error("Unexpected {!r}".format(token[1]))
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if self.peek() == EOF:
+            return MATCH_ALL
+        q = self.query(self.default_field)
+        self.take(EOF)
+        return q
+
+    def _starts_clause(self):
+        return self.peek() not in (OR, AND, RPAREN, EOF)
+
+    def query(self, field):
+        """Clauses joined by OR, or by default OR operator"""
+        clauses = [self.conjunction(field)]
+        while True:
+            if self.peek() == OR:
+                self.take()
+            elif not (self.default_operator == Operator.OR
+                      and self._starts_clause()):
+                break
+            clauses.append(self.conjunction(field))
+        return self.boolean(clauses)
+
+    def conjunction(self, field):
+        """Clauses joined by AND, or by default AND operator"""
+        clauses = [self.clause(field)]
+        while True:
+            if self.peek() == AND:
+                self.take()
+            elif not (self.default_operator == Operator.AND
+                      and self._starts_clause()):
+                break
+            clauses.append(self.clause(field))
+
+        if len(clauses) == 1:
+            return clauses[0]
+        return SHOULD, _and([
+            self.negate(q) if modifier == MUST_NOT else q
+            for modifier, q in clauses])
+
+    @staticmethod
+    def negate(q):
+        if q is MATCH_ALL:
+            raise ParseError("Can not negate *:*")
+        return -q
+
+    @staticmethod
+    def boolean(clauses):
+        """Combine clauses with modifiers, lucene BooleanQuery style"""
+        if len(clauses) == 1:
+            modifier, q = clauses[0]
+            return Parser.negate(q) if modifier == MUST_NOT else q
+
+        musts = [q for m, q in clauses if m == MUST]
+        shoulds = [q for m, q in clauses if m == SHOULD]
+        nots = [Parser.negate(q) for m, q in clauses if m == MUST_NOT]
+        if shoulds and not musts:
+            musts = [_or(shoulds)]
+        return _and(musts + nots)
+
+    def nested(self, parse, field):
+        """Parse nested group or modified clause, limiting depth"""
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            self.error("Nesting is deeper than {}".format(MAX_DEPTH))
+        result = parse(field)
+        self.depth -= 1
+        return result
+
+    def clause(self, field):
+        """Returns (modifier, Q)"""
+        kind = self.peek()
+        if kind == PLUS:
+            self.take()
+            modifier, q = self.nested(self.clause, field)
+            return (MUST_NOT if modifier == MUST_NOT else MUST), q
+        if kind in (MINUS, NOT):
+            self.take()
+            modifier, q = self.nested(self.clause, field)
+            return (MUST if modifier == MUST_NOT else MUST_NOT), q
+
+        if kind == TERM and self.tokens[self.pos + 1][0] == COLON:
+            field = self.take()[1]
+            self.take(COLON)
+            if field == '*' and self.peek() == TERM \
+               and self.tokens[self.pos][1] == '*':
+                self.take()
+                return SHOULD, MATCH_ALL
+
+        q = self.value(field)
+        if self.peek() == CARET:
+            self.take()
+            boost = _to_value(self.take(TERM)[1])
+            if isinstance(boost, bool) or not isinstance(boost, (int, float)):
+                self.pos -= 1
+                self.error("Boost must be number")
+            if q is not MATCH_ALL:
+                q = q * boost
+        return SHOULD, q
+
+    def value(self, field):
+        kind = self.peek()
+        if kind == LPAREN:
+            self.take()
+            q = self.nested(self.query, field)
+            self.take(RPAREN)
+            return q
+        if kind == RANGE_OPEN:
+            return self.range(field)
+        if kind not in (TERM, PHRASE):
+            self.error("Unexpected {!r}".format(self.tokens[self.pos][1]))
+
+        if not field:
+            self.error("No field for term")
+        kind, word, _ = self.take()
+        if kind == PHRASE:
+            return Q(field=field, operation=Condition.EQ, value=word)
+        if word == '*':  # Field existence
+            return Q(field)
+        return Q(field=field, operation=Condition.EQ, value=_to_value(word))
+
+    def range(self, field):
+        if not field:
+            self.error("No field for range")
+        fr_incl = self.take(RANGE_OPEN)[1] == '['
+        fr = self.range_value()
+        self.take(TO)
+        to = self.range_value()
+        to_incl = self.take(RANGE_CLOSE)[1] == ']'
+        return Q(field=field, operation=Condition.RANGE,
+                 value=Range(fr, to, fr_incl and fr is not NoValue,
+                             to_incl and to is not NoValue))
+
+    def range_value(self):
+        kind, word, _ = self.take()
+        if kind == PHRASE:
+            return word
+        if kind != TERM:
+            self.pos -= 1
+            self.error("Unexpected {!r}".format(word))
+        return NoValue if word == '*' else _to_value(word)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse(text, default_field=None, default_operator=Operator.OR):
+    """
+    Parse lucene query string to Q. Returns None for match all query.
+    Results are cached, Q objects are immutable.
+    """
+    return Parser(text, default_field, default_operator).parse()
@@ -0,0 +1,425 @@
+"""
+Percolator: reverse search of stored queries, matching a document.
+
+    alerts = Percolator(Article)
+    alerts.add('cheap-red', Q(color='red') & (Q('price') < 10))
+    alerts.match(article)  # -> ['cheap-red']
+
+Each query is indexed by terms, which every matched document must
+have (field/value of EQ and IN, `Range` bounds, field existence). For
+AND only the most selective child is indexed, for OR all of them.
+Document's `to_index()` values select candidate queries, and only
+candidates are evaluated. Queries without required terms (E.G. pure
+negations) are evaluated for each document.
+
+Values are compared exactly, as stored in index (no text analysis),
+values of other type than range bounds raise TypeError.
+Date math is resolved for each document, as engine does for each
+request, so such queries are candidates of any document with field.
+"""
+import threading
+from bisect import bisect_left
+from bisect import bisect_right
+from functools import reduce
+from operator import xor
+
+from pso.constants import Condition
+from pso.constants import NoValue
+from pso.constants import Operator
+from pso.datemath import DateMath
+from pso.datemath import has_dates
+from pso.datemath import resolve_dates
+from pso.exceptions import PSOException
+from pso.explain import is_negated
+from pso.range import Range
+
+
+# Anchor kinds
+TERM, RANGE, EXISTS = range(3)
+# Selectivity weights of anchor kinds, for choosing between AND childs
+_WEIGHTS = {TERM: 1, RANGE: 4, EXISTS: 16}
+
+
+def _values(value):
+    """Document value as list. Multi valued fields are lists"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _index_value(converter, operation, value):
+    """
+    Condition value in index format, with field's `to_index`.
+    Returns (operation, value). Date math is kept.
+    """
+    def convert(value):
+        if value is NoValue or isinstance(value, DateMath):
+            return value
+        return converter.to_index(value)
+
+    rng = Range.from_condition(operation, value)
+    if rng is not None:
+        return Condition.RANGE, Range(
+            convert(rng.fr), convert(rng.to), rng.fr_incl, rng.to_incl)
+    if operation == Condition.IN:
+        return operation, [convert(v) for v in value]
+    return operation, convert(value)
+
+
+def _relative(field, operation, value, converter=None):
+    """Test function of condition with date math, resolved each time"""
+    def test(doc):
+        op, resolved = operation, resolve_dates(value)
+        if converter is not None:
+            op, resolved = _index_value(converter, op, resolved)
+        return _leaf(field, op, resolved)(doc)
+    return test
+
+
+def _inside(rng):
+    """
+    Function, which tests that value is in range, as `Range.includes`.
+    Comparisons are chained for each kind of bounds, as it is called
+    for each candidate. Values of other type raise TypeError.
+    """
+    fr, to = rng.fr, rng.to
+    if fr is NoValue and to is NoValue:
+        return lambda value: True
+    if fr is NoValue:
+        if rng.to_incl:
+            return lambda value: value <= to
+        return lambda value: value < to
+    if to is NoValue:
+        if rng.fr_incl:
+            return lambda value: fr <= value
+        return lambda value: fr < value
+    if rng.fr_incl and rng.to_incl:
+        return lambda value: fr <= value <= to
+    if rng.fr_incl:
+        return lambda value: fr <= value < to
+    if rng.to_incl:
+        return lambda value: fr < value <= to
+    return lambda value: fr < value < to
+
+
+def _leaf(field, operation, value, converter=None):
+    """Test function of leaf condition"""
+    if has_dates(value):
+        return _relative(field, operation, value, converter)
+    if value is NoValue:  # Field existence
+        return lambda doc: bool(_values(doc.get(field)))
+
+    rng = Range.from_condition(operation, value)
+    if rng is not None:
+        inside = _inside(rng)
+
+        def test(doc):
+            value = doc.get(field)
+            if isinstance(value, list):
+                return any(map(inside, value))
+            return value is not None and inside(value)
+        return test
+
+    values = value if operation == Condition.IN else (value, )
+    if all(_hashable(v) for v in values):
+        values = frozenset(values)
+
+    def test(doc):
+        value = doc.get(field)
+        if isinstance(value, list):
+            return any(v in values for v in value)
+        return value is not None and value in values
+    return test
+
+
+def matcher(q, field=None, fields=None):
+    """
+    Compile Q to function, which tests document (dict in index format).
+    `fields` (model's field map) convert resolved date math.
+    """
+    field = q.field or field
+    if q.childs:
+        childs = [matcher(child, field, fields) for child in q.childs]
+        if q.operator == Operator.AND:
+            def test(doc):
+                for child in childs:
+                    if not child(doc):
+                        return False
+                return True
+        elif q.operator == Operator.OR:
+            def test(doc):
+                for child in childs:
+                    if child(doc):
+                        return True
+                return False
+        else:
+            def test(doc):
+                return reduce(xor, (child(doc) for child in childs))
+    else:
+        test = _leaf(field, q.operation, q.value,
+                     None if fields is None else fields.get(field))
+
+    if is_negated(q):
+        return lambda doc: not test(doc)
+    return test
+
+
+def evaluate(q, doc):
+    """Q matches document (dict in index format)"""
+    return matcher(q)(doc)
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _anchors(q, field=None):
+    """
+    Terms, one of which must be in matched document.
+    Returns set of (kind, field, value), or None if there is no such.
+    """
+    field = q.field or field
+    if is_negated(q):
+        return None
+
+    if q.childs:
+        childs = [_anchors(child, field) for child in q.childs]
+        if q.operator == Operator.AND:
+            childs = [c for c in childs if c is not None]
+            if not childs:
+                return None
+            return min(childs, key=lambda anchors: sum(
+                _WEIGHTS[a[0]] for a in anchors))
+        if q.operator == Operator.OR and None not in childs:
+            return set().union(*childs)
+        return None
+
+    if not field:
+        return None
+    if q.value is NoValue or has_dates(q.value):
+        return {(EXISTS, field, None)}
+    rng = Range.from_condition(q.operation, q.value)
+    if rng is not None:
+        if rng.fr is NoValue and rng.to is NoValue:
+            return {(EXISTS, field, None)}
+        return {(RANGE, field, rng)}
+    values = q.value if q.operation == Condition.IN else (q.value, )
+    if not all(_hashable(v) for v in values):
+        return None
+    return {(TERM, field, v) for v in values}
+
+
+def _bounds(anchors):
+    """Bounds of indexed ranges, by field"""
+    bounds = {}
+    for kind, field, rng in anchors or ():
+        if kind == RANGE:
+            bounds.setdefault(field, []).extend(
+                bound for bound in (rng.fr, rng.to) if bound is not NoValue)
+    return bounds
+
+
+class _RangeIndex:
+    """
+    Ranges of one field, to find ones with value.
+    Ranges without lower bound are sorted by upper one, so ones with
+    higher upper bound include value without checking. Others are
+    sorted by lower bound, in blocks with highest upper bound, so only
+    blocks, which can include value, are checked.
+    """
+
+    BLOCK = 32
+
+    def __init__(self, ranges):
+        upper = sorted(((r.to, r.to_incl, i) for r, i in ranges
+                        if r.fr is NoValue), key=lambda x: x[0])
+        self.upper_keys = [to for to, _, _ in upper]
+        self.upper_incl = [incl for _, incl, _ in upper]
+        self.upper = [i for _, _, i in upper]
+
+        lower = sorted((r for r in ranges if r[0].fr is not NoValue),
+                       key=lambda x: x[0].fr)
+        self.lower_keys = [r.fr for r, _ in lower]
+        self.lower = [(_inside(r), i) for r, i in lower]
+        self.block_to = []  # Highest upper bound of block, None if endless
+        for start in range(0, len(lower), self.BLOCK):
+            bounds = [r.to for r, _ in lower[start:start + self.BLOCK]]
+            self.block_to.append(
+                None if NoValue in bounds else max(bounds))
+
+    def find(self, value):
+        """Ranges (as ids), which include value"""
+        start = bisect_left(self.upper_keys, value)
+        end = bisect_right(self.upper_keys, value, start)
+        found = self.upper[end:]
+        found.extend(self.upper[i] for i in range(start, end)
+                     if self.upper_incl[i])
+
+        end = bisect_right(self.lower_keys, value)
+        for block, to in enumerate(self.block_to):
+            start = block * self.BLOCK
+            if start >= end:
+                break
+            if to is not None and to < value:
+                continue
+            found.extend(i for inside, i in self.lower[
+                start:min(start + self.BLOCK, end)] if inside(value))
+        return found
+
+
+class _Snapshot:
+    """
+    Immutable index, rebuilt on first match after changes.
+    Queries are numbered in order of adding, candidates are numbers.
+    """
+
+    def __init__(self, matchers, anchors):
+        self.keys = list(matchers)
+        self.matchers = [matchers[key] for key in self.keys]
+        self.terms = {}
+        self.exists = {}
+        self.always = []
+        ranges = {}
+        for i, key in enumerate(self.keys):
+            if anchors[key] is None:
+                self.always.append(i)
+            for kind, field, value in anchors[key] or ():
+                if kind == TERM:
+                    self.terms.setdefault((field, value), []).append(i)
+                elif kind == EXISTS:
+                    self.exists.setdefault(field, []).append(i)
+                else:
+                    ranges.setdefault(field, []).append((value, i))
+        self.ranges = {field: _RangeIndex(items)
+                       for field, items in ranges.items()}
+
+    def candidates(self, doc):
+        found = set(self.always)
+        terms, exists, ranges = self.terms, self.exists, self.ranges
+        for field, value in doc.items():
+            values = _values(value)
+            if not values:
+                continue
+            if field in exists:
+                found.update(exists[field])
+            index = ranges.get(field)
+            for v in values:
+                if _hashable(v):
+                    found.update(terms.get((field, v), ()))
+                if index is not None:
+                    found.update(index.find(v))
+        return found
+
+
+class Percolator:
+    """
+    Stored queries by key. With `model`, query values are converted
+    with model fields' `to_index`, as documents are.
+    """
+
+    def __init__(self, model=None):
+        self.model = model
+        self._queries = {}
+        self._matchers = {}
+        self._anchors = {}
+        self._bounds = {}  # Field -> {key: one of indexed range bounds}
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._queries)
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {1} queries>".format(self, len(self))
+
+    def _prepare(self, q, field=None):
+        """Convert values of Q to index format"""
+        field = q.field or field
+        if q.childs:
+            return q._replace(childs=tuple(
+                self._prepare(child, field) for child in q.childs))
+        converter = getattr(self.model, '_field_map', {}).get(field)
+        if converter is None or q.value is NoValue:
+            return q
+        operation, value = _index_value(converter, q.operation, q.value)
+        return q._replace(operation=operation, value=value)
+
+    def _check_bounds(self, key, bounds):
+        """
+        Indexed range bounds must be comparable with ones of other
+        queries on same field, else index can't be sorted.
+        """
+        for field, values in bounds.items():
+            sample = next((bound for other, bound in self._bounds.get(
+                field, {}).items() if other != key), values[0])
+            try:
+                for bound in values:
+                    bound < sample  # TypeError, if not comparable
+            except TypeError:
+                raise PSOException(
+                    "Range bound {!r} of {!r} can't be compared with {!r} "
+                    "of other queries on {!r}".format(
+                        bound, key, sample, field)) from None
+
+    def add(self, key, q):
+        """
+        Store query. Query with same key is replaced. Raises
+        PSOException, if its range bounds can't be compared with ones
+        of stored queries (E.G. str and int).
+        """
+        q = self._prepare(q)
+        anchors = _anchors(q)
+        bounds = _bounds(anchors)
+        with self._lock:
+            self._check_bounds(key, bounds)
+            self._forget_bounds(key)
+            self._queries[key] = q
+            self._matchers[key] = matcher(
+                q, fields=getattr(self.model, '_field_map', None))
+            self._anchors[key] = anchors
+            for field, values in bounds.items():
+                self._bounds.setdefault(field, {})[key] = values[0]
+            self._snapshot = None
+
+    def remove(self, key):
+        with self._lock:
+            self._queries.pop(key, None)
+            self._matchers.pop(key, None)
+            self._anchors.pop(key, None)
+            self._forget_bounds(key)
+            self._snapshot = None
+
+    def _forget_bounds(self, key):
+        for field in [f for f, keys in self._bounds.items() if key in keys]:
+            del self._bounds[field][key]
+            if not self._bounds[field]:
+                del self._bounds[field]
+
+    def _index(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = _Snapshot(
+                        dict(self._matchers), dict(self._anchors))
+                snapshot = self._snapshot
+        return snapshot
+
+    def match(self, doc):
+        """Keys of queries, matching model or document in index format"""
+        if not isinstance(doc, dict):
+            doc = doc.to_index()
+        snapshot = self._index()
+        keys, matchers = snapshot.keys, snapshot.matchers
+        return [keys[i] for i in sorted(snapshot.candidates(doc))
+                if matchers[i](doc)]
+
+    def match_many(self, docs):
+        """List of matched keys for each document"""
+        if docs and not isinstance(docs[0], dict):
+            docs = type(docs[0]).to_index_many(docs)
+        return [self.match(doc) for doc in docs]
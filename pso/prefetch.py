@@ -0,0 +1,63 @@
+"""
+Background read-ahead for paged iteration.
+"""
+import queue
+import threading
+
+
+_DONE = object()
+
+
+class _Error:
+    """Exception raised in producer, to be re-raised in consumer"""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def read_ahead(iterable, size=1):
+    """
+    Iterate over `iterable` in background thread.
+
+    Up to `size` items are fetched ahead and kept in bounded buffer,
+    while the caller consumes current one. When iteration stops early
+    (break, exception, garbage collection) producer is cancelled.
+    """
+    buffer = queue.Queue(maxsize=max(size, 1))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Error(e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Error):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
@@ -4,8 +4,11 @@ Prototype of immutable Query entity objects
 Will be used in fields classes, E.G:
 
 user_qs = categories in Article.cateory & Article.user == 777
-not_published = Q(published__gt=datetime.now()) | Q(visible=False)
-published = Q(published__le=datetime.now()) & Q(visible=True)
+not_published = Q(published__gt=NOW) | Q(visible=False)
+published = Q(published__le=NOW) & Q(visible=True)
+
+NOW (see `pso.datemath`) is resolved by engine, so filter is the same
+for each request and cached. `datetime.now()` would be unique each time.
 
 
 Article.filter(not_published)[0, 100]
@@ -24,10 +27,12 @@ from pso.constants import Operator
 from pso.constants import Condition
 from pso.range import Range
 from pso.range import range_sort_func
+from pso.instrumentation import Phase
+from pso.instrumentation import instrument
+from pso.explain import explain
 
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG)
 
 
 def log_this(func):
@@ -36,6 +41,8 @@ def log_this(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         res = func(*args, **kwargs)
+        if not log.isEnabledFor(logging.DEBUG):
+            return res
         log.debug(msg_template.format(
             datetime.now(),
             func.__name__,
@@ -50,6 +57,7 @@ def log_this(func):
 class QComparisonMixin():
     """QComparisonMixin - defines comparsion magic for Q objects"""
 
+    @instrument(Phase.NORMALIZE)
     @log_this
     def _merge_ranges(self):
         # TODO: Split this func.
@@ -60,7 +68,11 @@ class QComparisonMixin():
         previous = None
 
         # TODO: move sort func, to utils
-        for q in sorted(ranges, key=range_sort_func):
+        try:
+            ranges = sorted(ranges, key=range_sort_func)
+        except TypeError:  # Bounds can't be compared, E.G. date math
+            return self
+        for q in ranges:
             try:
                 # TODO predefine 'previos'
                 merged_range = previous.value.merge(q.value, self.operator)
@@ -198,10 +210,15 @@ class BaseQ(QTuple):
 
     @property
     def is_field(self):
-        if self.qtype == self.AGGREGATION:
-            return reduce(_is_onefield, self.childs)
-        else:
+        if not self.childs:
             return self.field
+        # Immutable, so computed once for aggregation
+        try:
+            return self.__dict__['_is_field']
+        except KeyError:
+            field = self.__dict__['_is_field'] = reduce(
+                _is_onefield, self.childs)
+            return field
 
     # TODO work with namedtuple
     def __new__(cls, *args, field=None, operation=None, value=NoValue,
@@ -275,6 +292,10 @@ class BaseQ(QTuple):
             value=value
         )
 
+    def explain(self):
+        """Shape and estimated cost. See `pso.explain`"""
+        return explain(self)
+
     # Logical tree
     def __invert__(self):
         return self._replace(inverted=not self.inverted)
@@ -294,8 +315,7 @@ class BaseQ(QTuple):
 
 class Q(QComparisonMixin, QShiftContainsMixin, QNumericBoostMixin, BaseQ):
 
-    def __hash__(self):
-        return hash(tuple(self))
+    __hash__ = tuple.__hash__  # Same as hash(tuple(self)), without copy
 
     @log_this
     def _make_op(self, operation, value):
@@ -350,6 +370,7 @@ def unpack_and_join(nested, obj, inv, operator):
         nested.add(obj)
 
 
+@instrument(Phase.NORMALIZE)
 @log_this
 def merge_by_field(q_set, op):
     mapper = defaultdict(set)
@@ -369,3 +390,20 @@ def merge_by_field(q_set, op):
             operator=op,
             childs=(q._replace(field=None) for q in queries)
         ))
+
+
+def combine(queries, operator=Operator.AND):
+    """
+    Merge many Q objects at once. Same as joining them with & or |,
+    but each query is unpacked and normalized once.
+    """
+    childs = set()
+    for q in queries:
+        unpack_and_join(childs, q, not q.inverted, operator)
+
+    merge_by_field(childs, operator)
+    childs = {q._merge_ranges() if q.childs else q for q in childs}
+
+    if len(childs) == 1:
+        return childs.pop()._merge_ranges()
+    return Q(operator, childs=tuple(childs))._merge_ranges()
@@ -4,12 +4,42 @@ QuerySet ...
 from pso.q import Q
 # from copy import copy
 from pso.utils import copy_self
+from pso.utils import Chain
+from pso.prefetch import read_ahead
+from pso.compiler import compile_q
+from pso.compiler import MATCH_ALL
+from pso.compiler import MATCH_NONE
+from pso.encoding import EncodingError
+from pso.encoding import fingerprint
+from pso.exceptions import DeadlineExceeded
+from pso.exceptions import PSOException
+from pso.instrumentation import Phase
+from pso.instrumentation import span
+from pso.result import ColumnarResultSet
+from pso.result import ResultSet
+from pso.datemath import round_dates
+from pso.deadline import Deadline
+from pso.explain import Cost
+from pso.explain import explain
+from pso.filters import reduce_filters
+from pso.optimizer import optimize
 
 
 class QuerySetDescriptor():
+    """
+    Model's base queryset. QuerySets are immutable, so one is created
+    per model and shared. Racing threads may create it twice, harmless.
+    It's kept in model's own namespace, not in descriptor: queryset
+    references its model, so weak keys wouldn't let it be collected,
+    and dynamically created models would leak.
+    """
 
     def __get__(self, instance, model):
-        return model.queryset_class(model=model)
+        qs = model.__dict__.get('_base_queryset')
+        if qs is None or type(qs) is not model.queryset_class:
+            qs = model.queryset_class(model=model)
+            model._base_queryset = qs
+        return qs
 
     def __set__(self, model, value):
         raise AttributeError
@@ -18,32 +48,43 @@ class QuerySetDescriptor():
 class BaseQuerySet():
     """
     Base queryset class. You shoud be itheritent from it.
+
+    QuerySet is immutable: each method returns new one, and state is
+    kept in persistent structures (`Chain` of filters, immutable `Q`),
+    shared between clones. So cloning is O(1), and querysets are safe
+    to use as module-level constants, across threads and requests.
     """
 
     __slots__ = (
-        '_offset', '_limit', '_filter', '_search', '_model', '_prefetch')
+        '_offset', '_limit', '_filter', '_search', '_model', '_prefetch',
+        '_deadline')
+
+    page_size = 100  # Documents per request, when iterating
 
     def __init__(self, model=None):
         self._offset = 0
         self._limit = None
-        self._filter = []
+        self._filter = Chain()
         self._search = None
         self._model = model
-        self._prefetch = False
+        self._prefetch = 0
+        self._deadline = None  # Budget in seconds, or shared Deadline
 
     def __repr__(self):
         return "<{model_name} | Search: {search_qs!r} | Filter: {filter_qs!r} | {limit}{offset}>".format(
             model_name=self._model.__name__,
             search_qs=self._search,
-            filter_qs=self._filter,
+            filter_qs=list(self._filter),
             limit=" LIMIT {}".format(self._limit) if self._limit else '',
             offset=" OFFSET {}".format(self._offset) if self._offset else '',
         )
 
     def __copy__(self):
-        new_one = type(self)()
-        for attr in self.__slots__:
-            setattr(new_one, attr, getattr(self, attr))
+        """Shallow copy. Slots values are immutable, so it's enough"""
+        new_one = type(self).__new__(type(self))
+        for cls in type(self).__mro__:
+            for attr in getattr(cls, '__slots__', ()):
+                setattr(new_one, attr, getattr(self, attr))
         return new_one
 
     @copy_self
@@ -57,7 +98,7 @@ class BaseQuerySet():
             - price [100 TO 499] (faceted)
             - shipping_to = 'USA' or 'WORDWIDE' (multifield)
         """
-        new_qs._filter.append(Q(*args, **kwargs))
+        new_qs._filter = new_qs._filter.append(Q(*args, **kwargs))
         return new_qs
 
     @copy_self
@@ -77,8 +118,37 @@ class BaseQuerySet():
         return self.search(*args, **kwargs)
 
     @copy_self
-    def prefetch(self):
-        self._prefetch = True
+    def _replace_search(new_qs, search, filters=()):
+        """Replace search query, and add filters"""
+        new_qs._search = search
+        for q in filters:
+            new_qs._filter = new_qs._filter.append(q)
+        return new_qs
+
+    @copy_self
+    def prefetch(new_qs, pages=1):
+        """
+        Fetch next `pages` pages in background, while iterating.
+        Use `pages=0` to disable.
+        """
+        new_qs._prefetch = pages
+        return new_qs
+
+    @copy_self
+    def deadline(new_qs, budget):
+        """
+        Time budget in seconds, which starts on execution, or `Deadline`
+        to share with other querysets. Expired budget stops pagination,
+        result is marked as partial. Use `None` to disable.
+        """
+        new_qs._deadline = budget
+        return new_qs
+
+    def _start(self):
+        """Queryset with running Deadline, for one execution"""
+        if self._deadline is None or isinstance(self._deadline, Deadline):
+            return self
+        return self.deadline(Deadline(self._deadline))
 
     @copy_self
     def _slice(new_qs, offset=None, limit=None):
@@ -92,11 +162,237 @@ class BaseQuerySet():
 
     def __getitem__(self, key):
         if isinstance(key, slice):  # Sequence-like slice loockup
-            return self._slice(key.start, key.stop)
             # Step is currently unsupported
+            limit = None if key.stop is None \
+                else max(key.stop - (key.start or 0), 0)
+            return self._slice(key.start, limit)
 
         return super(self, BaseQuerySet).__getitem__(key)
 
+    def _compile_q(self, q):
+        """
+        Compile Q to query string, using model's cache. Q, which can't
+        be fingerprinted, is not cached.
+        """
+        cache = self._model.cache
+        if cache is None:
+            return compile_q(q)
+
+        try:
+            key = fingerprint(b'compiled', q)
+        except EncodingError:
+            return compile_q(q)
+        compiled = cache.get(key)
+        if compiled is None:
+            compiled = compile_q(q)
+            cache.set(key, compiled.encode('utf-8'))
+            return compiled
+        return compiled.decode('utf-8')
+
+    def _compile_filters(self):
+        """Reduced and optimized filters. See `pso.optimizer`"""
+        compiled = []
+        filters = (round_dates(q, self._model) for q in self._filter)
+        for q in reduce_filters(filters, self._model):
+            q = optimize(q)
+            if q is True:  # Matches everything
+                continue
+            if q is False:
+                return [MATCH_NONE]
+            compiled.append(self._compile_q(q))
+        return compiled
+
+    def _compile(self, offset, limit):
+        """Build engine request. Solr JSON request API by default"""
+        search = self._search
+        return {
+            'query': self._compile_q(round_dates(search, self._model))
+            if search else MATCH_ALL,
+            'filter': self._compile_filters(),
+            'offset': offset,
+            'limit': limit,
+        }
+
+    def _prepare(self, offset, limit):
+        """Check queryset with model's policy and compile request"""
+        backend = self._model.backend
+        if backend is None:
+            raise PSOException(
+                "{} has no backend".format(self._model.__name__))
+
+        qs = self
+        if self._model.policy is not None:
+            qs = self._model.policy(self)
+
+        with span(Phase.COMPILE):
+            request = qs._compile(offset, limit)
+        if self._deadline is not None:
+            self._deadline.check()
+            request['params'] = {
+                'timeAllowed': self._deadline.time_allowed()}
+        return backend, request
+
+    def _fetch(self, offset, limit):
+        """
+        Request one page of documents from engine.
+        Returns list of raw documents (dicts).
+        """
+        backend, request = self._prepare(offset, limit)
+        return backend.search(
+            request, self._model.cache, self._deadline).docs
+
+    def _fetch_cursor(self, cursor, limit):
+        """
+        Request one batch with deep paging cursor (Solr's cursorMark).
+        Sorted by primary key, as cursor requires unique sort.
+        Returns (raw documents, next cursor). Not cached.
+        """
+        backend, request = self._prepare(0, limit)
+        request['sort'] = '{} asc'.format(self._model.get_pk().name)
+        request.setdefault('params', {})['cursorMark'] = cursor
+        response = backend.search(request, deadline=self._deadline)
+        return response.docs, response.cursor
+
+    def _hydrate(self, doc):
+        """Create model instance from raw document"""
+        return self._model.from_index(doc)
+
+    def _hydrate_many(self, docs):
+        """Create model instances from page of raw documents"""
+        return self._model.from_index_many(docs)
+
+    def _fetch_next(self, fetch, *args):
+        """
+        Fetch next (not first) page. Returns None, when deadline is
+        passed, and marks result as partial.
+        """
+        try:
+            if self._deadline is not None:
+                self._deadline.check()
+            return fetch(*args)
+        except DeadlineExceeded:
+            self._deadline.partial = True
+            return None
+
+    def _pages(self):
+        """Generate pages of raw documents, using offset pagination"""
+        offset = self._offset or 0
+        remaining = self._limit
+        first = True
+        while remaining is None or remaining > 0:
+            size = self.page_size
+            if remaining is not None:
+                size = min(size, remaining)
+                remaining -= size
+            if first:
+                page = self._fetch(offset, size)
+                first = False
+            else:
+                page = self._fetch_next(self._fetch, offset, size)
+                if page is None:
+                    return
+            if page:
+                yield page
+            if len(page) < size:
+                return
+            offset += size
+
+    def _cursor_pages(self, batch_size):
+        """Generate batches of raw documents, using cursor pagination"""
+        cursor = '*'
+        while True:
+            if cursor == '*':
+                docs, next_cursor = self._fetch_cursor(cursor, batch_size)
+            else:
+                batch = self._fetch_next(
+                    self._fetch_cursor, cursor, batch_size)
+                if batch is None:
+                    return
+                docs, next_cursor = batch
+            if docs:
+                yield docs
+            if not docs or next_cursor in (None, cursor):
+                return
+            cursor = next_cursor
+
+    def export(self, batch_size=1000, sink=None, prefetch=2):
+        """
+        Walk all matched documents, ignoring limit and offset.
+        Yields lists of models, batch by batch, and writes them to
+        `sink` (see `pso.export`) if given.
+
+        Uses cursor instead of offset, so deep pages are as cheap as
+        first one, and memory is constant. Next `prefetch` batches are
+        fetched and parsed in background, while current is processed.
+        """
+        qs = self._start()
+        batches = qs._cursor_pages(batch_size)
+        if prefetch:
+            batches = read_ahead(batches, prefetch)
+        try:
+            for docs in batches:
+                with span(Phase.HYDRATE, hits=len(docs)):
+                    models = qs._hydrate_many(docs)
+                if sink is not None:
+                    sink.write(models)
+                yield models
+        finally:
+            batches.close()
+
+    def _read_pages(self):
+        """Pages, fetched ahead in background if prefetch is set"""
+        pages = self._pages()
+        if self._prefetch:
+            pages = read_ahead(pages, self._prefetch)
+        return pages
+
+    def _models(self):
+        pages = self._read_pages()
+        try:
+            for page in pages:
+                with span(Phase.HYDRATE, hits=len(page)):
+                    models = self._hydrate_many(page)
+                yield from models
+        finally:
+            pages.close()
+
+    def __iter__(self):
+        return self._start()._models()
+
+    def fetch(self):
+        """Fetch all documents in window to `ResultSet`"""
+        qs = self._start()
+        models = list(qs._models())
+        return ResultSet(models, partial=qs._partial())
+
+    def _partial(self):
+        return self._deadline is not None and self._deadline.partial
+
+    def columnar(self):
+        """
+        Fetch all documents in window to `ColumnarResultSet`.
+        Requires NumPy.
+        """
+        qs = self._start()
+        docs = [doc for page in qs._read_pages() for doc in page]
+        with span(Phase.HYDRATE, hits=len(docs)):
+            return ColumnarResultSet.from_docs(
+                self._model, docs, partial=qs._partial())
+
+    def explain(self):
+        """
+        Shape and cost of search and filters.
+        Returns {'search': Explain, 'filter': [Explain], 'cost': Cost}
+        """
+        search = explain(self._search) if self._search else None
+        filters = [explain(q) for q in self._filter]
+        return {
+            'search': search,
+            'filter': filters,
+            'cost': max([e.cost for e in filters + [search] if e],
+                        default=Cost.LOW),
+        }
+
     def _check_search_condition(self):
         """ Check for excluding queries. Negative limit etc."""
         pass
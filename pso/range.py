@@ -1,5 +1,5 @@
 from collections import namedtuple
-from pso.constants import NoValue, Operator
+from pso.constants import NoValue, Operator, Condition
 
 
 class Range(namedtuple('Range', ['fr', 'to', 'fr_incl', 'to_incl'])):
@@ -8,12 +8,12 @@ class Range(namedtuple('Range', ['fr', 'to', 'fr_incl', 'to_incl'])):
         return super(Range, cls).__new__(cls, fr, to, fr_incl, to_incl)
 
     def _check_overlap(self, other):
-        if self.to and other.fr:
+        if self.to is not NoValue and other.fr is not NoValue:
             incl = (self.to_incl or other.fr_incl)
             if other.fr > self.to or (other.fr == self.to and not incl):
                 return False
 
-        if self.fr and other.to:
+        if self.fr is not NoValue and other.to is not NoValue:
             incl = (self.fr_incl or other.to_incl)
             if self.fr > other.to or (self.fr == other.to and not incl):
                 return False
@@ -22,10 +22,10 @@ class Range(namedtuple('Range', ['fr', 'to', 'fr_incl', 'to_incl'])):
 
     @staticmethod
     def _merge(func, v1, v2):
-        if v1[0] and v2[0]:
+        if v1[0] is not NoValue and v2[0] is not NoValue:
             return func(v1, v2)
         else:
-            return v1 if v1[0] else v2
+            return v1 if v1[0] is not NoValue else v2
 
     def merge(self, other, operator):
         if not self._check_overlap(other):
@@ -45,9 +45,32 @@ class Range(namedtuple('Range', ['fr', 'to', 'fr_incl', 'to_incl'])):
 
         to, to_incl = self._merge(
             right, (self.to, self.to_incl), (other.to, other.to_incl))
-        print(self, other)
         return Range(fr, to, fr_incl, to_incl)
 
+    def includes(self, value):
+        """Value is inside range"""
+        if self.fr is not NoValue and (
+                value < self.fr or (value == self.fr and not self.fr_incl)):
+            return False
+        if self.to is not NoValue and (
+                value > self.to or (value == self.to and not self.to_incl)):
+            return False
+        return True
+
+    def covers(self, other):
+        """Other range is inside this one"""
+        if self.fr is not NoValue:
+            if other.fr is NoValue or other.fr < self.fr or (
+                    other.fr == self.fr and other.fr_incl
+                    and not self.fr_incl):
+                return False
+        if self.to is not NoValue:
+            if other.to is NoValue or other.to > self.to or (
+                    other.to == self.to and other.to_incl
+                    and not self.to_incl):
+                return False
+        return True
+
     def __and__(self, other):
         """ Intersection """
         return self.merge(other, Operator.AND)
@@ -67,6 +90,25 @@ class Range(namedtuple('Range', ['fr', 'to', 'fr_incl', 'to_incl'])):
         include = (True, True) if r.step is True else (False, False)
         return cls(r.start, r.stop, *include)
 
+    @classmethod
+    def from_condition(cls, operation, value):
+        """
+        Range from comparison Q. E.G. Q(price__lt=10) -> [* TO 10}
+        Returns None for non range conditions.
+        """
+        if operation == Condition.RANGE:
+            return cls.from_range(value) if isinstance(value, range) \
+                else value
+        if operation == Condition.LT:
+            return cls(to=value, to_incl=False)
+        if operation in (Condition.LE, 'lte'):
+            return cls(to=value, to_incl=True)
+        if operation == Condition.GT:
+            return cls(fr=value, fr_incl=False)
+        if operation in (Condition.GE, 'gte'):
+            return cls(fr=value, fr_incl=True)
+        return None
+
 
 def range_sort_func(x):
     return (
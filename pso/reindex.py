@@ -0,0 +1,130 @@
+"""
+Parallel reindex: models are built and serialized in process pool.
+
+    def build(ids):  # Top-level function, runs in worker process
+        return [Article(**row) for row in db.load(ids)]
+
+    with BulkIndexer(Article.backend) as indexer:
+        reindex(chunked(all_ids, 1000), build, indexer, processes=8)
+
+Only chunk descriptions (E.G. ids or key ranges) are sent to workers,
+so rows are loaded there. Each worker returns one buffer with all
+serialized documents of chunk, and their lengths, instead of list of
+objects, so results are transferred without per-document pickling.
+Documents are memoryview slices of that buffer, not copies.
+"""
+import json
+import os
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from itertools import islice
+
+from pso.backends import BaseBackend
+
+
+def chunked(iterable, size):
+    """Split iterable to lists of `size` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _dumps(doc):
+    """Same as `BaseBackend.serialize`"""
+    return json.dumps(doc).encode('utf-8')
+
+
+def _serializer(backend):
+    """
+    Picklable serializer of backend. Default one is module function,
+    so backend (E.G. with locks and thread pools) isn't pickled.
+    Overridden `serialize` is sent to workers with its backend.
+    """
+    if type(backend).serialize is BaseBackend.serialize:
+        return _dumps
+    return backend.serialize
+
+
+def _serialize(models, serialize=_dumps):
+    """Serialized documents of models, with batch field converters"""
+    models = list(models)
+    if not models:
+        return []
+    cls = type(models[0])
+    if all(type(model) is cls for model in models):
+        docs = cls.to_index_many(models)
+    else:
+        docs = [model.to_index() for model in models]
+    return [serialize(doc) for doc in docs]
+
+
+def _work(build, serialize, chunk):
+    """Runs in worker. Returns (buffer, lengths)"""
+    docs = _serialize(build(chunk), serialize)
+    return b''.join(docs), array('I', map(len, docs)).tobytes()
+
+
+def _split(buffer, lengths):
+    """Documents as memoryview slices of buffer, without copying"""
+    view = memoryview(buffer)
+    docs, pos = [], 0
+    for length in array('I', lengths):
+        docs.append(view[pos:pos + length])
+        pos += length
+    return docs
+
+
+def serialize_parallel(chunks, build, processes=None, ordered=False,
+                       mp_context=None, serialize=None):
+    """
+    Yield lists of serialized documents (bytes-like memoryviews), one
+    per chunk. `build(chunk)` returns models of chunk, and `serialize`
+    (JSON by default) turns document dict to bytes, both must be
+    picklable. With `ordered`, chunks are yielded in input order,
+    otherwise as soon as they are ready. At most two chunks per process
+    are in flight, so memory doesn't grow with input.
+    """
+    processes = processes or os.cpu_count() or 1
+    serialize = serialize or _dumps
+    with ProcessPoolExecutor(processes, mp_context=mp_context) as pool:
+        limit = 2 * processes
+        pending = deque()
+        chunks = iter(chunks)
+
+        def submit():
+            for chunk in islice(chunks, limit - len(pending)):
+                pending.append(pool.submit(_work, build, serialize, chunk))
+
+        submit()
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                yield _split(*future.result())
+            submit()
+
+
+def reindex(chunks, build, indexer, processes=None, ordered=False,
+            mp_context=None):
+    """
+    Serialize models in process pool with indexer's backend serializer,
+    and feed them to `BulkIndexer`. Returns number of documents.
+    Backend with overridden `serialize` must be picklable.
+    """
+    count = 0
+    for docs in serialize_parallel(chunks, build, processes, ordered,
+                                   mp_context, _serializer(indexer.backend)):
+        for doc in docs:
+            indexer.add_raw(doc)
+        count += len(docs)
+    return count
@@ -0,0 +1,204 @@
+"""
+Result sets.
+"""
+from datetime import datetime
+from datetime import timezone
+from functools import reduce
+
+try:
+    import numpy
+except ImportError:  # Optional, only for columnar results
+    numpy = None
+
+from pso.constants import Condition
+from pso.constants import NoValue
+from pso.constants import Operator
+from pso.datemath import resolve_dates
+from pso.datemath import utcnow
+from pso.exceptions import PSOException
+from pso.q import Q
+from pso.range import Range
+
+
+def _require_numpy():
+    if numpy is None:
+        raise PSOException("NumPy is required for columnar results")
+
+
+def _item(value):
+    """NumPy scalar -> Python value, objects are returned as is"""
+    return value.item() if isinstance(value, numpy.generic) else value
+
+
+class ResultSet(list):
+    """
+    Models of fetched window. `partial` is set, when deadline passed
+    before all pages were fetched, or engine returned partial results.
+    """
+
+    def __init__(self, models=(), partial=False):
+        super().__init__(models)
+        self.partial = partial
+
+    def __repr__(self):
+        return "<{}: {} hits{}>".format(
+            self.__class__.__name__, len(self),
+            ' (partial)' if self.partial else '')
+
+
+class ColumnarResultSet:
+    """
+    Hits stored column by column, one NumPy array per model field.
+
+    Fields with `dtype` (numeric, dates) are typed arrays,
+    other fields are object arrays. Can be filtered by Q objects
+    and sliced again, without requests to engine:
+
+        rs = Article.objects.filter(user=1)[0:100000].columnar()
+        recent = rs.filter(Q('published') >= week_ago)[:100]
+        pandas.DataFrame(recent.columns)
+    """
+
+    _combine = {
+        Operator.AND: 'logical_and',
+        Operator.OR: 'logical_or',
+        Operator.XOR: 'logical_xor',
+    }
+
+    def __init__(self, model, columns, partial=False):
+        _require_numpy()
+        self.model = model
+        self.columns = columns
+        self.partial = partial  # See `ResultSet`
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}: {1} {2} hits>".format(
+            self, self.model.__name__, len(self))
+
+    @classmethod
+    def from_docs(cls, model, docs, partial=False):
+        """Build columns from raw engine documents"""
+        _require_numpy()
+        docs = list(docs)
+        return cls(model, {
+            field.name: cls._make_column(
+                field, [doc.get(field.name) for doc in docs])
+            for field in model.get_fields()
+        }, partial)
+
+    @staticmethod
+    def _make_column(field, values):
+        values = field.to_python_many(values)
+
+        if field.dtype and not field.multi_valued:
+            dtype = field.dtype
+            if dtype.startswith('int') and None in values:
+                dtype = 'float64'  # NaN for missing values
+            return numpy.array(values, dtype=dtype)
+
+        column = numpy.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, key):
+        """
+        Column by name, row (dict) by index,
+        or new result set by slice / index array / boolean mask.
+        """
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, int):
+            size = len(self)
+            if key < 0:
+                key += size
+            if not 0 <= key < size:
+                raise IndexError("Row index out of range")
+            return {name: _item(column[key])
+                    for name, column in self.columns.items()}
+        return type(self)(self.model, {
+            name: column[key] for name, column in self.columns.items()},
+            self.partial)
+
+    def __iter__(self):
+        """Rows as dicts"""
+        for i in range(len(self)):
+            yield self[i]
+
+    def filter(self, *args, **kwargs):
+        return self[self.mask(Q(*args, **kwargs))]
+
+    def mask(self, q, field=None, now=None):
+        """
+        Evaluate Q object as boolean mask over columns.
+        Date math is resolved at `now`, current UTC time by default.
+        """
+        now = utcnow() if now is None else now
+        field = q.field or field
+        if q.childs:
+            combine = getattr(numpy, self._combine[q.operator])
+            result = reduce(combine, (self.mask(c, field, now)
+                                      for c in q.childs))
+        else:
+            result = self._leaf_mask(
+                field, q.operation, resolve_dates(q.value, now))
+
+        if q.inverted ^ (q.operation == Condition.NE):
+            result = ~result
+        return result
+
+    def _leaf_mask(self, field, operation, value):
+        if field not in self.columns:
+            raise PSOException("Unknown column {!r}".format(field))
+        column = self.columns[field]
+
+        if value is NoValue:  # Field only. Check for existence
+            return self._not_null(column)
+
+        rng = Range.from_condition(operation, value)
+        if getattr(self.model, field).multi_valued:
+            if rng is not None:
+                test = rng.includes
+            else:
+                test = (value if operation == Condition.IN
+                        else (value, )).__contains__
+            return numpy.fromiter(
+                (any(map(test, row or ())) for row in column),
+                dtype=bool, count=len(column))
+
+        if rng is not None:
+            result = numpy.ones(len(column), dtype=bool)
+            if rng.fr is not NoValue:
+                fr = self._scalar(column, rng.fr)
+                result &= (column >= fr) if rng.fr_incl else (column > fr)
+            if rng.to is not NoValue:
+                to = self._scalar(column, rng.to)
+                result &= (column <= to) if rng.to_incl else (column < to)
+            return result
+
+        if operation == Condition.IN:
+            return numpy.isin(
+                column, [self._scalar(column, v) for v in value])
+        return numpy.asarray(column == self._scalar(column, value),
+                             dtype=bool)
+
+    @staticmethod
+    def _scalar(column, value):
+        if column.dtype.kind == 'M':
+            if isinstance(value, datetime) and value.tzinfo is not None:
+                # Naive UTC, as `DateTimeField.to_index`
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return numpy.datetime64(value, 'us')
+        return value
+
+    @staticmethod
+    def _not_null(column):
+        if column.dtype.kind == 'M':
+            return ~numpy.isnat(column)
+        if column.dtype.kind == 'f':
+            return ~numpy.isnan(column)
+        if column.dtype.kind == 'O':
+            return numpy.array([v is not None for v in column], dtype=bool)
+        return numpy.ones(len(column), dtype=bool)
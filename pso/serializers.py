@@ -0,0 +1,135 @@
+"""
+Wire formats of engine responses, and HTTP compression.
+
+    Article.backend = HTTPBackend(url, codec=CBOR, compress='gzip')
+
+Response codec is chosen per backend and requested with `wt` param.
+Requests are always JSON (Solr JSON request API), but may be
+compressed. Compressed responses are decompressed chunk by chunk,
+while they are read from socket, up to `MAX_BODY_SIZE` bytes.
+Codecs decode whole decompressed body: json and cbor2 have no
+incremental decoder of one document.
+"""
+import abc
+import gzip
+import json
+import zlib
+
+try:
+    import cbor2
+except ImportError:  # Optional, only for CBOR responses
+    cbor2 = None
+
+from pso.exceptions import PSOException
+
+
+CHUNK_SIZE = 64 * 1024
+MAX_BODY_SIZE = 256 * 1024 * 1024  # Of decompressed response
+
+
+class Codec(metaclass=abc.ABCMeta):
+    """Response format. `wt` is engine's writer type name"""
+    name = None
+    wt = None
+    content_type = None
+
+    def __repr__(self):
+        return "<{}: {}>".format(self.__class__.__name__, self.name)
+
+    @abc.abstractmethod
+    def dumps(self, data):
+        """Data -> bytes"""
+
+    @abc.abstractmethod
+    def loads(self, raw):
+        """Bytes -> data"""
+
+
+class JSONCodec(Codec):
+    name = wt = 'json'
+    content_type = 'application/json'
+
+    def dumps(self, data):
+        return json.dumps(data).encode('utf-8')
+
+    def loads(self, raw):
+        return json.loads(raw)
+
+
+class CBORCodec(Codec):
+    """Binary JSON (RFC 8949), Solr's `wt=cbor`. Requires cbor2"""
+    name = wt = 'cbor'
+    content_type = 'application/cbor'
+
+    def __init__(self):
+        if cbor2 is None:
+            raise PSOException("cbor2 is required for CBOR responses")
+
+    def dumps(self, data):
+        return cbor2.dumps(data)
+
+    def loads(self, raw):
+        return cbor2.loads(raw)
+
+
+JSON = JSONCodec()
+
+
+# Compression
+ENCODINGS = ('gzip', 'deflate')
+ACCEPT_ENCODING = ', '.join(ENCODINGS)
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    if encoding == 'deflate':
+        return zlib.compress(data, 6)
+    raise PSOException("Unknown encoding {!r}".format(encoding))
+
+
+def read_body(stream, encoding=None, max_size=None):
+    """
+    Read response body from file-like `stream`, decompressing it
+    by `Content-Encoding` chunk by chunk, as it arrives.
+    Body larger than `max_size` (`MAX_BODY_SIZE` by default) raises
+    PSOException, E.G. for gzip bomb, as does truncated compressed body.
+    """
+    if max_size is None:
+        max_size = MAX_BODY_SIZE
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('', 'identity'):
+        body = stream.read(max_size + 1)
+        if len(body) > max_size:
+            raise _too_large(max_size)
+        return body
+    if encoding not in ('gzip', 'x-gzip', 'deflate'):
+        raise PSOException("Unknown encoding {!r}".format(encoding))
+
+    # 32 + MAX_WBITS: detect gzip or zlib header
+    decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+    chunks, size = [], 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        while chunk:
+            # One byte over limit is enough to detect it
+            data = decompressor.decompress(chunk, max_size - size + 1)
+            size += len(data)
+            if size > max_size:
+                raise _too_large(max_size)
+            chunks.append(data)
+            chunk = decompressor.unconsumed_tail
+    data = decompressor.flush()
+    if size + len(data) > max_size:
+        raise _too_large(max_size)
+    if not decompressor.eof:
+        raise PSOException("Truncated {} response body".format(encoding))
+    chunks.append(data)
+    return b''.join(chunks)
+
+
+def _too_large(max_size):
+    return PSOException(
+        "Response body is larger than {} bytes".format(max_size))
@@ -1,12 +1,81 @@
 """
-PSO fields magic.
+PSO helpers.
 """
 from functools import wraps
 from copy import copy
 
 
+MEMO_SIZE = 1024
+
+
+def memoize(memo, key, value, size=MEMO_SIZE):
+    """
+    Store value in bounded memo (OrderedDict), oldest entries are
+    dropped. Without lock: concurrent writers may drop more entries,
+    it's only a cache.
+    """
+    memo[key] = value
+    if len(memo) > size:
+        try:
+            memo.popitem(last=False)
+        except KeyError:  # Emptied by other thread
+            pass
+
+
 def copy_self(function):
     @wraps(function)
     def wrapper(self, *args, **kwargs):
         return function(copy(self), *args, **kwargs)
     return wrapper
+
+
+class Chain:
+    """
+    Persistent (immutable) cons-list.
+
+    `append` returns new chain, that shares all previous items with
+    the original one. So copying is O(1) and chains are safe to share
+    between threads. Iteration keeps insertion order.
+    """
+
+    __slots__ = ('_item', '_previous', '_length')
+
+    def __init__(self, *items):
+        self._item, self._previous, self._length = None, None, 0
+        for item in items:
+            self._item, self._previous, self._length = \
+                item, self._snapshot(), self._length + 1
+
+    def _snapshot(self):
+        node = Chain.__new__(Chain)
+        node._item, node._previous, node._length = \
+            self._item, self._previous, self._length
+        return node
+
+    def append(self, item):
+        node = Chain.__new__(Chain)
+        node._item, node._previous, node._length = \
+            item, self, self._length + 1
+        return node
+
+    def __iter__(self):
+        items = []
+        node = self
+        while node._length:
+            items.append(node._item)
+            node = node._previous
+        return reversed(items)
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if isinstance(other, (Chain, list, tuple)):
+            return len(self) == len(other) and tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return "Chain({!r})".format(list(self))
@@ -5,8 +5,8 @@ from sys import version_info, exit
 from setuptools import setup, find_packages
 
 py_version = version_info[:2]
-if py_version <= (3, 3):
-    print('Requires Python version 3.3 or later, ({}.{} detected).'
+if py_version < (3, 7):
+    print('Requires Python version 3.7 or later, ({}.{} detected).'
           .format(*py_version))
     exit(1)
 
@@ -35,12 +35,18 @@ setup(
         'Operating System :: POSIX :: Linux',
         'Programming Language :: Python :: 3',
         'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
     ],
     keywords='orm search',
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
+    python_requires='>=3.7',
     install_requires=[],
     extras_require={
         # 'dev': [''],
         'test': ['nose'],
+        'columnar': ['numpy'],
+        'cbor': ['cbor2'],
     },
 )
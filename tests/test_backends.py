@@ -0,0 +1,152 @@
+import json
+import threading
+import unittest
+from benchmarks.stub import StubServer
+from pso.backends import Action
+from pso.backends import BaseBackend
+from pso.backends import HTTPBackend
+from pso.backends import ReplicaBackend
+from pso.fields import BaseField
+from pso.models import BaseModel
+
+
+class Article(BaseModel):
+    title = BaseField()
+
+
+class Clock:
+    """Fake monotonic clock, moved by backends"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBackend(BaseBackend):
+    """
+    In-memory replica. Each request takes `latency` seconds of fake
+    clock. While `gate` is set to Event, requests wait for it, and
+    `entered` is set when they do. Raises `error`, if set.
+    """
+
+    def __init__(self, clock, latency=0):
+        self.clock = clock
+        self.latency = latency
+        self.requests = 0
+        self.gate = None
+        self.entered = threading.Event()
+        self.error = None
+        self._lock = threading.Lock()
+
+    def send(self, payload, action=Action.SEARCH, timeout=None):
+        with self._lock:
+            self.requests += 1
+            gate = self.gate
+        if gate is not None:
+            self.entered.set()
+            gate.wait()
+        if self.error is not None:
+            raise self.error
+        self.clock.now += self.latency
+        return json.dumps({'response': {'docs': [{'title': 'x'}]}})\
+            .encode('utf-8')
+
+
+class TestBackends(unittest.TestCase):
+
+    def setUp(t):
+        docs = [{'title': str(i)} for i in range(10)]
+        t.fast = StubServer(docs).start()
+
+    def tearDown(t):
+        t.fast.stop()
+
+    def test_010_http(t):
+        "Search and index through HTTP"
+        backend = HTTPBackend(t.fast.url)
+        t.assertEqual(backend.search({'offset': 2, 'limit': 3}).docs,
+                      [{'title': '2'}, {'title': '3'}, {'title': '4'}])
+        backend.bulk([b'{"title": "new"}'])
+        t.assertEqual(t.fast.docs[-1], {'title': 'new'})
+
+    def test_020_route_to_fastest(t):
+        "Requests go to replica with lowest latency"
+        clock = Clock()
+        slow, fast = FakeBackend(clock, 0.05), FakeBackend(clock, 0.001)
+        backend = ReplicaBackend([slow, fast], clock=clock)
+        for _ in range(10):
+            backend.search({'limit': 1})
+        t.assertEqual(fast.requests, 9)
+        t.assertEqual(slow.requests, 1)
+
+    def test_030_failover(t):
+        "Failed replica is skipped"
+        backend = ReplicaBackend([HTTPBackend('http://127.0.0.1:1'),
+                                  HTTPBackend(t.fast.url)], max_failures=1)
+        t.assertEqual(len(backend.search({'limit': 1}).docs), 1)
+        t.assertFalse(backend.replicas[0].healthy)
+
+    def warm_up(t, backend, latency):
+        for replica in backend.replicas:
+            replica.samples.extend([latency] * 5)
+            replica.ewma = latency
+        backend.replicas[1].ewma *= 2
+
+    def test_040_hedging(t):
+        "Stuck request is duplicated to second replica"
+        clock = Clock()
+        first, second = FakeBackend(clock), FakeBackend(clock)
+        backend = ReplicaBackend([first, second], hedge_percentile=90,
+                                 min_samples=5, clock=clock)
+        t.warm_up(backend, 0.001)
+
+        first.gate = threading.Event()  # E.G. segments merge
+        try:
+            t.assertEqual(len(backend.search({'limit': 1}).docs), 1)
+        finally:
+            first.gate.set()
+        t.assertEqual(backend.hedged, 1)
+        t.assertEqual(second.requests, 1)
+
+    def test_050_failure_is_not_hedge(t):
+        "Failed primary goes to next replica, without hedging"
+        clock = Clock()
+        first, second = FakeBackend(clock), FakeBackend(clock)
+        backend = ReplicaBackend([first, second], hedge_percentile=90,
+                                 min_samples=5, clock=clock)
+        t.warm_up(backend, 60)  # Hedge only after a minute
+
+        first.error = OSError("Connection refused")
+        t.assertEqual(len(backend.search({'limit': 1}).docs), 1)
+        t.assertEqual(backend.hedged, 0)
+        t.assertEqual((first.requests, second.requests), (1, 1))
+
+    def test_060_no_free_worker(t):
+        "When pool is busy, requests are sent without hedging"
+        clock = Clock()
+        first, second = FakeBackend(clock), FakeBackend(clock)
+        backend = ReplicaBackend([first, second], hedge_percentile=90,
+                                 min_samples=5, max_workers=1, clock=clock)
+        t.warm_up(backend, 0)
+
+        gate = first.gate = threading.Event()
+        stuck = threading.Thread(target=backend.search, args=({},))
+        stuck.start()
+        try:
+            t.assertTrue(first.entered.wait(5))
+            first.gate = None
+            # Worker is taken by stuck request, so it isn't hedged,
+            # and this one is sent in this thread
+            t.assertEqual(len(backend.search({'limit': 1}).docs), 1)
+            t.assertEqual(first.requests, 2)
+        finally:
+            gate.set()
+            stuck.join()
+        t.assertEqual(backend.hedged, 0)
+        t.assertEqual(second.requests, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
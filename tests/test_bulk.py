@@ -0,0 +1,206 @@
+import json
+import queue
+import threading
+import time
+import unittest
+from benchmarks.stub import StubServer
+from pso.backends import BaseBackend
+from pso.backends import HTTPBackend
+from pso.bulk import BulkIndexer
+from pso.exceptions import PSOException
+from pso.fields import BaseField
+from pso.models import BaseModel
+
+
+class RecordingBackend(BaseBackend):
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def send(self, payload, action=None):
+        if self.failures:
+            self.failures -= 1
+            raise IOError("Engine is down")
+        self.batches.append(json.loads(payload.decode('utf-8')))
+        return b'{}'
+
+
+class Article(BaseModel):
+    title = BaseField()
+
+
+class Counter(BaseModel):
+    id = BaseField(primary_key=True)
+    views = BaseField()
+
+
+class TestBulkIndexer(unittest.TestCase):
+
+    def test_010_batch_by_count(t):
+        "Documents are batched by count, rest sent on close"
+        backend = RecordingBackend()
+        with BulkIndexer(backend, max_docs=10, interval=60) as indexer:
+            for i in range(25):
+                indexer.add(Article(title=str(i)))
+
+        t.assertEqual([len(b) for b in backend.batches], [10, 10, 5])
+        t.assertEqual(backend.batches[0][0], {'title': '0'})
+        t.assertEqual(indexer.sent_docs, 25)
+
+    def test_020_batch_by_bytes(t):
+        "Documents are batched by payload size"
+        backend = RecordingBackend()
+        with BulkIndexer(backend, max_bytes=100, interval=60) as indexer:
+            for i in range(10):
+                indexer.add(Article(title='x' * 30))
+
+        t.assertTrue(all(len(b) <= 3 for b in backend.batches))
+        t.assertEqual(sum(len(b) for b in backend.batches), 10)
+
+    def test_030_flush_by_interval(t):
+        "Partial batch sent after interval"
+        backend = RecordingBackend()
+        with BulkIndexer(backend, interval=0.05) as indexer:
+            indexer.add(Article(title='one'))
+            time.sleep(0.2)
+            t.assertEqual(backend.batches, [[{'title': 'one'}]])
+
+    def test_040_retry(t):
+        "Failed batch is retried"
+        backend = RecordingBackend(failures=2)
+        errors = []
+        indexer = BulkIndexer(backend, backoff=0.01,
+                              on_error=lambda *a: errors.append(a))
+        indexer.add(Article(title='one'))
+        indexer.flush()
+
+        t.assertEqual(len(backend.batches), 1)
+        t.assertEqual(errors, [])
+        indexer.close()
+
+    def test_050_backpressure(t):
+        "Producers are blocked, when queue is full"
+        backend = RecordingBackend()
+        sending = threading.Semaphore(0)
+        backend.send = lambda *a: sending.acquire() and b'{}'
+        indexer = BulkIndexer(backend, max_docs=1, queue_size=1)
+        indexer.add(Article(title='sent'))
+        indexer.add(Article(title='queued'))
+
+        with t.assertRaises(queue.Full):
+            indexer.add(Article(title='blocked'), timeout=0.05)
+        sending.release(2)
+        indexer.close()
+
+    def test_060_add_many(t):
+        "Documents are sent in given order, enqueued ones marked clean"
+        backend = RecordingBackend()
+        loaded = Counter.from_index({'id': 1, 'views': 1})
+        loaded.inc('views')
+        with BulkIndexer(backend, interval=60) as indexer:
+            indexer.add_many([Counter(id=0), loaded, Counter(id=2)])
+        t.assertEqual(backend.batches, [[
+            {'id': 0, 'views': None},
+            {'id': 1, 'views': {'inc': 1}},
+            {'id': 2, 'views': None},
+        ]])
+        t.assertEqual(loaded.changed_fields, set())
+
+        sending = threading.Semaphore(0)
+        backend.send = lambda *a: sending.acquire() and b'{}'
+        indexer = BulkIndexer(backend, max_docs=1, queue_size=1)
+        indexer.add(Counter(id=0))  # Being sent
+        models = [Counter.from_index({'id': i, 'views': 0})
+                  for i in range(1, 3)]
+        for model in models:
+            model.inc('views')
+        with t.assertRaises(queue.Full):
+            indexer.add_many(models, timeout=0.05)
+        sending.release(2)
+        indexer.close()
+        t.assertEqual(models[0].changed_fields, set())
+        t.assertEqual(models[1].changed_fields, {'views'})
+
+    def test_070_clean_when_sent(t):
+        "Models are marked clean after send, later changes are kept"
+        backend = RecordingBackend(failures=1)
+        model = Counter.from_index({'id': 1, 'views': 0})
+        model.inc('views')
+        with BulkIndexer(backend, retries=0) as indexer:
+            indexer.add(model)
+            indexer.flush()
+            t.assertEqual(model.changed_fields, {'views'})  # Failed
+
+            sending = threading.Event()
+            backend.send = lambda *a: sending.wait() and b'{}'
+            indexer.add(model)
+            model.inc('views', 5)
+            sending.set()
+        t.assertEqual(model._updates, {'views': ('inc', 5)})
+
+    def test_080_failing_on_error(t):
+        "Exception in on_error doesn't stop indexer"
+        def on_error(docs, exc):
+            raise ValueError("Broken handler")
+
+        backend = RecordingBackend(failures=1)
+        indexer = BulkIndexer(backend, retries=0, on_error=on_error)
+        with t.assertLogs('pso.bulk', 'ERROR'):
+            indexer.add(Article(title='lost'))
+            indexer.flush()
+        indexer.add(Article(title='sent'))
+        indexer.close()
+        t.assertEqual(backend.batches, [[{'title': 'sent'}]])
+        t.assertEqual((indexer.failed_docs, indexer.sent_docs), (1, 1))
+
+    def test_090_versions(t):
+        "Sent models take new version, so next update isn't stale"
+        with StubServer() as server:
+            backend = HTTPBackend(server.url)
+            backend.bulk([backend.serialize({'id': 1, 'views': 0})])
+            model = Counter.from_index(
+                {'id': 1, 'views': 0, '_version_': server.versions[1]})
+            with BulkIndexer(backend, retries=0) as indexer:
+                for _ in range(2):
+                    model.inc('views')
+                    indexer.add(model)
+                    indexer.flush()
+            t.assertEqual((indexer.sent_docs, indexer.failed_docs), (2, 0))
+            t.assertEqual(model._version, server.versions[1])
+            t.assertEqual(model.changed_fields, set())
+
+    def test_100_closed(t):
+        "Closed indexer doesn't accept documents and doesn't hang on flush"
+        indexer = BulkIndexer(RecordingBackend())
+        indexer.close()
+        with t.assertRaises(PSOException):
+            indexer.flush()
+        with t.assertRaises(PSOException):
+            indexer.add(Article(title='late'))
+        indexer.close()  # Again
+
+    def test_110_add_racing_close(t):
+        "Documents are either sent or rejected, never lost"
+        backend = RecordingBackend()
+        indexer = BulkIndexer(backend, max_docs=10)
+        accepted = []
+
+        def produce():
+            for i in range(200):
+                try:
+                    indexer.add_raw(json.dumps({'i': i}).encode())
+                except PSOException:
+                    return
+                accepted.append(i)
+
+        thread = threading.Thread(target=produce)
+        thread.start()
+        indexer.close()
+        thread.join()
+        t.assertEqual([doc['i'] for batch in backend.batches
+                       for doc in batch], accepted)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import fcntl
+import multiprocessing
+import os
+import tempfile
+import unittest
+from pso.cache import LocalCache
+from pso.cache import SharedCache
+from pso.encoding import fingerprint
+from pso.exceptions import PSOException
+from pso.q import Q
+from pso.range import Range
+
+
+def _write(path, key, value):
+    SharedCache(path).set(key, value)
+
+
+def _hold_lock(cache, locked, release):
+    with cache._locked():
+        locked.set()
+        release.wait(5)
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(t):
+        fd, t.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(t):
+        os.unlink(t.path)
+
+    def test_010_fingerprint(t):
+        "Fingerprint doesn't depend on childs order"
+        q1 = Q('OR', Q(a=1), Q(b=Range(1, 2)))
+        q2 = Q('OR', Q(b=Range(1, 2)), Q(a=1))
+        t.assertEqual(fingerprint(q1), fingerprint(q2))
+        t.assertNotEqual(fingerprint(q1), fingerprint(Q(a=1)))
+        t.assertEqual(len(fingerprint(q1)), 16)
+
+    def test_020_shared_get_set(t):
+        "Values are stored and evicted"
+        cache = SharedCache(t.path, slots=8, slot_size=128)
+        key = fingerprint('key')
+        t.assertIsNone(cache.get(key))
+        t.assertTrue(cache.set(key, b'value'))
+        t.assertEqual(cache.get(key), b'value')
+        t.assertFalse(cache.set(key, b'x' * 128), msg="Too large value")
+
+        for i in range(100):
+            cache.set(fingerprint(i), str(i).encode())
+        t.assertEqual(cache.get(fingerprint(99)), b'99')
+        t.assertIsNone(cache.get(fingerprint(0)))
+        cache.close()
+
+    def test_030_shared_between_processes(t):
+        "Value written in other process is visible"
+        cache = SharedCache(t.path)
+        key = fingerprint(Q(a=1))
+        ctx = multiprocessing.get_context('fork')
+        process = ctx.Process(target=_write, args=(t.path, key, b'other'))
+        process.start()
+        process.join()
+        t.assertEqual(cache.get(key), b'other')
+        cache.close()
+
+    def test_040_ttl(t):
+        "Expired values are misses"
+        cache = LocalCache(size=2)
+        cache.set(b'1', b'1', ttl=-1)
+        cache.set(b'2', b'2')
+        cache.set(b'3', b'3')
+        t.assertIsNone(cache.get(b'1'))
+        t.assertEqual(cache.get(b'3'), b'3')
+
+    def test_050_lru(t):
+        "Read values are evicted last"
+        cache = LocalCache(size=2)
+        cache.set(b'1', b'1')
+        cache.set(b'2', b'2')
+        cache.get(b'1')
+        cache.set(b'3', b'3')
+        t.assertEqual(cache.get(b'1'), b'1')
+        t.assertIsNone(cache.get(b'2'))
+
+    def test_060_settings(t):
+        "TTL is required, shared cache needs full set of slots"
+        with t.assertRaises(PSOException):
+            LocalCache(ttl=None)
+        with t.assertRaises(PSOException):
+            SharedCache(t.path, ttl=0)
+        with t.assertRaises(PSOException):
+            SharedCache(t.path, slots=SharedCache.WAYS - 1)
+
+    def test_070_lock_after_fork(t):
+        "Workers forked with open cache exclude each other"
+        cache = SharedCache(t.path)
+        ctx = multiprocessing.get_context('fork')
+        locked, release = ctx.Event(), ctx.Event()
+        process = ctx.Process(target=_hold_lock,
+                              args=(cache, locked, release))
+        process.start()
+        try:
+            t.assertTrue(locked.wait(5))
+            with t.assertRaises(OSError):
+                fcntl.lockf(cache._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            release.set()
+            process.join()
+        t.assertEqual(process.exitcode, 0)
+        cache.set(fingerprint('key'), b'value')
+        t.assertEqual(cache.get(fingerprint('key')), b'value')
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from pso.q import Q
+from pso.compiler import compile_q
+
+
+class TestCompiler(unittest.TestCase):
+
+    def test_010_leaf(t):
+        "Compile simple conditions"
+        t.assertEqual(compile_q(Q(title='some "text"')),
+                      'title:"some \\"text\\""')
+        t.assertEqual(compile_q(Q(price=10)), 'price:10')
+        t.assertEqual(compile_q(Q('price') >= 10), 'price:[10 TO *]')
+        t.assertEqual(compile_q(Q(price__lt=10)), 'price:[* TO 10}')
+        t.assertEqual(compile_q(Q('tag') << ['a', 'b']), 'tag:("a" OR "b")')
+        t.assertEqual(compile_q(Q('price') != 10), '-price:10')
+        t.assertEqual(compile_q(Q(title='text') * 2), 'title:"text"^2')
+
+    def test_020_aggregation(t):
+        "Compile nested Q, with negation inside"
+        q = Q(Q(user=1), Q(visible=False))
+        t.assertEqual(compile_q(q), '(user:1 AND visible:false)')
+
+        q = Q('OR', Q(user=1), -Q(visible=False))
+        t.assertEqual(compile_q(q), '(user:1 OR (*:* -visible:false))')
+
+        q = (Q('price') >= 10) | (Q('price') == 5)
+        t.assertIn('price:5', compile_q(q))
+        t.assertIn('price:[10 TO *]', compile_q(q))
+
+    def test_030_datetime(t):
+        "Datetimes are compiled in UTC"
+        from datetime import datetime, timedelta, timezone
+        naive = datetime(2017, 1, 31, 12)
+        aware = datetime(2017, 1, 31, 15, tzinfo=timezone(timedelta(hours=3)))
+        t.assertEqual(compile_q(Q(created=naive)),
+                      'created:"2017-01-31T12:00:00.000000Z"')
+        t.assertEqual(compile_q(Q(created=aware)),
+                      'created:"2017-01-31T12:00:00.000000Z"')
+
+
+if __name__ == '__main__':
+    unittest.main()
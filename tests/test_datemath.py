@@ -0,0 +1,120 @@
+import unittest
+from datetime import datetime
+from datetime import timedelta
+from pso.compiler import compile_q
+from pso.datemath import DAY
+from pso.datemath import HOUR
+from pso.datemath import MINUTE
+from pso.datemath import MONTH
+from pso.datemath import NOW
+from pso.datemath import DateMath
+from pso.encoding import decode
+from pso.encoding import encode
+from pso.fields import DateTimeField
+from pso.models import BaseModel
+from pso.q import Q
+
+
+class Article(BaseModel):
+    published = DateTimeField(rounding=MINUTE)
+    updated = DateTimeField()
+
+
+class TestDateMath(unittest.TestCase):
+
+    def test_010_syntax(t):
+        t.assertEqual(str(NOW - timedelta(days=1)), 'NOW-1DAY')
+        t.assertEqual(str((NOW - timedelta(minutes=90)).round(HOUR)),
+                      'NOW-90MINUTE/HOUR')
+        t.assertEqual(str(NOW.shift(1, MONTH).round(DAY)), 'NOW+1MONTH/DAY')
+        t.assertEqual(DateMath.parse('NOW-1DAYS+2HOURS/DAY'),
+                      NOW.shift(-1, DAY).shift(2, HOUR).round(DAY))
+        with t.assertRaises(ValueError):
+            DateMath.parse('NOW/DAY+1DAY')
+
+    def test_020_resolve(t):
+        now = datetime(2020, 3, 31, 12, 30, 15)
+        t.assertEqual((NOW - timedelta(days=1)).round(DAY).resolve(now),
+                      datetime(2020, 3, 30))
+        t.assertEqual(NOW.shift(-1, MONTH).resolve(now),
+                      datetime(2020, 2, 29, 12, 30, 15))
+        t.assertLess(datetime(2000, 1, 1), NOW.resolve())
+
+    def test_025_ordering(t):
+        "Same key for equality and ordering, never resolved implicitly"
+        day, hours = NOW - timedelta(days=1), NOW - timedelta(hours=24)
+        t.assertLess(day, NOW)
+        t.assertEqual(day, hours)
+        t.assertEqual(hash(day), hash(hours))
+        t.assertFalse(day < hours or day > hours)
+        t.assertLess(NOW.shift(-2, MONTH), NOW.shift(-1, MONTH))
+        for other in (NOW.round(DAY), NOW.shift(-1, MONTH),
+                      datetime(2000, 1, 1)):
+            with t.assertRaises(TypeError):
+                day < other
+
+    def test_030_compile(t):
+        "Relative ranges compile to engine date math, and are merged"
+        q = (Q('updated') >= NOW - timedelta(days=7)) & \
+            (Q('updated') < NOW - timedelta(hours=1))
+        t.assertEqual(compile_q(q), 'updated:[NOW-7DAY TO NOW-1HOUR}')
+        q = (Q('updated') >= NOW - timedelta(days=7)) & \
+            (Q('updated') < NOW.round(DAY))  # Different anchor
+        t.assertIn('updated:[NOW-7DAY TO *]', compile_q(q))
+        t.assertIn('updated:[* TO NOW/DAY}', compile_q(q))
+        q = (Q('updated') > NOW - timedelta(days=2)) & \
+            (Q('updated') > NOW - timedelta(days=1))
+        t.assertEqual(compile_q(q), 'updated:{NOW-1DAY TO *]')
+        t.assertEqual(tuple(decode(encode(q))), tuple(q))
+
+    def test_035_not_merged(t):
+        "Ranges with bounds, which can't be compared, are both kept"
+        q = (Q('updated') > NOW) & (Q('updated') > datetime(2020, 1, 1))
+        t.assertIn('updated:{NOW TO *]', compile_q(q))
+        t.assertIn('updated:{"2020-01-01T00:00:00.000000Z" TO *]',
+                   compile_q(q))
+        q = (Q('updated') > (NOW - timedelta(days=1)).round(DAY)) & \
+            (Q('updated') >= NOW - timedelta(days=30))
+        t.assertIn('updated:{NOW-1DAY/DAY TO *]', compile_q(q))
+        t.assertIn('updated:[NOW-30DAY TO *]', compile_q(q))
+
+    def test_040_field_rounding(t):
+        "Field rounding is applied to expressions without explicit one"
+        qs = Article.objects\
+            .filter(published__gt=NOW - timedelta(hours=1))\
+            .filter(Q(updated__gt=NOW) | Q(published__lt=NOW.round(DAY)))
+        first, second = qs._compile(0, 10)['filter']
+        t.assertEqual(first, 'published:{NOW-1HOUR/MINUTE TO *]')
+        t.assertIn('published:[* TO NOW/DAY}', second)
+        t.assertIn('updated:{NOW TO *]', second)
+
+    def test_050_broken_encoding(t):
+        "Broken date math is encoding error"
+        from pso.encoding import EncodingError
+        data = bytearray(encode(NOW.round(DAY)))
+        data[data.index(b'DAY')] = ord('X')
+        with t.assertRaises(EncodingError):
+            decode(bytes(data))
+
+    def test_060_evaluation(t):
+        "Percolator and columnar results resolve date math"
+        from pso.percolator import Percolator
+        from pso.result import ColumnarResultSet, numpy
+        from pso.datemath import utcnow
+
+        recent = Q('updated') > NOW - timedelta(days=1)
+        old = utcnow() - timedelta(days=2)
+        docs = [Article(updated=utcnow()), Article(updated=old)]
+
+        percolator = Percolator(Article)
+        percolator.add('recent', recent)
+        t.assertEqual(percolator.match_many(docs), [['recent'], []])
+
+        if numpy is not None:
+            rs = ColumnarResultSet.from_docs(
+                Article, Article.to_index_many(docs))
+            t.assertEqual(list(rs.mask(recent)), [True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
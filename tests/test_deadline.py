@@ -0,0 +1,166 @@
+import json
+import socket
+import unittest
+from pso.backends import Action
+from pso.backends import BaseBackend
+from pso.backends import ReplicaBackend
+from pso.cache import LocalCache
+from pso.deadline import Deadline
+from pso.exceptions import DeadlineExceeded
+from pso.fields import BaseField
+from pso.models import BaseModel
+from pso.query import BaseQuerySet
+
+
+class Clock:
+    """Fake monotonic clock, moved by backends"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBackend(BaseBackend):
+    """
+    Each request takes `latency` seconds of fake clock. Engine stops at
+    timeAllowed with half of page, if `time_allowed` is honored.
+    Socket times out, when `timeout` is shorter than latency.
+    """
+
+    def __init__(self, clock, docs, latency=0, time_allowed=True):
+        self.clock = clock
+        self.docs = docs
+        self.latency = latency
+        self.time_allowed = time_allowed
+        self.timeouts = []
+
+    def send(self, payload, action=Action.SEARCH, timeout=None):
+        request = json.loads(payload.decode('utf-8'))
+        self.timeouts.append(timeout)
+        latency, partial = self.latency, False
+        allowed = request.get('params', {}).get('timeAllowed')
+        if self.time_allowed and allowed is not None \
+                and latency > allowed / 1000:
+            latency, partial = allowed / 1000, True
+        if timeout is not None and latency > timeout:
+            self.clock.now += timeout
+            raise socket.timeout("timed out")  # As urlopen on read
+        self.clock.now += latency
+
+        offset, limit = request['offset'], request['limit']
+        if partial:
+            limit //= 2
+        return json.dumps({
+            'response': {'numFound': len(self.docs),
+                         'docs': self.docs[offset:offset + limit]},
+            'responseHeader': {'partialResults': partial},
+        }).encode('utf-8')
+
+
+class LegacyBackend(FakeBackend):
+    """Written before deadlines: `send` has no timeout"""
+
+    def send(self, payload, action=None):
+        return super().send(payload, action)
+
+
+class PagedQuerySet(BaseQuerySet):
+    page_size = 10
+
+
+class Article(BaseModel):
+    title = BaseField()
+    queryset_class = PagedQuerySet
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(t):
+        t.clock = Clock()
+        t.backend = FakeBackend(t.clock, [{'title': str(i)}
+                                          for i in range(100)])
+        Article.backend = t.backend
+
+    def tearDown(t):
+        Article.backend = None
+        Article.cache = None
+
+    def deadline(t, budget):
+        return Deadline(budget, clock=t.clock)
+
+    def test_010_deadline(t):
+        deadline = t.deadline(10)
+        t.assertEqual(deadline.remaining(), 10)
+        t.assertEqual(deadline.time_allowed(), 8000)
+        deadline.check()
+        t.clock.now = 10
+        with t.assertRaises(DeadlineExceeded):
+            deadline.check()
+
+    def test_020_partial_response(t):
+        "Engine stops at timeAllowed, result is partial and not cached"
+        t.backend.latency = 0.3
+        Article.cache = LocalCache()
+        result = Article.objects[0:10].deadline(t.deadline(0.1)).fetch()
+        t.assertTrue(result.partial)
+        t.assertEqual(len(result), 5)
+        t.assertEqual(t.clock.now, 0.08)
+        t.assertEqual(len(Article.cache._data), 0)
+
+        t.backend.latency = 0
+        result = Article.objects[0:10].deadline(t.deadline(1)).fetch()
+        t.assertFalse(result.partial)
+        t.assertEqual(len(result), 10)
+
+    def test_030_pages_share_budget(t):
+        "Pagination stops, when budget is spent"
+        t.backend.latency = 0.03
+        result = Article.objects.deadline(t.deadline(0.1)).prefetch(1)\
+            .fetch()
+        t.assertTrue(result.partial)
+        t.assertEqual(len(result), 35)  # 3 pages, 4th is partial
+        t.assertLess(t.clock.now, 0.1 + 1e-9)
+
+    def test_040_shared_deadline(t):
+        "Deadline object is shared between querysets"
+        deadline = t.deadline(0.05)
+        t.backend.latency = 0.06
+        result = Article.objects[0:10].deadline(deadline).fetch()
+        t.assertTrue(result.partial)
+        t.clock.now = 0.05
+        with t.assertRaises(DeadlineExceeded):
+            list(Article.objects.deadline(deadline))
+
+    def test_045_socket_timeout(t):
+        "Timeout on later page returns pages collected so far"
+        t.backend.time_allowed = False
+        t.backend.latency = 0.04
+        result = Article.objects.deadline(t.deadline(0.1)).prefetch(1)\
+            .fetch()
+        t.assertTrue(result.partial)
+        t.assertEqual(len(result), 20)
+        t.assertEqual([round(timeout, 6) for timeout in t.backend.timeouts],
+                      [0.1, 0.06, 0.02])
+        with t.assertRaises(DeadlineExceeded):  # On first page
+            Article.objects.deadline(t.deadline(0.01)).fetch()
+
+    def test_050_no_timeout_support(t):
+        "Backends without `timeout` in `send` get requests without it"
+        Article.backend = LegacyBackend(t.clock, t.backend.docs)
+        result = Article.objects[0:10].deadline(t.deadline(1)).fetch()
+        t.assertEqual(len(result), 10)
+
+    def test_060_replicas(t):
+        "Failover requests get time left"
+        slow = [FakeBackend(t.clock, [], latency=0.5) for _ in range(2)]
+        backend = ReplicaBackend(slow, clock=t.clock)
+        with t.assertRaises(DeadlineExceeded):
+            backend.send(b'{"offset": 0, "limit": 1}', timeout=0.1)
+        t.assertEqual(slow[0].timeouts, [0.1])
+        t.assertEqual(slow[1].timeouts, [])  # No time left for it
+
+
+if __name__ == '__main__':
+    unittest.main()
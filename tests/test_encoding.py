@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime
+from pso.encoding import LIST
+from pso.encoding import NONE
+from pso.encoding import EncodingError
+from pso.encoding import decode
+from pso.encoding import decode_queryset
+from pso.encoding import encode
+from pso.encoding import encode_queryset
+from pso.encoding import fingerprint
+from pso.constants import NoValue
+from pso.fields import BaseField
+from pso.models import BaseModel
+from pso.q import Q
+from pso.range import Range
+
+
+class Article(BaseModel):
+    title = BaseField()
+    user = BaseField()
+
+
+class TestEncoding(unittest.TestCase):
+
+    def test_010_roundtrip(t):
+        "Q trees and values survive encoding"
+        q = (Q('price') > 5) & (Q(title='x') | -Q(user=3)) \
+            & Q(published=datetime(2017, 1, 2, 3, 4)) \
+            & (Q('tag') << ('a', 'b')) & Q(score=0.5) & Q(big=2 ** 70)
+        decoded = decode(encode(q))
+        t.assertEqual(decoded, q)
+        t.assertIsInstance(decoded, Q)
+        t.assertIs(decode(encode(Range(fr=1))).to, NoValue)
+        t.assertEqual(decode(encode(Q(field__custom=[1, 'x']))),
+                      Q(field__custom=[1, 'x']))
+
+    def test_020_canonical(t):
+        "Canonical encoding doesn't depend on childs order"
+        q1 = Q('OR', Q(a=1), Q(b=2))
+        q2 = Q('OR', Q(b=2), Q(a=1))
+        t.assertEqual(encode(q1, canonical=True), encode(q2, canonical=True))
+        t.assertNotEqual(encode(Q(a=1)), encode(Q(a=True)))
+
+    def test_030_broken(t):
+        "Unknown data is rejected"
+        with t.assertRaises(EncodingError):
+            decode(b'\x01\xfe')
+        with t.assertRaises(EncodingError):
+            decode(encode(Q(a=1))[:-1])
+        with t.assertRaises(EncodingError):
+            encode(object())
+        for value in (2 ** 70, datetime(2017, 1, 2)):
+            data = encode(value)
+            with t.assertRaises(EncodingError):  # Body is not a number/date
+                decode(data[:-2] + b'x' + data[-1:])
+        with t.assertRaises(EncodingError):
+            decode(b'\x01' + bytes([LIST, 1]) * 10000 + bytes([NONE]))
+
+    def test_035_memo(t):
+        "Decoded mutable values are not shared"
+        data = encode(Q(tags__in=[1, 2]))
+        decode(data).value.append(3)
+        t.assertEqual(decode(data).value, [1, 2])
+
+    def test_036_mutated(t):
+        "Encoding of mutated list or set is not taken from memo"
+        tags, ids = ['a', 'b'], {1}
+        q = Q('AND', Q(tags__in=tags), Q(id__in=ids))
+        encoded, key = encode(q), fingerprint(q)
+        tags.append('c')
+        ids.add(2)
+        t.assertNotEqual(encode(q), encoded)
+        t.assertNotEqual(fingerprint(q), key)
+        t.assertEqual(decode(encode(q)).childs[0].value, ['a', 'b', 'c'])
+
+    def test_040_queryset(t):
+        "QuerySet state roundtrip"
+        qs = Article.objects.filter(user=1).search(title='x')[10:20]
+        decoded = decode_queryset(encode_queryset(qs))
+
+        t.assertIs(decoded._model, Article)
+        t.assertEqual(list(decoded._filter), [Q(user=1)])
+        t.assertEqual(decoded._search, Q(title='x'))
+        t.assertEqual((decoded._offset, decoded._limit), (10, 10))
+
+    def test_050_queryset_classes(t):
+        "Only defined models and querysets are resolved, nothing is called"
+        for model in ('os:system', 'pso.models:BaseModel.unknown',
+                      'tests.test_encoding:TestEncoding'):
+            data = encode((model, 'pso.query:BaseQuerySet', 0, 10, (),
+                           None, 1))
+            with t.assertRaises(EncodingError):
+                decode_queryset(data)
+        data = encode(('{}:Article'.format(__name__), 'os:system', 0, 10,
+                       (), None, 1))
+        with t.assertRaises(EncodingError):
+            decode_queryset(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
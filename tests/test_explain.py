@@ -0,0 +1,63 @@
+import unittest
+from pso.exceptions import QueryRejected
+from pso.explain import Cost
+from pso.explain import QueryPolicy
+from pso.fields import BaseField
+from pso.models import BaseModel
+from pso.q import Q
+
+
+class Article(BaseModel):
+    title = BaseField()
+    status = BaseField()
+    price = BaseField()
+
+
+class TestExplain(unittest.TestCase):
+
+    def test_010_explain(t):
+        "Shape of Q tree"
+        q = (Q('price') > 10) & -Q(status='sold') & Q(title='te*')
+        info = q.explain()
+        t.assertEqual(info.depth, 2)
+        t.assertEqual(info.clauses, 3)
+        t.assertEqual(info.ranges, 1)
+        t.assertEqual(info.wildcards, 1)
+        t.assertEqual(info.negated_only, 0)
+        t.assertEqual(info.cost, Cost.LOW)
+
+        t.assertEqual((Q('status') != 'sold').explain().negated_only, 1)
+        t.assertEqual(Q(status__in=range(1000)).explain().cost, Cost.HIGH)
+
+    def test_020_queryset_explain(t):
+        "QuerySet explain"
+        info = Article.objects.filter(status__in=range(100)).explain()
+        t.assertIsNone(info['search'])
+        t.assertEqual(info['cost'], Cost.MEDIUM)
+
+    def test_030_reject(t):
+        "Policy rejects expensive queries"
+        policy = QueryPolicy(max_clauses=10)
+        with t.assertRaises(QueryRejected):
+            policy(Article.objects.filter(status__in=range(11)))
+        with t.assertRaises(QueryRejected):
+            policy(Article.objects.search(-Q(status='sold')))
+        policy(Article.objects.filter(status__in=range(10)))
+
+    def test_040_rewrite(t):
+        "Policy moves non scoring clauses to filters"
+        policy = QueryPolicy(rewrite_negated=True, move_non_scoring=True)
+
+        qs = policy(Article.objects.search(-Q(status='sold')))
+        t.assertIsNone(qs._search)
+        t.assertEqual(list(qs._filter), [-Q(status='sold')])
+
+        qs = policy(Article.objects.search(
+            (Q(title='text') & (Q('price') >= 10)) & -Q(status='sold')))
+        t.assertEqual(qs._search, Q(title='text'))
+        t.assertSetEqual(set(qs._filter),
+                         {Q('price') >= 10, -Q(status='sold')})
+
+
+if __name__ == '__main__':
+    unittest.main()
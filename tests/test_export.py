@@ -0,0 +1,83 @@
+import io
+import json
+import unittest
+from benchmarks.stub import StubServer
+from pso.backends import HTTPBackend
+from pso.export import CSVSink
+from pso.export import JSONLinesSink
+from pso.fields import BaseField
+from pso.fields import IntegerField
+from pso.models import BaseModel
+
+
+class Article(BaseModel):
+    id = IntegerField(primary_key=True)
+    tags = BaseField(multi_valued=True)
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(t):
+        docs = [{'id': i, 'tags': ['a', str(i)]} for i in range(25)]
+        t.server = StubServer(docs).start()
+        Article.backend = HTTPBackend(t.server.url)
+
+    def tearDown(t):
+        Article.backend = None
+        t.server.stop()
+
+    def test_010_batches(t):
+        "All documents in batches, limit and offset are ignored"
+        batches = list(Article.objects[5:10].export(batch_size=10))
+        t.assertEqual([len(b) for b in batches], [10, 10, 5])
+        t.assertEqual([m['id'] for b in batches for m in b], list(range(25)))
+        t.assertEqual(t.server.requests, 4)  # Last one is empty
+
+    def test_020_jsonlines(t):
+        "Batches are written to sink"
+        out = io.StringIO()
+        for _ in Article.objects.export(batch_size=7, sink=JSONLinesSink(out)):
+            pass
+        lines = out.getvalue().splitlines()
+        t.assertEqual(len(lines), 25)
+        t.assertEqual(json.loads(lines[3]), {'id': 3, 'tags': ['a', '3']})
+
+    def test_030_csv(t):
+        "Header row, multi valued fields are joined"
+        out = io.StringIO()
+        sink = CSVSink(out)
+        for _ in Article.objects.export(batch_size=10, sink=sink,
+                                        prefetch=0):
+            pass
+        lines = out.getvalue().splitlines()
+        t.assertEqual(lines[:2], ['id,tags', '0,a|0'])
+        t.assertEqual(sink.written, 25)
+
+    def test_035_batch_converters(t):
+        "Sinks convert whole batch with `to_index_many`"
+        calls = []
+        to_index_many = Article.to_index_many.__func__
+
+        def counted(cls, models):
+            calls.append(len(models))
+            return to_index_many(cls, models)
+
+        Article.to_index_many = classmethod(counted)
+        try:
+            for sink in JSONLinesSink(io.StringIO()), CSVSink(io.StringIO()):
+                for _ in Article.objects.export(batch_size=10, sink=sink):
+                    pass
+        finally:
+            del Article.to_index_many
+        t.assertEqual(calls, [10, 10, 5] * 2)
+
+    def test_040_stop(t):
+        "Export can be stopped early"
+        export = Article.objects.export(batch_size=5)
+        next(export)
+        export.close()
+        t.assertLess(t.server.requests, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from decimal import Decimal
+from pso.cache import LocalCache
+from pso.constants import Condition
+from pso.fields import BaseField
+from pso.filters import reduce_filters
+from pso.models import BaseModel
+from pso.q import Q
+from pso.range import Range
+
+
+class Product(BaseModel):
+    price = BaseField()
+    status = BaseField()
+    tags = BaseField(multi_valued=True)
+
+
+def reduce(*filters):
+    return [tuple(q) for q in reduce_filters(filters, Product)]
+
+
+class TestFilters(unittest.TestCase):
+
+    def test_010_duplicates(t):
+        "Equal filters are sent once"
+        t.assertEqual(reduce(Q(status='a') | Q(price=1), Q(status='b'),
+                             Q(price=1) | Q(status='a')),
+                      [tuple(Q(status='a') | Q(price=1)),
+                       tuple(Q(status='b'))])
+
+    def test_020_ranges(t):
+        "Ranges on single valued field are intersected"
+        t.assertEqual(reduce(Q(price__gte=10), Q(price__gte=20)), [
+            tuple(Q(field='price', operation=Condition.RANGE,
+                    value=Range(fr=20, fr_incl=True)))])
+        t.assertEqual(reduce(Q(price__gt=0), Q(price__lt=5)), [
+            tuple(Q(field='price', operation=Condition.RANGE,
+                    value=Range(0, 5)))])
+
+    def test_030_values(t):
+        "IN and EQ are intersected, values out of range dropped"
+        t.assertEqual(reduce(Q(status__in=['a', 'b']), Q(status='a')),
+                      [tuple(Q(status='a'))])
+        t.assertEqual(reduce(Q(price__in=[1, 2, 3]), Q(price__lt=3),
+                             Q('price')),
+                      [tuple(Q(price__in=[1, 2]))])
+
+    def test_040_contradiction(t):
+        "Filters, which can't match, are left as is"
+        t.assertEqual(reduce(Q(status='a'), Q(status='b')),
+                      [tuple(Q(status='a')), tuple(Q(status='b'))])
+
+    def test_050_multi_valued(t):
+        "Only implied filters are dropped for multi valued fields"
+        t.assertEqual(reduce(Q(tags='a'), Q(tags='b')),
+                      [tuple(Q(tags='a')), tuple(Q(tags='b'))])
+        t.assertEqual(reduce(Q(tags__in=['a', 'b']), Q(tags='a')),
+                      [tuple(Q(tags='a'))])
+        t.assertEqual(reduce(Q(tags__gte=10), Q(tags__gte=20)),
+                      [tuple(Q(tags__gte=20))])
+
+    def test_060_order(t):
+        "Merged filter takes place of first one, others are not touched"
+        negated = -Q(status='sold')
+        t.assertEqual(
+            reduce(Q(price__gte=1), negated, Q(price__gte=2), Q(status='a')),
+            [tuple(Q(field='price', operation=Condition.RANGE,
+                     value=Range(fr=2, fr_incl=True))),
+             tuple(negated), tuple(Q(status='a'))])
+
+    def test_070_compiled(t):
+        "Reduced filters are sent to engine"
+        qs = Product.objects.filter(price__gte=10).filter(price__gte=20)
+        t.assertEqual(qs._compile(0, 10)['filter'], ['price:[20 TO *]'])
+
+    def test_080_not_encodable(t):
+        "Filters with values unknown to encoder are not reduced"
+        filters = [Q(price=Decimal('1.5')), Q(price=Decimal('1.5'))]
+        t.assertEqual(reduce_filters(filters, Product), filters)
+        qs = Product.objects.filter(price=Decimal('1.5'))
+        t.assertEqual(qs._compile(0, 10)['filter'], ['price:"1.5"'])
+        Product.cache = LocalCache()
+        try:
+            t.assertEqual(qs._compile(0, 10)['filter'], ['price:"1.5"'])
+        finally:
+            Product.cache = None
+
+
+if __name__ == '__main__':
+    unittest.main()
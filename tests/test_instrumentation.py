@@ -0,0 +1,81 @@
+import json
+import unittest
+from pso.backends import BaseBackend
+from pso.cache import LocalCache
+from pso.fields import BaseField
+from pso.instrumentation import Phase
+from pso.instrumentation import add_hook
+from pso.instrumentation import remove_hook
+from pso.instrumentation import span
+from pso.models import BaseModel
+from pso.q import Q
+
+
+class FakeBackend(BaseBackend):
+
+    def send(self, payload, action=None):
+        self.request = json.loads(payload.decode('utf-8'))
+        docs = [{'title': 'doc'}] * self.request['limit']
+        return json.dumps(
+            {'response': {'numFound': len(docs), 'docs': docs}}
+        ).encode('utf-8')
+
+
+class Article(BaseModel):
+    title = BaseField()
+    user = BaseField()
+    backend = FakeBackend()
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(t):
+        t.spans = []
+        add_hook(t.spans.append)
+
+    def tearDown(t):
+        remove_hook(t.spans.append)
+
+    def test_010_phases(t):
+        "Each execution phase reported to hooks"
+        list(Article.objects.filter(user=1)[0:5])
+        phases = [s.phase for s in t.spans]
+
+        t.assertEqual(phases, [
+            Phase.COMPILE, Phase.SERIALIZE, Phase.NETWORK,
+            Phase.PARSE, Phase.HYDRATE,
+        ])
+        network = t.spans[2]
+        t.assertGreater(network.info['bytes_sent'], 0)
+        t.assertGreater(network.info['bytes_received'], 0)
+        t.assertEqual(t.spans[-1].info['hits'], 5)
+        t.assertEqual(Article.backend.request['filter'], ['user:1'])
+
+    def test_020_normalize(t):
+        "Q normalization reported"
+        (Q('price') > 1) & (Q('price') < 10)
+        t.assertIn(Phase.NORMALIZE, {s.phase for s in t.spans})
+
+    def test_025_cache(t):
+        "Cached response skips network"
+        class Cached(Article):
+            cache = LocalCache()
+
+        qs = Cached.objects.filter(user=1)[0:2]
+        list(qs)
+        list(qs)
+        phases = [s.phase for s in t.spans]
+        t.assertEqual(phases.count(Phase.NETWORK), 1)
+        t.assertEqual([s.info['cache'] for s in t.spans
+                       if s.phase == Phase.PARSE], ['miss', 'hit'])
+
+    def test_030_noop(t):
+        "Without hooks span is no-op"
+        remove_hook(t.spans.append)
+        with span(Phase.COMPILE) as s:
+            s.set(hits=1)
+        t.assertEqual(t.spans, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from benchmarks.loadtest import Product
+from benchmarks.loadtest import make_docs
+from benchmarks.loadtest import parse_latency
+from benchmarks.loadtest import percentile
+from benchmarks.loadtest import run
+from benchmarks.loadtest import workload
+from benchmarks.stub import StubProcess
+from pso.backends import HTTPBackend
+
+
+class TestLoadTest(unittest.TestCase):
+
+    def tearDown(t):
+        Product.backend = None
+
+    def test_010_latency(t):
+        "Latency distributions from command line"
+        t.assertEqual(parse_latency('constant:0.5')(), 0.5)
+        t.assertTrue(0.1 <= parse_latency('uniform:0.1:0.2')() <= 0.2)
+        t.assertGreater(parse_latency('lognormal:0.004')(), 0)
+
+    def test_020_percentile(t):
+        samples = list(range(100))
+        t.assertEqual(percentile(samples, 50), 50)
+        t.assertEqual(percentile(samples, 99.9), 99)
+        t.assertEqual(percentile([], 50), 0.0)
+
+    def test_030_run(t):
+        "Paced run against stub process, errors are counted"
+        with StubProcess(make_docs(100), error_rate=0.2) as server:
+            Product.backend = HTTPBackend(server.url)
+            report = run(workload(Product), concurrency=4, duration=0.5,
+                         qps=100)
+        t.assertEqual(report.requests, server.requests)
+        t.assertEqual(report.errors, server.errors)
+        # Pacing: at most one request per slot of each worker
+        t.assertLessEqual(report.requests, 100 * 0.5 + 4)
+        t.assertGreater(report.requests, 0)
+        t.assertGreater(report.cpu_per_request, 0)
+        t.assertIn('req/s', str(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
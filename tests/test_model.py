@@ -21,7 +21,7 @@ class TestModel(unittest.TestCase):
             set(TestModel._fields),
             {'field1', 'field2', 'field3'}
         )
-        t.assertEqual(TestModel._stored_fields, ['field1'])
+        t.assertEqual(TestModel._stored_fields, ('field1', ))
         t.assertIsInstance(TestModel.objects, BaseQuerySet)
 
     def test_020_multivalued_from_list(t):
@@ -53,3 +53,172 @@ class TestModel(unittest.TestCase):
                 v, getattr(model1, k),
                 msg='Error when get value by field descriptor'
             )
+
+    def test_040_changes_tracking(t):
+        "Only changed fields are in partial update"
+
+        class TestModel(BaseModel):
+            id = BaseField(primary_key=True)
+            body = BaseField()
+            views = BaseField()
+            tags = [BaseField()]
+
+        model = TestModel.from_index({
+            'id': 7, 'body': 'long text', 'views': 10, 'tags': ['a'],
+            '_version_': 42,
+        })
+        t.assertEqual(model.changed_fields, set())
+        t.assertEqual(model.to_save(), model.to_index())
+
+        model.inc('views')
+        model.inc('views', 2)
+        model.add('tags', 'b')
+        t.assertEqual(model.views, 13)
+        t.assertEqual(model.tags, ['a', 'b'])
+        t.assertDictEqual(model.to_save(), {
+            'id': 7,
+            'views': {'inc': 3},
+            'tags': {'add': ['b']},
+            '_version_': 42,
+        })
+
+        model.views = 0
+        t.assertEqual(model.to_update()['views'], {'set': 0})
+
+        model.mark_clean()
+        t.assertEqual(model.changed_fields, set())
+
+    def test_050_shared_metadata(t):
+        "Metadata is read-only, base queryset is shared"
+        from pso.analyzers import Analyzer
+        from pso.fields import FieldType
+
+        class TestModel(BaseModel):
+            id = BaseField(primary_key=True)
+
+        t.assertIs(TestModel.objects, TestModel.objects)
+        t.assertIs(TestModel.get_pk(), TestModel.id)
+        with t.assertRaises(TypeError):
+            TestModel._field_map['other'] = BaseField()
+        with t.assertRaises(AttributeError):
+            TestModel.id.name = 'other'
+        with t.assertRaises(AttributeError):
+            TestModel.id.multi_valued = True
+
+        text = FieldType('text', Analyzer(None))
+        t.assertEqual(len(text.analyzers), 1)
+        t.assertEqual(FieldType('string').analyzers, ())
+
+    def test_055_models_collected(t):
+        "Base queryset doesn't keep dynamically created model alive"
+        import gc
+        import weakref
+
+        class TestModel(BaseModel):
+            id = BaseField(primary_key=True)
+
+        TestModel.objects
+        ref = weakref.ref(TestModel)
+        del TestModel
+        gc.collect()
+        t.assertIsNone(ref())
+
+    def test_060_batch_converters(t):
+        "Column converters give same result as per value ones"
+        from datetime import datetime
+        from pso.fields import DateTimeField, IntegerField
+
+        class TestModel(BaseModel):
+            id = IntegerField(primary_key=True)
+            created = DateTimeField()
+            tags = [BaseField(default='x')]
+            scores = [IntegerField()]
+
+        docs = [
+            {'id': '1', 'created': '2017-01-31T12:00:00Z',
+             'tags': ['a', 'b'], 'scores': ['1', '2']},
+            {'id': 2, 'created': '2017-01-31T12:00:00.5Z', 'scores': []},
+            {'id': 3, 'tags': [None], '_version_': 7},
+        ]
+        many = TestModel.from_index_many(docs)
+        single = [TestModel.from_index(doc) for doc in docs]
+        for m, s in zip(many, single):
+            t.assertEqual(m._cache, s._cache)
+            t.assertEqual(m._version, s._version)
+        t.assertEqual(many[1].created, datetime(2017, 1, 31, 12, 0, 0, 500000))
+        t.assertEqual(many[0].scores, [1, 2])
+
+        t.assertEqual(TestModel.to_index_many(many),
+                      [m.to_index() for m in many])
+
+    def test_062_overridden_converters(t):
+        "Column converters use overridden per value ones"
+        from pso.fields import DateTimeField, FloatField, IntegerField
+
+        class Cents(IntegerField):
+            def to_python(self, value):
+                return int(value) * 100
+
+        class Percent(FloatField):
+            def to_python(self, value):
+                return float(value) / 100
+
+        class Day(DateTimeField):
+            def to_python(self, value):
+                return value[:10]
+
+            def to_index(self, value):
+                return value + 'T00:00:00Z'
+
+        class TestModel(BaseModel):
+            price = Cents()
+            share = Percent()
+            day = Day()
+
+        docs = [{'price': '3', 'share': 50, 'day': '2017-01-31T12:00:00Z'}]
+        many = TestModel.from_index_many(docs)
+        t.assertEqual(many[0]._cache, TestModel.from_index(docs[0])._cache)
+        t.assertEqual(many[0].price, 300)
+        t.assertEqual(TestModel.to_index_many(many),
+                      [{'price': 300, 'share': 0.5,
+                        'day': '2017-01-31T00:00:00Z'}])
+
+    def test_065_aware_datetimes(t):
+        "Aware datetimes are converted to UTC"
+        from datetime import datetime, timedelta, timezone
+        from pso.fields import DateTimeField
+
+        class TestModel(BaseModel):
+            created = DateTimeField()
+
+        value = datetime(2017, 1, 31, 12, tzinfo=timezone(timedelta(hours=3)))
+        t.assertEqual(TestModel.created.to_index(value),
+                      '2017-01-31T09:00:00.000000Z')
+        t.assertEqual(TestModel.to_index_many([TestModel(created=value)]),
+                      [{'created': '2017-01-31T09:00:00.000000Z'}])
+
+    def test_070_save_twice(t):
+        "Version from response is used for next save"
+        from urllib.error import HTTPError
+        from pso.backends import HTTPBackend
+        from benchmarks.stub import StubServer
+
+        class TestModel(BaseModel):
+            id = BaseField(primary_key=True)
+            views = BaseField()
+
+        with StubServer() as server:
+            TestModel.backend = HTTPBackend(server.url)
+            model = TestModel(id=7, views=1)
+            model.save()
+            stale = TestModel.from_index(
+                {'id': 7, 'views': 1, '_version_': model._version})
+            for _ in range(2):
+                model.inc('views')
+                model.save()
+            t.assertEqual(model._version, server.versions[7])
+
+            stale.inc('views')
+            with t.assertRaises(HTTPError) as ctx:
+                stale.save()
+            t.assertEqual(ctx.exception.code, 409)
@@ -0,0 +1,66 @@
+import unittest
+from pso.encoding import fingerprint
+from pso.fields import BaseField
+from pso.models import BaseModel
+from pso.optimizer import optimize
+from pso.q import Q
+
+
+class Article(BaseModel):
+    tenant = BaseField()
+    a = BaseField()
+
+
+t1, a, b, c = Q(tenant=1), Q(a=1), Q(b=2), Q(c=3)
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def assertOptimized(t, q, expected):
+        t.assertEqual(fingerprint(optimize(q)), fingerprint(expected))
+
+    def test_010_factoring(t):
+        "Common conjuncts and disjuncts are factored out"
+        t.assertOptimized((t1 & a) | (t1 & b) | (t1 & c),
+                          Q('AND', t1, Q('OR', a, b, c)))
+        t.assertOptimized((a | b) & (a | c), Q('OR', a, Q('AND', b, c)))
+
+    def test_020_absorption(t):
+        t.assertOptimized(a & (a | b), a)
+        t.assertOptimized(a | (a & b & c), a)
+
+    def test_030_negations(t):
+        "Double negations and De Morgan"
+        t.assertOptimized(-(-a & -b), Q('OR', a, b))
+        t.assertOptimized(~(~a), a)
+        t.assertOptimized(Q(a__ne=1), -a)
+        t.assertOptimized(-Q('AND', -a, Q('AND', -b, -c)), Q('OR', a, b, c))
+
+    def test_040_dead_branches(t):
+        "Contradictions and tautologies"
+        t.assertIs(optimize(a & -a), False)
+        t.assertIs(optimize(a | -a), True)
+        t.assertIs(optimize(Q(a__in=[])), False)
+        t.assertOptimized(b | (a & -a), b)
+        t.assertOptimized(b & (a | -a | c), b)
+
+    def test_050_boost(t):
+        "Boosted nodes are kept"
+        q = Q('AND', a, Q('AND', b, c) * 2)
+        t.assertOptimized(q, q)
+
+    def test_060_memoized(t):
+        q = (t1 & a) | (t1 & b)
+        t.assertIs(optimize(q), optimize((t1 & a) | (t1 & b)))
+
+    def test_070_filters(t):
+        "Filters are optimized on compile"
+        qs = Article.objects.filter((t1 & a) | (t1 & b)).filter(c | -c)
+        t.assertEqual(len(qs._compile(0, 10)['filter']), 1)
+        t.assertEqual(
+            Article.objects.filter(a & -a)._compile(0, 10)['filter'],
+            ['-*:*'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from pso.constants import Operator
+from pso.parser import ParseError
+from pso.parser import parse
+from pso.q import Q
+from pso.range import Range
+
+
+class TestParser(unittest.TestCase):
+
+    def test_010_terms(t):
+        "Field terms, phrases and escapes"
+        t.assertEqual(parse('title:"red fox"'), Q(title='red fox'))
+        t.assertEqual(parse('price:10'), Q(price=10))
+        t.assertEqual(parse('visible:true'), Q(visible=True))
+        t.assertEqual(parse('a:x\\:y'), Q(a='x:y'))
+        t.assertEqual(parse('tag:*'), Q('tag'))
+        t.assertIsNone(parse('*:*'))
+
+    def test_020_ranges(t):
+        "Ranges are merged like Q comparisons"
+        t.assertEqual(parse('price:[10 TO 20}'),
+                      Q(price__range=Range(10, 20, True, False)))
+        t.assertEqual(parse('price:[* TO 100] AND price:{50 TO *]'),
+                      (Q('price') <= 100) & (Q('price') > 50))
+        t.assertEqual(
+            parse('date:[2017-01-01T00:00:00Z TO *]').value.fr,
+            '2017-01-01T00:00:00Z')
+
+    def test_030_boolean(t):
+        "Operators, modifiers and default operator"
+        t.assertEqual(parse('a:1 AND -b:2'), Q(a=1) & -Q(b=2))
+        t.assertEqual(parse('a:1 OR b:2'), Q(a=1) | Q(b=2))
+        t.assertEqual(parse('+a:1 b:2 -c:3'), Q(a=1) & -Q(c=3))
+        t.assertEqual(parse('*:* -status:sold'), -Q(status='sold'))
+        t.assertEqual(parse('fox dog', default_field='text',
+                            default_operator=Operator.AND),
+                      Q(text='fox') & Q(text='dog'))
+        t.assertEqual(parse('title:(red fox)^2'),
+                      (Q(title='red') | Q(title='fox')) * 2)
+
+    def test_040_errors(t):
+        "Broken queries"
+        for text in ['title:"open', 'a:(1 OR 2', 'fox', 'a:[1 TO', '-*:*',
+                     'title:te*', 'title:t?xt', 'a:' + '(' * 1000 + '1',
+                     '-' * 1000 + 'a:1', 'title:x^abc', 'title:x^true',
+                     'title:foo~2', 'title:"red fox"~3', 'a:1 AND b:x~']:
+            with t.assertRaises(ParseError, msg=text[:20]):
+                parse(text)
+
+    def test_050_values(t):
+        "Only plain numbers are converted, negative bounds in ranges"
+        t.assertEqual(parse('price:[-10 TO -1.5]'),
+                      Q(price__range=Range(-10, -1.5, True, True)))
+        for word in ('nan', 'inf', '1_000', '0x10', '1e'):
+            t.assertEqual(parse('id:' + word), Q(id=word))
+        t.assertEqual(parse('a:1e3').value, 1000.0)
+        t.assertEqual(parse('a:\\*x'), Q(a='*x'))
+        t.assertEqual(parse('a:\\~x'), Q(a='~x'))
+        t.assertEqual(parse('a:x^1.5'), Q(a='x') * 1.5)
+
+    def test_060_modifiers(t):
+        "Repeated modifiers are combined"
+        t.assertEqual(parse('- -a:1'), Q(a=1))
+        t.assertEqual(parse('NOT -a:1 AND b:2'), Q(a=1) & Q(b=2))
+        t.assertEqual(parse('+-a:1 b:2'), parse('-a:1 b:2'))
+        t.assertEqual(parse('-+a:1'), -Q(a=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
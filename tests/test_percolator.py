@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime
+from pso.exceptions import PSOException
+from pso.fields import BaseField
+from pso.fields import DateTimeField
+from pso.fields import IntegerField
+from pso.models import BaseModel
+from pso.percolator import Percolator
+from pso.percolator import evaluate
+from pso.q import Q
+from pso.range import Range
+
+
+class Article(BaseModel):
+    id = IntegerField(primary_key=True)
+    color = BaseField()
+    price = IntegerField()
+    tags = [BaseField()]
+    created = DateTimeField()
+
+
+class TestPercolator(unittest.TestCase):
+
+    def setUp(t):
+        t.alerts = Percolator(Article)
+        t.alerts.add('red', Q(color='red'))
+        t.alerts.add('cheap-red', Q(color='red') & (Q('price') < 10))
+        t.alerts.add('tagged', Q(tags__in=('a', 'b')) | Q(color='blue'))
+        t.alerts.add('not-red', -Q(color='red'))
+        t.alerts.add('mid', Q(price__range=Range(20, 30, True, True)))
+        t.alerts.add('new', Q(created__gte=datetime(2017, 6, 1)))
+
+    def test_010_evaluate(t):
+        "Q evaluation on document"
+        doc = {'color': 'red', 'price': 5, 'tags': ['x', 'a']}
+        t.assertTrue(evaluate(Q(color='red') & (Q('price') < 10), doc))
+        t.assertFalse(evaluate(Q(color='red') & -Q(tags='a'), doc))
+        t.assertTrue(evaluate(Q('tags'), doc))
+        t.assertFalse(evaluate(Q('created'), doc))
+        t.assertTrue(evaluate(Q(price__ne=4), doc))
+
+    def test_020_match(t):
+        "Matched keys in order of adding"
+        t.assertEqual(t.alerts.match(Article(color='red', price=5)),
+                      ['red', 'cheap-red'])
+        t.assertEqual(t.alerts.match(Article(color='green', tags=['b'],
+                                             price=30)),
+                      ['tagged', 'not-red', 'mid'])
+        t.assertEqual(
+            t.alerts.match({'color': 'red', 'price': 50,
+                            'created': '2017-07-01T00:00:00.000000Z'}),
+            ['red', 'new'])
+
+    def test_030_candidates(t):
+        "Only candidates, and queries without required terms, are checked"
+        index = t.alerts._index()
+        t.assertEqual([index.keys[i] for i in index.always], ['not-red'])
+        t.assertEqual(
+            [index.keys[i] for i in sorted(
+                index.candidates({'color': 'blue', 'price': 25}))],
+            ['tagged', 'not-red', 'mid'])
+
+    def test_040_remove(t):
+        t.alerts.remove('red')
+        t.alerts.add('mid', Q(price=25))
+        t.assertEqual(len(t.alerts), 5)
+        t.assertEqual(
+            t.alerts.match_many([Article(color='red', price=25)]),
+            [['mid']])
+
+    def test_050_bounds(t):
+        "Range bounds are included or excluded, as in query"
+        alerts = Percolator()
+        alerts.add('lt', Q('price') < 10)
+        alerts.add('lte', Q('price') <= 10)
+        alerts.add('gt', Q('price') > 10)
+        alerts.add('open', Q(price__range=Range(5, 10)))
+        alerts.add('closed', Q(price__range=Range(5, 10, True, True)))
+        t.assertEqual(alerts.match({'price': 10}), ['lte', 'closed'])
+        t.assertEqual(alerts.match({'price': 5}),
+                      ['lt', 'lte', 'closed'])
+        t.assertEqual(alerts.match({'price': [7, 11]}),
+                      ['lt', 'lte', 'gt', 'open', 'closed'])
+
+    def test_060_not_comparable(t):
+        "Value of other type is error, not mismatch"
+        with t.assertRaises(TypeError):
+            evaluate(Q('price') < 10, {'price': 'cheap'})
+        with t.assertRaises(TypeError):
+            t.alerts.match({'price': 'cheap'})
+
+    def test_070_bound_types(t):
+        "Query with bounds of other type is rejected, others still match"
+        alerts = Percolator()
+        alerts.add('cheap', Q('price') < 10)
+        with t.assertRaises(PSOException):
+            alerts.add('bad', Q('price') > 'cheap')
+        with t.assertRaises(PSOException):
+            alerts.add('mixed', Q(price__range=Range(1, 'z')))
+        t.assertEqual(alerts.match({'price': 5}), ['cheap'])
+        alerts.add('cheap', Q('price') < 'z')  # Replaces the only one
+        alerts.remove('cheap')
+        alerts.add('named', Q('price') > 'cheap')
+        t.assertEqual(alerts.match({'price': 'free'}), ['named'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import threading
+import time
+from copy import copy
+from pso.models import BaseModel
+from pso.fields import BaseField
+from pso.q import Q
+from pso.query import BaseQuerySet
+from pso.utils import Chain
+
+
+class Article(BaseModel):
+    title = BaseField()
+    user = BaseField()
+
+
+class ListQuerySet(BaseQuerySet):
+    """Serves documents from list, records requested windows"""
+
+    docs = [{'title': str(i), 'user': i % 3} for i in range(25)]
+    page_size = 10
+    delay = 0
+
+    def _fetch(self, offset, limit):
+        time.sleep(self.delay)
+        self.requests.append((offset, limit, threading.get_ident()))
+        return self.docs[offset:offset + limit]
+
+
+class TestQuerySet(unittest.TestCase):
+
+    def test_010_chain(t):
+        "Persistent cons-list keeps order and shares tail"
+        base = Chain(1, 2)
+        left = base.append(3)
+        right = base.append(4)
+
+        t.assertEqual(list(base), [1, 2])
+        t.assertEqual(list(left), [1, 2, 3])
+        t.assertEqual(list(right), [1, 2, 4])
+        t.assertEqual(len(left), 3)
+        t.assertEqual(Chain(), [])
+
+    def test_020_filter_clones_are_independent(t):
+        "Filtering clone doesn't change original queryset"
+        base = Article.objects.filter(user=1)
+        first = base.filter(title='first')
+        second = base.filter(title='second')
+
+        t.assertEqual(list(base._filter), [Q(user=1)])
+        t.assertEqual(list(first._filter), [Q(user=1), Q(title='first')])
+        t.assertEqual(list(second._filter), [Q(user=1), Q(title='second')])
+
+    def test_030_copy_shares_state(t):
+        "Copy is shallow, state is shared"
+        qs = Article.objects.filter(user=1).search(title='text')[10:20]
+        clone = copy(qs)
+
+        t.assertIs(clone._filter, qs._filter)
+        t.assertIs(clone._search, qs._search)
+        t.assertEqual((clone._offset, clone._limit), (10, 10))
+
+    def test_040_iterate_pages(t):
+        "Iteration requests documents page by page"
+        ListQuerySet.requests = []
+        qs = ListQuerySet(model=Article)
+
+        t.assertEqual([a.title for a in qs], [str(i) for i in range(25)])
+        t.assertEqual([r[:2] for r in ListQuerySet.requests],
+                      [(0, 10), (10, 10), (20, 10)])
+
+        ListQuerySet.requests = []
+        t.assertEqual(len(list(qs.paginate(1, 4))), 4)
+        t.assertEqual([r[:2] for r in ListQuerySet.requests], [(4, 4)])
+
+        ListQuerySet.requests = []
+        t.assertEqual([a.title for a in qs[10:13]], ['10', '11', '12'])
+        t.assertEqual([r[:2] for r in ListQuerySet.requests], [(10, 3)])
+        t.assertEqual(len(list(qs[:5])), 5)
+        t.assertEqual(len(list(qs[20:])), 5)
+
+    def test_050_prefetch(t):
+        "Prefetch returns clone and fetches pages in background"
+        ListQuerySet.requests = []
+        qs = ListQuerySet(model=Article)
+        prefetched = qs.prefetch(2)
+
+        t.assertEqual(qs._prefetch, 0)
+        t.assertEqual(prefetched._prefetch, 2)
+        t.assertEqual(len(list(prefetched)), 25)
+        t.assertNotIn(threading.get_ident(),
+                      {r[2] for r in ListQuerySet.requests})
+
+    def test_060_prefetch_cancel(t):
+        "Prefetch stops, when iteration stops early"
+        class SlowQuerySet(ListQuerySet):
+            docs = [{'title': str(i)} for i in range(1000)]
+            delay = 0.01
+
+        SlowQuerySet.requests = []
+        for article in SlowQuerySet(model=Article).prefetch(1):
+            break
+        time.sleep(0.2)
+        t.assertLessEqual(len(SlowQuerySet.requests), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
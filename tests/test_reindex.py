@@ -0,0 +1,73 @@
+import json
+import unittest
+from benchmarks.stub import StubServer
+from pso.bulk import BulkIndexer
+from pso.backends import HTTPBackend
+from pso.backends import ReplicaBackend
+from pso.fields import BaseField
+from pso.fields import IntegerField
+from pso.models import BaseModel
+from pso.reindex import chunked
+from pso.reindex import reindex
+from pso.reindex import serialize_parallel
+
+
+class Article(BaseModel):
+    id = IntegerField(primary_key=True)
+    title = BaseField()
+    tags = [BaseField()]
+
+
+class PrefixedBackend(HTTPBackend):
+    """Marks documents, to check that backend serializer is used"""
+
+    def serialize(self, request):
+        if 'id' in request:
+            request = dict(request, title='re' + request['title'])
+        return super().serialize(request)
+
+
+def build(ids):
+    return [Article(id=i, title=str(i), tags=['a', str(i % 3)]) for i in ids]
+
+
+class TestReindex(unittest.TestCase):
+
+    def test_010_chunked(t):
+        t.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_020_ordered(t):
+        "Chunks are yielded in input order"
+        chunks = list(chunked(range(100), 7))
+        result = list(serialize_parallel(chunks, build, 3, ordered=True))
+        t.assertEqual(len(result), len(chunks))
+        t.assertIsInstance(result[0][0], memoryview)  # Not copied
+        docs = [json.loads(bytes(doc)) for docs in result for doc in docs]
+        t.assertEqual([doc['id'] for doc in docs], list(range(100)))
+        t.assertEqual(docs[4], Article(id=4, title='4',
+                                       tags=['a', '1']).to_index())
+
+    def test_030_reindex(t):
+        "Documents are fed to bulk indexer"
+        with StubServer() as server:
+            backend = PrefixedBackend(server.url)
+            with BulkIndexer(backend, max_docs=50) as indexer:
+                count = reindex(chunked(range(200), 30), build, indexer, 2)
+            t.assertEqual(count, 200)
+            t.assertEqual(sorted(doc['id'] for doc in server.docs),
+                          list(range(200)))
+            t.assertEqual(server.docs[0]['title'][:2], 're')
+
+    def test_040_replica_backend(t):
+        "Backend with locks and thread pool isn't sent to workers"
+        with StubServer() as server:
+            backend = ReplicaBackend([HTTPBackend(server.url)])
+            with BulkIndexer(backend, max_docs=50) as indexer:
+                count = reindex(chunked(range(60), 30), build, indexer, 2)
+            t.assertEqual(count, 60)
+            t.assertEqual(sorted(doc['id'] for doc in server.docs),
+                          list(range(60)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import warnings
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from pso.fields import BaseField
+from pso.fields import DateTimeField
+from pso.fields import FloatField
+from pso.fields import IntegerField
+from pso.models import BaseModel
+from pso.q import Q
+from pso.result import ColumnarResultSet
+from pso.result import numpy
+
+
+class Product(BaseModel):
+    name = BaseField()
+    price = FloatField()
+    stock = IntegerField()
+    created = DateTimeField()
+    tags = [BaseField()]
+
+
+DOCS = [
+    {'name': 'a', 'price': 5.0, 'stock': 1,
+     'created': '2017-01-01T00:00:00Z', 'tags': ['x']},
+    {'name': 'b', 'price': 15.0, 'stock': 2,
+     'created': '2017-02-01T00:00:00Z', 'tags': ['y']},
+    {'name': 'c', 'price': 25.0,
+     'created': '2017-03-01T00:00:00Z', 'tags': ['x', 'y']},
+]
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestColumnarResultSet(unittest.TestCase):
+
+    def setUp(t):
+        t.rs = ColumnarResultSet.from_docs(Product, DOCS)
+
+    def test_010_columns(t):
+        "Typed columns for numeric and date fields"
+        t.assertEqual(len(t.rs), 3)
+        t.assertEqual(t.rs['price'].dtype, numpy.float64)
+        t.assertEqual(t.rs['stock'].dtype, numpy.float64)  # Has missing
+        t.assertEqual(t.rs['created'].dtype.kind, 'M')
+        t.assertEqual(t.rs['name'].dtype, object)
+        t.assertEqual(t.rs[1]['created'], datetime(2017, 2, 1))
+
+    def test_020_filter(t):
+        "Q conditions evaluated as masks"
+        names = lambda rs: list(rs['name'])  # noqa
+
+        t.assertEqual(names(t.rs.filter(Q('price') >= 15)), ['b', 'c'])
+        t.assertEqual(names(t.rs.filter(price__lt=15)), ['a'])
+        t.assertEqual(names(t.rs.filter(Q('name') << ['a', 'c'])),
+                      ['a', 'c'])
+        t.assertEqual(names(t.rs.filter(Q('name') != 'a')), ['b', 'c'])
+        t.assertEqual(names(t.rs.filter(
+            Q('created') < datetime(2017, 2, 15))), ['a', 'b'])
+        t.assertEqual(names(t.rs.filter(tags='x')), ['a', 'c'])
+        t.assertEqual(names(t.rs.filter(Q('stock'))), ['a', 'b'])
+        t.assertEqual(names(t.rs.filter(
+            (Q('price') > 20) | (Q('name') == 'a'))), ['a', 'c'])
+
+    def test_030_slice(t):
+        "Re-slicing without engine"
+        t.assertEqual(list(t.rs[1:]['name']), ['b', 'c'])
+        t.assertEqual(t.rs[-1]['name'], 'c')
+        t.assertEqual(t.rs[-3], t.rs[0])
+        t.assertEqual(t.rs[0]['tags'], ['x'])
+        with t.assertRaises(IndexError):
+            t.rs[-4]
+        with t.assertRaises(IndexError):
+            t.rs[3]
+
+    def test_040_multi_valued_range(t):
+        "Ranges on multi valued columns are applied to each value"
+        names = lambda rs: list(rs['name'])  # noqa
+        t.assertEqual(names(t.rs.filter(Q('tags') > 'x')), ['b', 'c'])
+        t.assertEqual(names(t.rs.filter(Q('tags') <= 'x')), ['a', 'c'])
+        t.assertEqual(names(t.rs.filter(Q('tags') != 'x')), ['b'])
+
+    def test_050_aware_datetime(t):
+        "Aware datetimes are compared in UTC, without NumPy warning"
+        kiev = timezone(timedelta(hours=2))
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            rs = t.rs.filter(
+                Q('created') < datetime(2017, 2, 1, 2, 0, 1, tzinfo=kiev))
+        t.assertEqual(list(rs['name']), ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
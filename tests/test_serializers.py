@@ -0,0 +1,117 @@
+import gzip
+import io
+import json
+import unittest
+import zlib
+from benchmarks.stub import StubServer
+from pso import serializers
+from pso.backends import HTTPBackend
+from pso.exceptions import PSOException
+
+
+DOCS = [{'id': i, 'title': 'same words again ' * 10} for i in range(50)]
+
+
+class FakeCBOR:
+    """Stands for cbor2 module, to test codec plumbing without it"""
+    loaded = 0
+
+    @staticmethod
+    def dumps(data):
+        return b'CBOR' + json.dumps(data).encode('utf-8')
+
+    @classmethod
+    def loads(cls, raw):
+        assert raw[:4] == b'CBOR'
+        cls.loaded += 1
+        return json.loads(raw[4:].decode('utf-8'))
+
+
+class TestSerializers(unittest.TestCase):
+
+    def test_010_read_body(t):
+        "Decompression by Content-Encoding"
+        data = json.dumps(DOCS).encode('utf-8')
+        serializers.CHUNK_SIZE, size = 100, serializers.CHUNK_SIZE
+        try:
+            for encoded, encoding in ((gzip.compress(data), 'gzip'),
+                                      (zlib.compress(data), 'deflate'),
+                                      (data, None)):
+                t.assertEqual(
+                    serializers.read_body(io.BytesIO(encoded), encoding), data)
+        finally:
+            serializers.CHUNK_SIZE = size
+
+    def test_015_max_size(t):
+        "Decompressed size is limited"
+        bomb = gzip.compress(b'\0' * 10 * 1024 * 1024)
+        with t.assertRaises(PSOException):
+            serializers.read_body(io.BytesIO(bomb), 'gzip', max_size=1024)
+        with t.assertRaises(PSOException):
+            serializers.read_body(io.BytesIO(b'x' * 11), max_size=10)
+        t.assertEqual(serializers.read_body(
+            io.BytesIO(zlib.compress(b'x' * 10)), 'deflate', max_size=10),
+            b'x' * 10)
+
+    def test_017_truncated(t):
+        "Compressed body, which ends before compressed stream, is error"
+        data = json.dumps(DOCS).encode('utf-8')
+        for encoded, encoding in ((gzip.compress(data), 'gzip'),
+                                  (zlib.compress(data), 'deflate')):
+            with t.assertRaises(PSOException):
+                serializers.read_body(io.BytesIO(encoded[:-5]), encoding)
+
+    def test_020_compressed_responses(t):
+        "Responses are compressed when server supports it"
+        with StubServer(DOCS) as plain, \
+                StubServer(DOCS, compress=True) as compressed:
+            request = {'offset': 0, 'limit': 50}
+            t.assertEqual(HTTPBackend(plain.url).search(request).docs, DOCS)
+            t.assertEqual(
+                HTTPBackend(compressed.url).search(request).docs, DOCS)
+        t.assertLess(compressed.bytes_sent * 5, plain.bytes_sent)
+
+    def test_030_compressed_requests(t):
+        "Bulk payloads are compressed"
+        with StubServer() as server:
+            backend = HTTPBackend(server.url, compress='gzip')
+            docs = [backend.serialize(doc) for doc in DOCS]
+            backend.bulk(docs)
+            t.assertEqual(server.docs, DOCS)
+            t.assertLess(server.bytes_received * 5, sum(map(len, docs)))
+
+    @unittest.skipIf(serializers.cbor2 is None, "cbor2 is not installed")
+    def test_040_cbor(t):
+        "Binary responses"
+        with StubServer(DOCS) as server:
+            backend = HTTPBackend(server.url, codec=serializers.CBORCodec())
+            t.assertEqual(backend.search({'limit': 5}).docs, DOCS[:5])
+
+    def test_045_cbor_negotiation(t):
+        "CBOR is requested with wt, and required only when used"
+        cbor2, serializers.cbor2 = serializers.cbor2, None
+        try:
+            with t.assertRaises(PSOException):
+                serializers.CBORCodec()
+
+            serializers.cbor2 = FakeCBOR
+            with StubServer(DOCS) as server:
+                backend = HTTPBackend(server.url,
+                                      codec=serializers.CBORCodec())
+                t.assertEqual(backend.search({'limit': 5}).docs, DOCS[:5])
+            t.assertEqual(FakeCBOR.loaded, 1)
+        finally:
+            serializers.cbor2 = cbor2
+
+    def test_050_abstract_codec(t):
+        "Codec must implement dumps and loads"
+        class Partial(serializers.Codec):
+            def loads(self, raw):
+                return raw
+
+        with t.assertRaises(TypeError):
+            Partial()
+
+
+if __name__ == '__main__':
+    unittest.main()